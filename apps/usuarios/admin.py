@@ -1,14 +1,18 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
 from django.utils.html import format_html, mark_safe
-from .models import Usuario, TokenInscricao, Propriedade, Lote, ProjecaoGanho, GastoNutricional, CustoFixo, Receita, Mortalidade
+from .models import Usuario, TokenInscricao, Propriedade, Lote, ProjecaoGanho, GastoNutricional, CustoFixo, Receita, Mortalidade, Benchmark, PerfilRequisicao
 from .forms import TokenInscricaoAdminForm
 
 
 @admin.register(Usuario)
 class UsuarioAdmin(BaseUserAdmin):
-    list_display = ('email', 'nome', 'is_active', 'is_staff', 'date_joined')
-    list_filter = ('is_active', 'is_staff', 'is_superuser', 'date_joined')
+    list_display = ('email', 'nome', 'is_active', 'is_staff', 'perfilar_requisicoes', 'date_joined')
+    list_filter = ('is_active', 'is_staff', 'is_superuser', 'perfilar_requisicoes', 'date_joined')
     search_fields = ('email', 'nome')
     ordering = ('email',)
     
@@ -19,6 +23,10 @@ class UsuarioAdmin(BaseUserAdmin):
             'fields': ('is_active', 'is_staff', 'is_superuser', 'groups', 'user_permissions'),
         }),
         ('Datas Importantes', {'fields': ('last_login', 'date_joined')}),
+        ('Desempenho', {
+            'fields': ('perfilar_requisicoes',),
+            'description': 'Grava um perfil (cProfile) de cada requisição do usuário em "Perfis de Requisições".',
+        }),
     )
     
     add_fieldsets = (
@@ -162,3 +170,60 @@ class MortalidadeAdmin(admin.ModelAdmin):
     search_fields = ('lote__nome', 'lote__propriedade__usuario__email')
     ordering = ('ano', 'mes')
 
+
+@admin.register(Benchmark)
+class BenchmarkAdmin(admin.ModelAdmin):
+    list_display = ('ano', 'dimensao', 'grupo', 'metrica', 'propriedades', 'p10', 'p50', 'p90', 'data_calculo')
+    list_filter = ('ano', 'dimensao', 'metrica')
+    search_fields = ('grupo',)
+    readonly_fields = ('data_calculo',)
+    ordering = ('ano', 'dimensao', 'grupo', 'metrica')
+
+
+@admin.register(PerfilRequisicao)
+class PerfilRequisicaoAdmin(admin.ModelAdmin):
+    list_display = ('data_criacao', 'metodo', 'caminho', 'status', 'tempo_ms_display', 'queries', 'usuario', 'downloads')
+    list_filter = ('metodo', 'status', 'data_criacao')
+    search_fields = ('caminho', 'usuario__email')
+    readonly_fields = ('usuario', 'metodo', 'caminho', 'status', 'tempo_ms', 'queries', 'data_criacao', 'downloads', 'resumo_display')
+    exclude = ('estatisticas', 'resumo')
+    ordering = ('-data_criacao',)
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def get_urls(self):
+        baixar = self.admin_site.admin_view(self.baixar)
+        return [
+            path('<int:perfil_id>/baixar/<str:formato>/', baixar, name='usuarios_perfilrequisicao_baixar'),
+        ] + super().get_urls()
+    
+    def baixar(self, request, perfil_id, formato):
+        """Estatísticas (abrir com pstats ou snakeviz) ou o resumo em texto"""
+        perfil = get_object_or_404(PerfilRequisicao, id=perfil_id)
+        if not self.has_view_permission(request, perfil):
+            raise PermissionDenied
+        if formato == 'pstats':
+            response = HttpResponse(bytes(perfil.estatisticas), content_type='application/octet-stream')
+        elif formato == 'txt':
+            response = HttpResponse(perfil.resumo, content_type='text/plain; charset=utf-8')
+        else:
+            return HttpResponse(status=404)
+        response['Content-Disposition'] = f'attachment; filename="perfil-{perfil.id}.{formato}"'
+        return response
+    
+    def tempo_ms_display(self, obj):
+        return f"{obj.tempo_ms:.0f} ms"
+    tempo_ms_display.short_description = 'Tempo'
+    
+    def downloads(self, obj):
+        return format_html(
+            '<a href="{}">.pstats</a> | <a href="{}">.txt</a>',
+            reverse('admin:usuarios_perfilrequisicao_baixar', args=[obj.id, 'pstats']),
+            reverse('admin:usuarios_perfilrequisicao_baixar', args=[obj.id, 'txt']),
+        )
+    downloads.short_description = 'Baixar'
+    
+    def resumo_display(self, obj):
+        return format_html('<pre style="font-size: 12px; overflow-x: auto;">{}</pre>', obj.resumo)
+    resumo_display.short_description = 'Resumo'
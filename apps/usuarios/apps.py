@@ -7,7 +7,9 @@ class UsuariosConfig(AppConfig):
     verbose_name = 'Usuários'
 
     def ready(self):
-        """Cria usuário admin padrão se não existir"""
+        """Registra os sinais do app (e a medição de queries) e cria usuário admin padrão se não existir"""
+        
+        from . import perf, signals  # noqa: F401
         
         from django.contrib.auth import get_user_model
         
@@ -0,0 +1,179 @@
+"""
+Bancada de desempenho das telas de dashboard.
+
+Roda cada view (pelo cliente de testes do Django, com todos os middlewares)
+contra fazendas sintéticas pequena, média e grande (sinteticos.py) e mede o
+tempo (mediana e mínimo das repetições), a quantidade de queries e o pico de
+memória Python (tracemalloc, em uma requisição à parte, porque ele deixa tudo
+mais lento). Cada view é medida sem cache (o cálculo completo, com o cache
+limpo antes de cada requisição) e com o cache preenchido.
+
+O comando ``bench_dashboards`` roda a bancada em um banco de testes, grava o
+resultado em JSON e o compara com um resultado anterior (a referência),
+apontando o que piorou além do limite.
+"""
+from contextlib import contextmanager
+import logging
+import platform
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Usuario
+from .sinteticos import email, gerar
+
+
+# Ano fixo: a mesma semente gera os mesmos dados em qualquer data
+ANO = 2025
+
+# porte -> (lotes, anos de dados)
+PORTES = {
+    'pequena': (5, 1),
+    'media': (30, 2),
+    'grande': (120, 3),
+}
+
+# nome -> (nome da URL, parâmetros do GET)
+VIEWS = {
+    'lotes_dashboard': ('lotes_dashboard', {}),
+    'nutricional': ('nutricional', {'ano': ANO}),
+    'nutricional_dashboard': ('nutricional_dashboard', {}),
+    'faturamento': ('faturamento', {}),
+    'fluxo_caixa': ('fluxo_caixa', {'ano': ANO}),
+    'ponto_equilibrio': ('ponto_equilibrio', {'ano': ANO}),
+}
+
+REPETICOES = 5
+LIMITE = 0.2
+# Diferenças menores que estas são ruído, qualquer que seja a porcentagem
+FOLGA_TEMPO_MS = 5
+FOLGA_MEMORIA_KB = 64
+
+
+def _prefixo(porte, semente):
+    return f'bancada-{porte}-{semente}-'
+
+
+def fazenda(porte, semente=0):
+    """Usuário da fazenda sintética do porte (gerada na primeira vez)"""
+    prefixo = _prefixo(porte, semente)
+    usuario = Usuario.objects.filter(email=email(prefixo, 0)).first()
+    if usuario is None:
+        lotes, anos = PORTES[porte]
+        gerar(1, lotes, range(ANO - anos + 1, ANO + 1), semente=semente, prefixo=prefixo)
+        usuario = Usuario.objects.get(email=email(prefixo, 0))
+    return usuario
+
+
+@contextmanager
+def _sem_avisos_de_orcamento():
+    # As fazendas grandes passam do orçamento de propósito; o aviso de cada requisição só polui a saída
+    logger = logging.getLogger('usuarios.perf')
+    nivel = logger.level
+    logger.setLevel(logging.ERROR)
+    try:
+        yield
+    finally:
+        logger.setLevel(nivel)
+
+
+def _pico_de_memoria(requisicao):
+    """Pico de memória Python (bytes) alocada durante ``requisicao()``"""
+    ja_ligado = tracemalloc.is_tracing()
+    if not ja_ligado:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        inicial = tracemalloc.get_traced_memory()[0]
+        requisicao()
+        return tracemalloc.get_traced_memory()[1] - inicial
+    finally:
+        if not ja_ligado:
+            tracemalloc.stop()
+
+
+def medir_view(cliente, view, repeticoes=REPETICOES, com_cache=False):
+    """{tempo_ms, tempo_min_ms, queries, memoria_pico_kb} de uma view"""
+    url, parametros = VIEWS[view]
+    url = reverse(url)
+
+    def requisicao():
+        if not com_cache:
+            cache.clear()
+        resposta = cliente.get(url, parametros)
+        if resposta.status_code != 200:
+            raise RuntimeError(f'{url} respondeu {resposta.status_code}.')
+
+    # Aquecimento: imports, templates compilados e, com cache, o cache preenchido
+    requisicao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        requisicao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    with CaptureQueriesContext(connection) as queries:
+        pico = _pico_de_memoria(requisicao)
+    return {
+        'tempo_ms': round(statistics.median(tempos), 3),
+        'tempo_min_ms': round(min(tempos), 3),
+        'queries': len(queries),
+        'memoria_pico_kb': round(pico / 1024, 1),
+    }
+
+
+def chave(porte, view, com_cache):
+    return f'{porte}/{view}/{"com_cache" if com_cache else "sem_cache"}'
+
+
+def medir(portes=tuple(PORTES), views=tuple(VIEWS), repeticoes=REPETICOES, semente=0, progresso=None):
+    """Resultado da bancada: metadados e {porte/view/cache: medidas}"""
+    resultados = {}
+    with _sem_avisos_de_orcamento():
+        for porte in portes:
+            cliente = Client()
+            cliente.force_login(fazenda(porte, semente))
+            for view in views:
+                for com_cache in (False, True):
+                    nome = chave(porte, view, com_cache)
+                    resultados[nome] = medir_view(cliente, view, repeticoes, com_cache)
+                    if progresso:
+                        progresso(nome, resultados[nome])
+    return {
+        'meta': {
+            'data': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'banco': connection.vendor,
+            'semente': semente,
+            'repeticoes': repeticoes,
+        },
+        'resultados': resultados,
+    }
+
+
+def comparar(atual, referencia, limite=LIMITE):
+    """
+    [(chave, medida, antes, depois)] do que piorou em relação à referência:
+    tempo e memória acima de ``limite`` (fração) e da folga de ruído, e
+    qualquer query a mais. O tempo comparado é o mínimo das repetições, que
+    varia menos que a mediana com a carga da máquina.
+    """
+    regressoes = []
+    for nome, depois in atual['resultados'].items():
+        antes = referencia['resultados'].get(nome)
+        if antes is None:
+            continue
+        if depois['queries'] > antes['queries']:
+            regressoes.append((nome, 'queries', antes['queries'], depois['queries']))
+        for medida, folga in (('tempo_min_ms', FOLGA_TEMPO_MS), ('memoria_pico_kb', FOLGA_MEMORIA_KB)):
+            if depois[medida] > antes[medida] * (1 + limite) and depois[medida] - antes[medida] > folga:
+                regressoes.append((nome, medida, antes[medida], depois[medida]))
+    return regressoes
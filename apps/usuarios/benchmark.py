@@ -0,0 +1,219 @@
+"""
+Comparativo anônimo entre propriedades (benchmark).
+
+O comando ``calcular_benchmarks``, agendado para rodar à noite, calcula as
+métricas de cada propriedade no ano (GMD médio, custo diário por animal, ponto
+de equilíbrio e rentabilidade) em processos separados, em blocos de
+propriedades, e grava na tabela Benchmark só os percentis p10/p50/p90 de cada
+grupo de propriedades parecidas: todas, mesmo município/estado, mesma raça e
+mesmo tipo de terminação. Grupos com menos de ``MIN_PROPRIEDADES``
+propriedades não são gravados, para que nenhum valor individual possa ser
+deduzido. A página de comparativo lê apenas as poucas linhas dos grupos da
+propriedade.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+from django.db import connections, transaction
+from django.db.models import DecimalField, F, Q, Sum
+
+from .fluxo_caixa import FluxoCaixa
+from .importacao import normalizar
+from .models import Benchmark, LoteMes, Propriedade
+from .projecao import carregar_dados, projetar
+from .sensibilidade import RENDIMENTO_PADRAO
+from .simulacao import percentis
+
+
+DIMENSOES = ('municipio_estado', 'tipo_raca_animais', 'tipo_terminacao')
+METRICAS = tuple(metrica for metrica, _ in Benchmark.METRICA_CHOICES)
+NIVEIS = (10, 50, 90)
+
+MIN_PROPRIEDADES = 5
+PROPRIEDADES_POR_BLOCO = 20
+
+
+def grupos_da_propriedade(propriedade):
+    """[(dimensão, grupo)] a que a propriedade pertence; dimensões em branco ficam de fora"""
+    grupos = [('geral', '')]
+    for dimensao in DIMENSOES:
+        grupo = normalizar(getattr(propriedade, dimensao))[:255]
+        if grupo:
+            grupos.append((dimensao, grupo))
+    return grupos
+
+
+def metricas_propriedade(propriedade, ano):
+    """{métrica: valor em float ou None quando a propriedade não tem dados para calculá-la}"""
+    metricas = dict.fromkeys(METRICAS)
+
+    # GMD e custo diário do livro mensal, ponderados por animais × dias
+    animais_dias = F('lote__quantidade') * F('dias_mes')
+    decimal = DecimalField(max_digits=20, decimal_places=4)
+    com_gmd = Q(gmd_kg__isnull=False)
+    com_gasto = Q(gasto_diario__isnull=False)
+    totais = LoteMes.objects.filter(lote__propriedade=propriedade, ano=ano).aggregate(
+        gmd=Sum(F('gmd_kg') * animais_dias, filter=com_gmd, output_field=decimal),
+        peso_gmd=Sum(animais_dias, filter=com_gmd),
+        gasto=Sum(F('gasto_diario') * animais_dias, filter=com_gasto, output_field=decimal),
+        peso_gasto=Sum(animais_dias, filter=com_gasto),
+    )
+    if totais['peso_gmd']:
+        metricas['gmd'] = float(totais['gmd'] / totais['peso_gmd'])
+    if totais['peso_gasto']:
+        metricas['custo_diario'] = float(totais['gasto'] / totais['peso_gasto'])
+
+    # Ponto de equilíbrio no último mês projetado do ano (custo acumulado desde a compra),
+    # ponderado pela quantidade de animais dos lotes com projeção no ano
+    dados = carregar_dados(propriedade, com_periodos=True, com_gastos=True)
+    fator = float(propriedade.ultimo_rendimento_carcaca or RENDIMENTO_PADRAO) / 100 / 15
+    soma, animais = 0.0, 0
+    for linha in projetar(dados, usar_periodos=True):
+        meses_ano = linha.janela((ano, 1), (ano, 12))
+        peso_arroba = float(meses_ano[-1].peso_saida) * fator if meses_ano else 0
+        if peso_arroba > 0:
+            lote = linha.lote
+            custo = float(lote.valor_compra) + sum(
+                float(dados.gasto_diario(lote.id, mes.ano, mes.mes) or 0) * mes.dias
+                for mes in linha.antes((ano + 1, 1))
+            )
+            soma += custo / peso_arroba * lote.quantidade
+            animais += lote.quantidade
+    if animais:
+        metricas['ponto_equilibrio'] = soma / animais
+
+    # Rentabilidade do resumo do fluxo de caixa, só com faturamento e investimento no ano
+    resumo = FluxoCaixa.do_ano(propriedade, ano).resumo
+    if resumo['faturamento'] > 0 and resumo['investimentos'] > 0:
+        metricas['rentabilidade'] = float(resumo['rentabilidade'])
+
+    return metricas
+
+
+def _iniciar_processo():
+    # Com o método "spawn" os processos filhos começam sem o Django configurado
+    import django
+    django.setup()
+
+
+def _metricas_bloco(propriedade_ids, ano):
+    propriedades = Propriedade.objects.filter(id__in=propriedade_ids).order_by('id')
+    return [(propriedade.id, metricas_propriedade(propriedade, ano)) for propriedade in propriedades]
+
+
+def calcular_metricas(ano, processos=1, tamanho_bloco=PROPRIEDADES_POR_BLOCO, progresso=None):
+    """
+    Métricas de todas as propriedades no ano, {id: métricas}. Com mais de um
+    processo, os blocos de propriedades são divididos entre processos filhos,
+    cada um com sua conexão ao banco. ``progresso(feitas, total)`` é chamado a
+    cada bloco concluído.
+    """
+    ids = list(Propriedade.objects.order_by('id').values_list('id', flat=True))
+    blocos = [ids[inicio:inicio + tamanho_bloco] for inicio in range(0, len(ids), tamanho_bloco)]
+
+    resultado = {}
+
+    def registrar(parcial):
+        resultado.update(parcial)
+        if progresso:
+            progresso(len(resultado), len(ids))
+
+    if processos <= 1 or len(blocos) <= 1:
+        for bloco in blocos:
+            registrar(_metricas_bloco(bloco, ano))
+        return resultado
+
+    # Os filhos não podem herdar as conexões abertas do processo pai
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo) as executor:
+        for parcial in executor.map(_metricas_bloco, blocos, [ano] * len(blocos)):
+            registrar(parcial)
+    return resultado
+
+
+def resumir(ano, metricas_por_propriedade, grupos_por_propriedade, minimo=MIN_PROPRIEDADES):
+    """Linhas de Benchmark (não gravadas) com os percentis de cada grupo com ao menos ``minimo`` valores"""
+    valores = {}
+    for propriedade_id, metricas in metricas_por_propriedade.items():
+        for grupo in grupos_por_propriedade.get(propriedade_id, ()):
+            for metrica, valor in metricas.items():
+                if valor is not None:
+                    valores.setdefault((grupo, metrica), []).append(valor)
+
+    benchmarks = []
+    for ((dimensao, grupo), metrica), lista in sorted(valores.items()):
+        if len(lista) < minimo:
+            continue
+        p10, p50, p90 = (Decimal(str(round(valor, 4))) for valor in percentis(lista, NIVEIS))
+        benchmarks.append(Benchmark(
+            ano=ano, dimensao=dimensao, grupo=grupo, metrica=metrica,
+            propriedades=len(lista), p10=p10, p50=p50, p90=p90,
+        ))
+    return benchmarks
+
+
+def atualizar_benchmarks(ano, processos=1, tamanho_bloco=PROPRIEDADES_POR_BLOCO, minimo=MIN_PROPRIEDADES,
+                         progresso=None):
+    """Recalcula e substitui os benchmarks do ano; retorna as linhas gravadas"""
+    metricas = calcular_metricas(ano, processos=processos, tamanho_bloco=tamanho_bloco, progresso=progresso)
+    grupos = {
+        propriedade.id: grupos_da_propriedade(propriedade)
+        for propriedade in Propriedade.objects.only('id', *DIMENSOES)
+    }
+    benchmarks = resumir(ano, metricas, grupos, minimo=minimo)
+    with transaction.atomic():
+        Benchmark.objects.filter(ano=ano).delete()
+        Benchmark.objects.bulk_create(benchmarks)
+    return benchmarks
+
+
+def comparativo(propriedade, ano, metricas):
+    """
+    Grupos da propriedade com os percentis de cada métrica (uma consulta) e o
+    valor da propriedade ao lado, no formato usado pela página.
+    """
+    grupos = grupos_da_propriedade(propriedade)
+    filtro = Q()
+    for dimensao, grupo in grupos:
+        filtro |= Q(dimensao=dimensao, grupo=grupo)
+    linhas = {
+        (benchmark.dimensao, benchmark.grupo, benchmark.metrica): benchmark
+        for benchmark in Benchmark.objects.filter(filtro, ano=ano)
+    }
+
+    rotulos_dimensao = dict(Benchmark.DIMENSAO_CHOICES)
+    resultado = []
+    for dimensao, grupo in grupos:
+        metricas_grupo = []
+        for metrica, rotulo in Benchmark.METRICA_CHOICES:
+            benchmark = linhas.get((dimensao, grupo, metrica))
+            if benchmark is None:
+                continue
+            valor = metricas.get(metrica)
+            metricas_grupo.append({
+                'metrica': metrica,
+                'rotulo': rotulo,
+                'valor': valor,
+                'p10': float(benchmark.p10),
+                'p50': float(benchmark.p50),
+                'p90': float(benchmark.p90),
+                'faixa': _faixa(valor, benchmark),
+            })
+        if metricas_grupo:
+            resultado.append({
+                'dimensao': rotulos_dimensao[dimensao],
+                'grupo': getattr(propriedade, dimensao) if dimensao != 'geral' else '',
+                'propriedades': max(linhas[(dimensao, grupo, m['metrica'])].propriedades for m in metricas_grupo),
+                'metricas': metricas_grupo,
+            })
+    return resultado
+
+
+def _faixa(valor, benchmark):
+    if valor is None:
+        return None
+    if valor < benchmark.p10:
+        return 'abaixo do p10'
+    if valor > benchmark.p90:
+        return 'acima do p90'
+    return 'abaixo da mediana' if valor < benchmark.p50 else 'acima da mediana'
@@ -0,0 +1,105 @@
+"""
+Cache dos cálculos dos dashboards, por propriedade.
+
+Cada propriedade tem uma versão de dados guardada no cache do Django. Os
+resultados dos dashboards são gravados junto com a versão vigente no momento
+do cálculo e só são reaproveitados enquanto ela não mudar. Qualquer gravação
+nos dados da propriedade troca a versão (ver signals.py), o que invalida de
+uma vez todos os resultados guardados; as entradas antigas saem do cache pela
+política de expiração do backend configurado em CACHES.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .metricas import contar
+from .models import Lote
+
+
+PREFIXO = 'propriedade'
+
+
+def _chave_versao(propriedade_id):
+    return f'{PREFIXO}:{propriedade_id}:versao'
+
+
+def _chave_dados(propriedade_id, nome, partes):
+    sufixo = ':'.join(str(parte) for parte in partes)
+    return f'{PREFIXO}:{propriedade_id}:{nome}:{sufixo}'
+
+
+def _nova_versao():
+    # Um valor novo a cada invalidação (em vez de incrementar) evita que duas
+    # invalidações concorrentes em processos diferentes resultem na mesma versão
+    return uuid.uuid4().hex
+
+
+def invalidar(propriedade_id):
+    """Troca a versão de dados da propriedade, invalidando os resultados em cache"""
+    cache.set(_chave_versao(propriedade_id), _nova_versao(), timeout=None)
+
+
+def agendar_invalidacao(propriedade_id):
+    """Invalida o cache da propriedade depois do commit da transação atual"""
+    transaction.on_commit(lambda: invalidar(propriedade_id))
+
+
+def propriedade_do_registro(instance):
+    """Id da propriedade de um registro ligado a um lote (None se o lote não existir mais)"""
+    lote = instance._state.fields_cache.get('lote')
+    if lote is not None:
+        return lote.propriedade_id
+    return Lote.objects.filter(id=instance.lote_id).values_list('propriedade_id', flat=True).first()
+
+
+def obter_ou_calcular(propriedade_id, nome, calcular, *partes):
+    """
+    Retorna o resultado em cache de ``nome`` (e das ``partes`` que o
+    identificam) para a propriedade, ou chama ``calcular()`` e guarda o
+    resultado se a versão de dados mudou desde o último cálculo.
+    """
+    chave_versao = _chave_versao(propriedade_id)
+    chave = _chave_dados(propriedade_id, nome, partes)
+
+    # Versão e resultado vêm na mesma ida ao cache
+    valores = cache.get_many([chave_versao, chave])
+    versao = valores.get(chave_versao)
+    if versao is None:
+        versao = _nova_versao()
+        if not cache.add(chave_versao, versao, timeout=None):
+            versao = cache.get(chave_versao)
+
+    guardado = valores.get(chave)
+    if guardado is not None and guardado[0] == versao:
+        contar('agrodash_cache_total', nome=nome, resultado='acerto')
+        return guardado[1]
+
+    contar('agrodash_cache_total', nome=nome, resultado='falta')
+    resultado = calcular()
+    cache.set(chave, (versao, resultado), timeout=settings.DASHBOARD_CACHE_TIMEOUT)
+    return resultado
+
+
+async def obter_ou_calcular_async(propriedade_id, nome, calcular, *partes):
+    """Versão de ``obter_ou_calcular`` para as views assíncronas; ``calcular()`` retorna um awaitable"""
+    chave_versao = _chave_versao(propriedade_id)
+    chave = _chave_dados(propriedade_id, nome, partes)
+
+    valores = await cache.aget_many([chave_versao, chave])
+    versao = valores.get(chave_versao)
+    if versao is None:
+        versao = _nova_versao()
+        if not await cache.aadd(chave_versao, versao, timeout=None):
+            versao = await cache.aget(chave_versao)
+
+    guardado = valores.get(chave)
+    if guardado is not None and guardado[0] == versao:
+        contar('agrodash_cache_total', nome=nome, resultado='acerto')
+        return guardado[1]
+
+    contar('agrodash_cache_total', nome=nome, resultado='falta')
+    resultado = await calcular()
+    await cache.aset(chave, (versao, resultado), timeout=settings.DASHBOARD_CACHE_TIMEOUT)
+    return resultado
@@ -0,0 +1,178 @@
+"""
+Abas XLSX do fluxo de caixa, do faturamento e do ponto de equilíbrio.
+
+As funções recebem dados já calculados (os mesmos das telas) e devolvem abas
+no formato de ``xlsx.gerar_xlsx``: (nome, linhas, larguras), com as linhas
+geradas sob demanda. A disposição segue a planilha "Dashboard Boi de Lucro":
+rótulos na primeira coluna e um mês por coluna, com o cabeçalho em datas.
+"""
+from datetime import date
+from decimal import Decimal
+
+from .models import CustoFixo, Receita
+from .fluxo_caixa import MESES
+from .xlsx import Celula, NUMERO_TITULO, PERCENTUAL, TITULO
+
+
+LARGURA_ROTULO = 28
+LARGURA_VALOR = 14
+
+LINHAS_CUSTOS_VARIAVEIS = (
+    ('alimentacao', 'Alimentação/Suplem.'),
+    ('sanitario_med', 'Sanitário/Med'),
+    ('servicos_outros', 'Serviços/Outros'),
+    ('impostos', 'Impostos'),
+)
+LINHAS_RESUMO = (
+    ('investimentos', 'INVESTIMENTOS'),
+    ('custos_fixos', 'CUSTOS FIXOS'),
+    ('custos_variaveis', 'CUSTOS VARIÁVEIS'),
+    ('desembolso', 'Desembolso'),
+    ('faturamento', 'FATURAMENTO'),
+    ('resultado', 'RESULTADO'),
+    ('rentabilidade', 'RENTABILIDADE'),
+    ('lucratividade', 'LUCRATIVIDADE'),
+)
+# Métricas do ponto de equilíbrio, na ordem da tela: (chave do mês, rótulo)
+LINHAS_PONTO_EQUILIBRIO = (
+    ('valor_animal', 'Valor do Animal'),
+    ('peso_entrada_kg', 'Peso Inicial (kg)'),
+    ('peso_entrada_arroba', 'Peso Inicial (@)'),
+    ('dias_mes', 'Período (dias)'),
+    ('ganho_peso_dia', 'GMD'),
+    ('custo_diaria', 'Valor da Diária (R$)'),
+    ('gasto_nutricional_mes', 'Gasto Nutricional'),
+    ('ganho_peso', 'Ganho de Peso'),
+    ('peso_saida_kg', 'Peso Final (kg)'),
+    ('rendimento_percentual', 'Rendimento'),
+    ('peso_saida_arroba', 'Peso Final (@)'),
+    ('ponto_equilibrio', 'Ponto de Equilíbrio'),
+    ('valor_final', 'Valor Final'),
+)
+
+
+def _titulo(valor):
+    return Celula(valor, NUMERO_TITULO if isinstance(valor, (int, float, Decimal)) else TITULO)
+
+
+# Fluxo de caixa
+
+def abas_fluxo_caixa(fluxos):
+    """Uma aba por ano a partir de {ano: FluxoCaixa}"""
+    for ano, fluxo in sorted(fluxos.items()):
+        yield f'Fluxo {ano}', _linhas_fluxo(fluxo), (LARGURA_ROTULO,) + (LARGURA_VALOR,) * 13 + (4, 20, 16)
+
+
+def _linhas_fluxo(fluxo):
+    """Tabela do fluxo com o resumo do ano ao lado, como na aba "Fluxo" da planilha"""
+    linhas = list(_tabela_fluxo(fluxo))
+    resumo = [[], []] + [[_titulo(rotulo), _valor_resumo(chave, fluxo.resumo[chave])] for chave, rotulo in LINHAS_RESUMO]
+    for indice, extra in enumerate(resumo):
+        if extra and indice < len(linhas):
+            linhas[indice] = linhas[indice] + [None] * (15 - len(linhas[indice])) + extra
+    return iter(linhas)
+
+
+def _valor_resumo(chave, valor):
+    if chave in ('rentabilidade', 'lucratividade'):
+        return Celula(valor / 100, PERCENTUAL)
+    return valor
+
+
+def _tabela_fluxo(fluxo):
+    yield [_titulo(f'FLUXO ANUAL {fluxo.ano}'), _titulo(0)] + [date(fluxo.ano, mes, 1) for mes in MESES]
+    yield [None, None] + list(MESES)
+    yield [_titulo('INVESTIMENTOS'), _titulo(-fluxo.investimento_animais)]
+    yield ['Aquisição de Animais', fluxo.investimento_animais]
+
+    yield [_titulo('RECEITAS'), None] + [_titulo(fluxo.total_receitas_mensal[mes]) for mes in MESES]
+    for tipo, rotulo in Receita.TIPO_CHOICES:
+        yield [rotulo, None] + [fluxo.receitas_por_mes[mes][tipo] for mes in MESES]
+
+    yield [_titulo('CUSTOS FIXOS'), None] + [_titulo(fluxo.custos_fixos_por_mes[mes]['total']) for mes in MESES]
+    for tipo, rotulo in CustoFixo.TIPO_CHOICES:
+        yield [rotulo, None] + [fluxo.custos_fixos_por_mes[mes][tipo] for mes in MESES]
+
+    yield [_titulo('CUSTOS VARIÁVEIS'), None] + [
+        _titulo(fluxo.custos_variaveis_por_mes[mes]['total']) for mes in MESES
+    ]
+    for chave, rotulo in LINHAS_CUSTOS_VARIAVEIS:
+        yield [rotulo, None] + [fluxo.custos_variaveis_por_mes[mes][chave] for mes in MESES]
+
+    yield [_titulo('FLUXO DE CAIXA LIVRE'), None] + [_titulo(fluxo.fluxo_livre[mes]) for mes in MESES]
+    yield [_titulo('FLUXO DE CAIXA ACUM'), _titulo(fluxo.fluxo_acumulado[0])] + [
+        _titulo(fluxo.fluxo_acumulado[mes]) for mes in MESES
+    ]
+
+
+# Faturamento
+
+def abas_faturamento(dados):
+    """Abas de ganho de peso, evolução, rendimento e faturamento a partir de ``_dados_faturamento``"""
+    meses = [date(mes['ano'], mes['mes'], 1) for mes in dados['meses_dados']]
+    chaves = [(mes['ano'], mes['mes']) for mes in dados['meses_dados']]
+    larguras = (LARGURA_ROTULO, LARGURA_VALOR) + (LARGURA_VALOR,) * len(meses)
+
+    yield 'Ganho de Peso', _tabela_mensal(dados['tabela_ganho'], 'ganhos_por_mes', meses, chaves), larguras
+    yield 'Evolução de Peso', _tabela_mensal(dados['tabela_evolucao'], 'pesos_por_mes', meses, chaves), larguras
+    yield 'Rendimento', _tabela_rendimento(dados), (LARGURA_ROTULO,) + (LARGURA_VALOR,) * 4
+    yield 'Faturamento', _tabela_faturamento(dados['tabela_faturamento']), (LARGURA_ROTULO,) + (LARGURA_VALOR,) * 2
+
+
+def _tabela_mensal(tabela, campo, meses, chaves):
+    yield [_titulo('Lote'), _titulo('Peso Entrada (kg)')] + meses
+    for linha in tabela:
+        valores = linha[campo]
+        yield [linha['lote_nome'], linha['peso_entrada']] + [valores.get(chave) for chave in chaves]
+
+
+def _tabela_rendimento(dados):
+    rendimento = dados['rendimento_percentual']
+    yield [_titulo('Rendimento de carcaça'), Celula(rendimento / 100, PERCENTUAL) if rendimento else None]
+    yield [_titulo('Lote'), _titulo('Peso Final (kg)'), _titulo('Rendimento (@)'),
+           _titulo('Quantidade'), _titulo('Total (@)')]
+    for linha in dados['tabela_rendimento']:
+        yield [linha['lote_nome'], linha['peso_final'], linha['rendimento_carcaca'],
+               linha['quantidade_animais'], linha['total_rendimento']]
+
+
+def _tabela_faturamento(tabela):
+    yield [_titulo('Lote'), _titulo('Valor da @'), _titulo('Faturamento')]
+    for linha in tabela:
+        yield [linha['lote_nome'], linha['valor_arroba'], linha['faturamento']]
+    if tabela:
+        yield [_titulo('Total'), None, _titulo(sum(linha['faturamento'] for linha in tabela))]
+
+
+# Ponto de equilíbrio
+
+def abas_ponto_equilibrio(dados_por_ano):
+    """
+    Uma aba por lote ("PE <lote>", como "PE LOTE 1" na planilha) com os meses
+    de todos os anos de {ano: ``_dados_ponto_equilibrio``} lado a lado.
+    """
+    meses_por_lote = {}
+    nomes = {}
+    for ano, dados in sorted(dados_por_ano.items()):
+        for lote_data in dados['dados_lotes']:
+            nomes[lote_data['lote_id']] = lote_data['lote_nome']
+            meses = meses_por_lote.setdefault(lote_data['lote_id'], [])
+            meses.extend((date(ano, mes, 1), valores) for mes, valores in sorted(lote_data['meses'].items()))
+
+    for lote_id, meses in meses_por_lote.items():
+        yield (
+            f'PE {nomes[lote_id]}',
+            _tabela_ponto_equilibrio(nomes[lote_id], meses),
+            (LARGURA_ROTULO,) + (LARGURA_VALOR,) * len(meses),
+        )
+
+
+def _tabela_ponto_equilibrio(nome, meses):
+    yield [_titulo(nome)] + [data for data, _ in meses]
+    for chave, rotulo in LINHAS_PONTO_EQUILIBRIO:
+        if chave == 'rendimento_percentual':
+            yield [rotulo] + [Celula(valores[chave] / 100, PERCENTUAL) for _, valores in meses]
+        elif chave == 'ponto_equilibrio':
+            yield [_titulo(rotulo)] + [_titulo(valores[chave]) for _, valores in meses]
+        else:
+            yield [rotulo] + [valores[chave] for _, valores in meses]
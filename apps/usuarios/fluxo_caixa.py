@@ -0,0 +1,192 @@
+"""
+Fluxo de caixa da propriedade.
+
+Busca receitas, custos fixos, gastos nutricionais e investimento em animais
+com consultas agregadas (uma por tabela, para qualquer quantidade de anos) e
+monta em memória as matrizes mensais exibidas em ``fluxo_caixa_view``.
+"""
+from decimal import Decimal
+
+from django.db.models import DecimalField, F, Sum
+
+from .models import Lote, GastoNutricional, CustoFixo, Receita
+from .perf import trecho
+from .projecao import dias_no_mes, listar_todas_async
+
+
+MESES = range(1, 13)
+# O resumo anual considera de janeiro a novembro, como na planilha original
+MESES_RESUMO = range(1, 12)
+
+PERCENTUAL_SANITARIO = Decimal('0.01')  # 1% da alimentação
+PERCENTUAL_SERVICOS = Decimal('0.01')  # 1% da receita
+PERCENTUAL_IMPOSTOS = Decimal('0.015')  # 1.5% da receita
+
+
+class FluxoCaixa:
+    """Receitas, custos e fluxo de caixa mensal de uma propriedade em um ano"""
+
+    def __init__(self, ano, investimento_animais, alimentacao, receitas, custos_fixos):
+        self.ano = ano
+        self.investimento_animais = investimento_animais
+
+        # Totais mensais de alimentação
+        self.alimentacao_mensal = {mes: alimentacao.get(mes, Decimal('0')) for mes in MESES}
+
+        # Receitas por mês e tipo
+        self.receitas_por_mes = {
+            mes: {tipo: receitas.get((mes, tipo), Decimal('0')) for tipo, _ in Receita.TIPO_CHOICES}
+            for mes in MESES
+        }
+        self.total_receitas_mensal = {mes: sum(self.receitas_por_mes[mes].values()) for mes in MESES}
+
+        # Custos fixos por mês e tipo, com o total do mês
+        self.custos_fixos_por_mes = {}
+        for mes in MESES:
+            custos_mes = {tipo: custos_fixos.get((mes, tipo), Decimal('0')) for tipo, _ in CustoFixo.TIPO_CHOICES}
+            custos_mes['total'] = sum(custos_mes.values())
+            self.custos_fixos_por_mes[mes] = custos_mes
+
+        # Custos variáveis
+        self.custos_variaveis_por_mes = {}
+        for mes in MESES:
+            alimentacao_mes = self.alimentacao_mensal[mes]
+            receita_mes = self.total_receitas_mensal[mes]
+            sanitario_med = alimentacao_mes * PERCENTUAL_SANITARIO
+            servicos_outros = receita_mes * PERCENTUAL_SERVICOS
+            impostos = receita_mes * PERCENTUAL_IMPOSTOS
+            self.custos_variaveis_por_mes[mes] = {
+                'alimentacao': alimentacao_mes,
+                'sanitario_med': sanitario_med,
+                'servicos_outros': servicos_outros,
+                'impostos': impostos,
+                'total': alimentacao_mes + sanitario_med + servicos_outros + impostos,
+            }
+
+        # Fluxo de caixa livre e acumulado (coluna 0 = investimento inicial)
+        self.fluxo_livre = {}
+        fluxo_acum = -investimento_animais
+        self.fluxo_acumulado = {0: fluxo_acum}
+        for mes in MESES:
+            fluxo_livre_mes = (
+                self.total_receitas_mensal[mes]
+                - self.custos_fixos_por_mes[mes]['total']
+                - self.custos_variaveis_por_mes[mes]['total']
+            )
+            self.fluxo_livre[mes] = fluxo_livre_mes
+            fluxo_acum += fluxo_livre_mes
+            self.fluxo_acumulado[mes] = fluxo_acum
+
+        self.resumo = self._calcular_resumo()
+
+    def _calcular_resumo(self):
+        total_custos_fixos = sum(self.custos_fixos_por_mes[mes]['total'] for mes in MESES_RESUMO)
+        total_custos_variaveis = sum(self.custos_variaveis_por_mes[mes]['total'] for mes in MESES_RESUMO)
+        total_faturamento = sum(self.total_receitas_mensal[mes] for mes in MESES_RESUMO)
+
+        investimentos = self.investimento_animais
+        desembolso = investimentos + total_custos_fixos + total_custos_variaveis
+        resultado = total_faturamento - desembolso
+        rentabilidade = (resultado / investimentos * Decimal('100')) if investimentos > 0 else Decimal('0')
+        lucratividade = (resultado / total_faturamento * Decimal('100')) if total_faturamento > 0 else Decimal('0')
+
+        return {
+            'investimentos': investimentos,
+            'custos_fixos': total_custos_fixos,
+            'custos_variaveis': total_custos_variaveis,
+            'desembolso': desembolso,
+            'faturamento': total_faturamento,
+            'resultado': resultado,
+            'rentabilidade': rentabilidade,
+            'lucratividade': lucratividade,
+        }
+
+    def contexto(self):
+        """Valores do fluxo convertidos para float, no formato usado pelo template"""
+        return {
+            'investimento_animais': float(self.investimento_animais),
+            'alimentacao_mensal': _para_float(self.alimentacao_mensal),
+            'receitas_por_mes': _para_float(self.receitas_por_mes),
+            'total_receitas_mensal': _para_float(self.total_receitas_mensal),
+            'custos_fixos_por_mes': _para_float(self.custos_fixos_por_mes),
+            'custos_variaveis_por_mes': _para_float(self.custos_variaveis_por_mes),
+            'fluxo_livre': _para_float(self.fluxo_livre),
+            'fluxo_acumulado': _para_float(self.fluxo_acumulado),
+            'resumo': _para_float(self.resumo),
+        }
+
+    @classmethod
+    def carregar(cls, propriedade, anos):
+        """
+        Monta o fluxo de caixa dos anos informados com quatro consultas
+        agregadas, independentemente da quantidade de anos.
+        Retorna {ano: FluxoCaixa}.
+        """
+        anos = list(anos)
+        lotes, gastos_diarios, receitas, custos_fixos = _consultas(propriedade, anos)
+        investimento_animais = lotes.aggregate(total=Sum('valor_compra'))['total']
+        linhas = [list(consulta) for consulta in (gastos_diarios, receitas, custos_fixos)]
+        return cls._montar(anos, investimento_animais, *linhas)
+
+    @classmethod
+    async def carregar_async(cls, propriedade, anos):
+        """Versão de ``carregar`` com as quatro consultas feitas pelo ORM assíncrono"""
+        anos = list(anos)
+        lotes, gastos_diarios, receitas, custos_fixos = _consultas(propriedade, anos)
+        investimento = await lotes.aaggregate(total=Sum('valor_compra'))
+        linhas = await listar_todas_async((gastos_diarios, receitas, custos_fixos))
+        return cls._montar(anos, investimento['total'], *linhas)
+
+    @classmethod
+    def _montar(cls, anos, investimento_animais, gastos_diarios, linhas_receitas, linhas_custos_fixos):
+        with trecho('fluxo_caixa'):
+            investimento_animais = investimento_animais or Decimal('0')
+
+            # Gasto diário × quantidade de animais somado por mês; os dias do mês entram aqui
+            alimentacao = {ano: {} for ano in anos}
+            for linha in gastos_diarios:
+                alimentacao[linha['ano']][linha['mes']] = linha['total'] * Decimal(dias_no_mes(linha['ano'], linha['mes']))
+
+            receitas = {ano: {} for ano in anos}
+            for linha in linhas_receitas:
+                receitas[linha['ano']][(linha['mes'], linha['tipo'])] = linha['total']
+
+            custos_fixos = {ano: {} for ano in anos}
+            for linha in linhas_custos_fixos:
+                custos_fixos[linha['ano']][(linha['mes'], linha['tipo'])] = linha['total']
+
+            return {
+                ano: cls(ano, investimento_animais, alimentacao[ano], receitas[ano], custos_fixos[ano])
+                for ano in anos
+            }
+
+    @classmethod
+    def do_ano(cls, propriedade, ano):
+        return cls.carregar(propriedade, [ano])[ano]
+
+
+def _consultas(propriedade, anos):
+    # Lotes (para o investimento), gastos diários × animais por mês e receitas e custos por mês e tipo
+    lotes = Lote.objects.filter(propriedade=propriedade)
+    gastos_diarios = GastoNutricional.objects.filter(lote__propriedade=propriedade, ano__in=anos).values(
+        'ano', 'mes'
+    ).annotate(
+        total=Sum(F('gasto_diario') * F('lote__quantidade'),
+                  output_field=DecimalField(max_digits=20, decimal_places=2))
+    ).order_by()
+    return (
+        lotes, gastos_diarios, _somar_por_mes_e_tipo(Receita, propriedade, anos),
+        _somar_por_mes_e_tipo(CustoFixo, propriedade, anos),
+    )
+
+
+def _somar_por_mes_e_tipo(modelo, propriedade, anos):
+    return modelo.objects.filter(propriedade=propriedade, ano__in=anos).values(
+        'ano', 'mes', 'tipo'
+    ).annotate(total=Sum('valor')).order_by()
+
+
+def _para_float(valores):
+    if isinstance(valores, dict):
+        return {chave: _para_float(valor) for chave, valor in valores.items()}
+    return float(valores)
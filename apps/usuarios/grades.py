@@ -0,0 +1,116 @@
+"""
+Gravação das grades mensais (lote × mês, tipo × mês) enviadas pelos formulários.
+
+Cada célula preenchida é validada pelo próprio campo do modelo e as válidas
+são gravadas com um único INSERT ... ON CONFLICT DO UPDATE por modelo, dentro
+da transação da view. Como ``bulk_create`` não dispara sinais, quem grava
+agenda o recálculo do livro mensal e a invalidação do cache com
+``agendar_recalculo``.
+"""
+from django.core.exceptions import ValidationError
+from django.db import connections, transaction
+
+from .cache_propriedade import invalidar
+from .lote_mes import atualizar_lotes
+from .projecao import MESES_NOMES
+
+
+class ErroCelula:
+    """Célula rejeitada na validação"""
+
+    def __init__(self, nome, rotulo, mensagem):
+        self.nome = nome
+        self.rotulo = rotulo
+        self.mensagem = mensagem
+
+    def __str__(self):
+        return f'{self.rotulo}: {self.mensagem}'
+
+
+class LeitorGrade:
+    """Lê as células de uma grade do POST, guardando os erros de validação"""
+
+    def __init__(self, dados):
+        self.dados = dados
+        self.erros = []
+
+    def valor(self, nome, campo, rotulo):
+        """Valor da célula validado pelo campo do modelo; None se ausente, vazia ou inválida"""
+        if nome not in self.dados:
+            return None
+        bruto = self.dados[nome].strip()
+        if not bruto:
+            return None
+        try:
+            return campo.clean(bruto, None)
+        except ValidationError as e:
+            self.erros.append(ErroCelula(nome, rotulo, ' '.join(e.messages)))
+            return None
+
+    def vazia(self, nome):
+        """A célula veio no formulário, mas foi esvaziada"""
+        return nome in self.dados and not self.dados[nome].strip()
+
+    def mensagem_erros(self):
+        return 'Valores não salvos: ' + '; '.join(str(erro) for erro in self.erros)
+
+
+def ler_grade_por_tipo(leitor, modelo, prefixo, campo_valor, **fixos):
+    """
+    Lê a grade tipo × mês de ``modelo`` (células ``{prefixo}_{tipo}_{mes}``) e
+    monta os objetos das células válidas com os valores ``fixos`` (propriedade, ano).
+    """
+    campo = modelo._meta.get_field(campo_valor)
+    objetos = []
+    for tipo, tipo_nome in modelo.TIPO_CHOICES:
+        for mes in range(1, 13):
+            valor = leitor.valor(f'{prefixo}_{tipo}_{mes}', campo, f'{tipo_nome} ({MESES_NOMES[mes]})')
+            if valor is not None:
+                objetos.append(modelo(tipo=tipo, mes=mes, **{campo_valor: valor}, **fixos))
+    return objetos
+
+
+def salvar_grade(modelo, objetos, unique_fields, update_fields):
+    """Insere ou atualiza os objetos em um único comando; retorna quantos foram gravados"""
+    if not objetos:
+        return 0
+    modelo.objects.bulk_create(
+        objetos,
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=[*update_fields, 'data_atualizacao'],
+    )
+    return len(objetos)
+
+
+def apagar_celulas(queryset):
+    """
+    Apaga as linhas do queryset em um único DELETE, sem carregar os objetos
+    nem disparar sinais (o equivalente de ``bulk_create`` para exclusão); o
+    recálculo fica a cargo de ``agendar_recalculo``. Retorna quantas apagou.
+    """
+    modelo = queryset.model
+    conexao = connections[queryset.db]
+    nome = conexao.ops.quote_name
+    selecao, parametros = queryset.order_by().values('pk').query.sql_with_params()
+    with conexao.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {nome(modelo._meta.db_table)} WHERE {nome(modelo._meta.pk.column)} IN ({selecao})',
+            parametros,
+        )
+        return cursor.rowcount
+
+
+def agendar_recalculo(propriedade_id, lote_ids=(), desde=None):
+    """
+    Depois do commit, recalcula o livro mensal dos lotes gravados (a partir de
+    ``desde`` = (ano, mes)) e invalida o cache da propriedade, nessa ordem.
+    """
+    lote_ids = list(lote_ids)
+
+    def recalcular():
+        if lote_ids:
+            atualizar_lotes(lote_ids, desde=desde)
+        invalidar(propriedade_id)
+
+    transaction.on_commit(recalcular)
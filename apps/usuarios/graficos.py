@@ -0,0 +1,60 @@
+"""
+Dados dos gráficos dos dashboards servidos como JSON com GET condicional.
+
+Cada gráfico declara de quais tabelas depende. A ETag e o Last-Modified da
+resposta saem do maior ``data_atualizacao`` e da quantidade de linhas dessas
+tabelas (a quantidade cobre exclusões, que não mexem no máximo), então o
+navegador recebe 304 enquanto os dados da propriedade não mudarem.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+
+from .models import Lote, ProjecaoGanho, LoteMes
+
+
+# Trocar quando o formato dos dados dos gráficos mudar, para descartar o que os navegadores guardaram
+VERSAO_FORMATO = 1
+
+
+class Grafico:
+    """Um gráfico de dashboard: onde estão seus dados e de quais tabelas ele depende"""
+
+    def __init__(self, dashboard, modelos):
+        # Nome do cálculo em cache (cache_propriedade), cujo resultado traz os dados em ['graficos'][nome]
+        self.dashboard = dashboard
+        # Modelos com FK para lote (ou o próprio Lote) cujas alterações mudam o gráfico
+        self.modelos = modelos
+
+
+GRAFICOS = {
+    'lotes-peso': Grafico('lotes_dashboard', [Lote, LoteMes]),
+    'nutricional-por-animal': Grafico('nutricional_dashboard', [Lote, LoteMes]),
+    'nutricional-por-lote': Grafico('nutricional_dashboard', [Lote, LoteMes]),
+    'faturamento-ganho': Grafico('faturamento', [Lote, ProjecaoGanho]),
+    'faturamento-evolucao': Grafico('faturamento', [Lote, ProjecaoGanho]),
+}
+
+
+class MarcaDados:
+    """Última atualização e assinatura das linhas de que um gráfico depende"""
+
+    def __init__(self, nome, agregados):
+        datas = [ultima for ultima, _ in agregados if ultima is not None]
+        self.ultima_atualizacao = max(datas) if datas else None
+        assinatura = repr((VERSAO_FORMATO, nome, [
+            (ultima.isoformat() if ultima else None, quantidade) for ultima, quantidade in agregados
+        ]))
+        self.etag = hashlib.sha1(assinatura.encode()).hexdigest()
+
+
+def marca_dados(grafico, nome, propriedade):
+    """Uma consulta agregada por tabela de origem do gráfico"""
+    agregados = []
+    for modelo in grafico.modelos:
+        filtro = {'propriedade': propriedade} if modelo is Lote else {'lote__propriedade': propriedade}
+        resultado = modelo.objects.filter(**filtro).aggregate(
+            ultima=Max('data_atualizacao'), quantidade=Count('id')
+        )
+        agregados.append((resultado['ultima'], resultado['quantidade']))
+    return MarcaDados(nome, agregados)
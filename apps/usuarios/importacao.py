@@ -0,0 +1,513 @@
+"""
+Importação da planilha "Dashboard Boi de Lucro", de onde os clientes migram.
+
+As tabelas são localizadas pelo texto dos títulos e cabeçalhos (e não por
+posição fixa das células) e mapeadas para os models:
+
+- "Dados Básicos": perguntas e respostas -> campos de ``Propriedade``
+- "Dados de Prod": histórico do plantel -> ``Lote``; projeção de ganho (kg)
+  -> ``ProjecaoGanho``; gasto nutricional (R$/dia) -> ``GastoNutricional``
+- "Fluxo": linhas de custo fixo e de receita com uma coluna por mês (datas
+  no cabeçalho) -> ``CustoFixo`` e ``Receita``
+
+As abas são lidas linha a linha (ver xlsx.py) e os registros são gravados
+em blocos de ``tamanho_bloco`` com INSERT ... ON CONFLICT DO UPDATE, dentro de
+uma única transação. Na simulação nada é gravado: cada bloco só é comparado
+com o que já está no banco para montar o resumo de novos, alterados e iguais.
+"""
+from decimal import Decimal
+import unicodedata
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.utils import timezone
+
+from .grades import agendar_recalculo, salvar_grade
+from .models import Propriedade, Lote, ProjecaoGanho, GastoNutricional, CustoFixo, Receita
+from .xlsx import data_excel
+
+
+ABA_DADOS_BASICOS = 'Dados Básicos'
+ABA_PRODUCAO = 'Dados de Prod'
+ABA_FLUXO = 'Fluxo'
+
+# Alterações guardadas para exibição por model; as demais só entram na contagem
+LIMITE_DETALHES = 50
+# Números a partir deste valor no cabeçalho do fluxo são datas (seriais do Excel a partir de 2000)
+SERIAL_DATA_MINIMO = 36526
+
+
+def normalizar(texto):
+    """Minúsculas, sem acentos, espaços simples e sem pontuação final"""
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(letra for letra in texto if not unicodedata.combining(letra))
+    return ' '.join(texto.lower().split()).rstrip('?:. ')
+
+
+# Pergunta da aba "Dados Básicos" -> campo de Propriedade
+PERGUNTAS_DADOS_BASICOS = {normalizar(pergunta): campo for pergunta, campo in [
+    ('Proprietário?', 'proprietario'),
+    ('Município/Estado?', 'municipio_estado'),
+    ('Próprio ou Arrendamento?', 'proprio_ou_arrendamento'),
+    ('Qual o Índice Pluviométrico?', 'indice_pluviometrico'),
+    ('Qual a área total em há?', 'area_total_ha'),
+    ('Qual a área útil de pastagem em há?', 'area_util_pastagem_ha'),
+    ('Qual a quantidade Pastos?', 'quantidade_pastos'),
+    ('Qual o tamanho médio dos pastos?', 'tamanho_medio_pastos'),
+    ('Faz rotacionado?', 'faz_rotacionado'),
+    ('Em quantos % da área?', 'percentual_area_rotacionada'),
+    ('Faz Adubação?', 'faz_adubacao'),
+    ('Faz Correção de solo?', 'faz_correcao_solo'),
+    ('Com qual rotina?', 'rotina_correcao'),
+    ('Possue área destinada a produção de volumoso?', 'possui_area_volumoso'),
+    ('Qual o tamanho (ha)?', 'tamanho_area_volumoso_ha'),
+    ('Faz integração Lavoura Pecuária?', 'faz_integracao_lavoura_pecuaria'),
+    ('Qual a quantidade de Animais?', 'quantidade_animais'),
+    ('Qual o sexo dos Animais?', 'sexo_animais'),
+    ('Qual o tipo/raça dos Animais?', 'tipo_raca_animais'),
+    ('Qual o tipo de Suplementação?', 'tipo_suplementacao'),
+    ('Faz cria, recria ou engorda?', 'cria_recria_ou_engorda'),
+    ('Qual a quantidade de Animais por lote e Peso?', 'quantidade_animais_lote_peso'),
+    ('Compra de gado de produtor ou Leilão?', 'compra_gado_produtor_ou_leilao'),
+    ('Qual o Tipo de Terminação à pasto/TIP/confinamento?', 'tipo_terminacao'),
+    ('Qual a Taxa de Desfrute/Quantidade de Animais Vendidos/ano?', 'taxa_desfrute'),
+    ('Qual a idade média de abate?', 'idade_media_abate'),
+    ('Quais as plantas frigoríficas mais utilizadas?', 'plantas_frigorificas'),
+    ('Qual a quantidade de funcionários?', 'quantidade_funcionarios'),
+    ('Utiliza algum software de gestão, qual?', 'utiliza_software_gestao'),
+    ('Qual software de gestão?', 'qual_software_gestao'),
+    ('Possui Balança?', 'possui_balanca'),
+    ('Qual frequência de pesagem?', 'frequencia_pesagem'),
+    ('Utiliza controle individual Brinco/chip?', 'utiliza_controle_individual'),
+    ('Brinco/chip?', 'tipo_brinco_chip'),
+    ('Faz confinamento?', 'faz_confinamento'),
+    ('Qual o estático?', 'estatico_confinamento'),
+    ('Tem fábrica de Ração?', 'tem_fabrica_racao'),
+    ('Possui Moinho?', 'possui_moinho'),
+    ('Possui Vagão Forrageiro?', 'possui_vagao_forrageiro'),
+    ('Qual a capacidade de armazenagem de volumoso galpão/silo?', 'capacidade_armazenagem_volumoso'),
+    ('Qual a capacidade de armazenagem de grãos galpão/silo?', 'capacidade_armazenagem_graos'),
+]}
+
+# A planilha modelo marca com "X" a coluna onde vai a resposta
+MARCADORES_RESPOSTA = {'', 'x'}
+RESPOSTAS_SIM = {'sim', 's', 'yes', 'true', '1'}
+RESPOSTAS_NAO = {'nao', 'n', 'no', 'false', '0'}
+
+ANCORA_PLANTEL = 'historico do plantel'
+# Início do cabeçalho da coluna -> campo de Lote
+CABECALHOS_PLANTEL = [
+    ('sexo', 'sexo'),
+    ('idade', 'idade_meses'),
+    ('quant', 'quantidade'),
+    ('peso kg', 'peso_kg'),
+    ('peso @', 'peso_arroba'),
+    ('valor de compra', 'valor_compra'),
+]
+# Título da tabela lote × mês -> (model, campo do valor)
+TABELAS_MENSAIS = {
+    'projecao de ganho (kg)': (ProjecaoGanho, 'gmd_kg'),
+    'gasto nutricional (r$/dia)': (GastoNutricional, 'gasto_diario'),
+}
+MESES_CABECALHO = {
+    **{normalizar(nome): mes for mes, nome in ProjecaoGanho.MES_CHOICES},
+    **{normalizar(nome)[:3]: mes for mes, nome in ProjecaoGanho.MES_CHOICES},
+}
+# Rótulo da linha do fluxo -> (model, tipo)
+LINHAS_FLUXO = {
+    **{normalizar(rotulo): (CustoFixo, tipo) for tipo, rotulo in CustoFixo.TIPO_CHOICES},
+    **{normalizar(rotulo): (Receita, tipo) for tipo, rotulo in Receita.TIPO_CHOICES},
+}
+
+# Model -> (campos únicos, campo do valor)
+GRAVACOES = {
+    ProjecaoGanho: (('lote', 'mes', 'ano'), 'gmd_kg'),
+    GastoNutricional: (('lote', 'mes', 'ano'), 'gasto_diario'),
+    CustoFixo: (('propriedade', 'tipo', 'mes', 'ano'), 'valor'),
+    Receita: (('propriedade', 'tipo', 'mes', 'ano'), 'valor'),
+}
+
+
+class Resumo:
+    """Contagem de registros novos, alterados e iguais de um model"""
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self.novos = 0
+        self.alterados = 0
+        self.iguais = 0
+        self.alteracoes = []
+
+    def alterado(self, descricao, antes, depois):
+        self.alterados += 1
+        if len(self.alteracoes) < LIMITE_DETALHES:
+            self.alteracoes.append(f'{descricao}: {antes} → {depois}')
+
+    def __str__(self):
+        return (
+            f'{self.modelo._meta.verbose_name_plural}: {self.novos} novo(s), '
+            f'{self.alterados} alterado(s), {self.iguais} igual(is)'
+        )
+
+
+class ImportadorPlanilha:
+    """
+    Importa a planilha para a propriedade. Com ``simular``, só compara com o
+    banco. Meses de "Dados de Prod" (que não têm ano na planilha) vão para ``ano``.
+    """
+
+    def __init__(self, propriedade, ano, simular=False, tamanho_bloco=1000):
+        self.propriedade = propriedade
+        self.ano = ano
+        self.simular = simular
+        self.tamanho_bloco = tamanho_bloco
+        self.erros = []
+        self.resumos = {}
+        self.lote_ids = set()
+        self._lotes = {}
+        self._lotes_novos = []
+        self._lotes_alterados = {}
+        self._pendentes = {}
+
+    def importar(self, leitor):
+        if self.simular:
+            self._importar(leitor)
+            return
+        with transaction.atomic():
+            if self.propriedade.pk is None:
+                self.propriedade.save()
+            self._importar(leitor)
+            # bulk_create não dispara sinais: livro mensal e cache são atualizados no commit
+            agendar_recalculo(self.propriedade.id, self.lote_ids)
+
+    def _importar(self, leitor):
+        if self.propriedade.pk is not None:
+            # Em nomes repetidos vale o lote mais antigo
+            for lote in Lote.objects.filter(propriedade=self.propriedade).order_by('-id'):
+                self._lotes[normalizar(lote.nome)] = lote
+
+        for aba, importar_aba in (
+            (ABA_DADOS_BASICOS, self._dados_basicos),
+            (ABA_PRODUCAO, self._producao),
+            (ABA_FLUXO, self._fluxo),
+        ):
+            if aba in leitor.abas:
+                importar_aba(aba, leitor.linhas(aba))
+            else:
+                self.erros.append(f'Aba "{aba}" não encontrada; nada importado dela.')
+
+        for modelo in list(self._pendentes):
+            self._gravar(modelo)
+
+    def _resumo(self, modelo):
+        if modelo not in self.resumos:
+            self.resumos[modelo] = Resumo(modelo)
+        return self.resumos[modelo]
+
+    def _converter(self, aba, referencia, campo, bruto):
+        """Valor da célula validado pelo campo do model; None (com o erro anotado) se inválido"""
+        try:
+            return _valor_do_campo(campo, bruto)
+        except ValidationError as e:
+            self.erros.append(f'{aba}!{referencia} ({campo.verbose_name}): {" ".join(e.messages)}')
+            return None
+
+    # Dados Básicos
+
+    def _dados_basicos(self, aba, linhas):
+        resumo = self._resumo(Propriedade)
+        alterados = []
+        for numero, celulas in linhas:
+            itens = list(celulas.items())
+            for indice, (coluna, valor) in enumerate(itens):
+                nome_campo = PERGUNTAS_DADOS_BASICOS.get(normalizar(valor)) if isinstance(valor, str) else None
+                if nome_campo:
+                    break
+            else:
+                continue
+
+            # A resposta é a primeira célula preenchida à direita da pergunta
+            resposta = next(
+                ((c, v) for c, v in itens[indice + 1:] if normalizar(v) not in MARCADORES_RESPOSTA), None
+            )
+            if resposta is None:
+                continue
+            campo = Propriedade._meta.get_field(nome_campo)
+            valor = self._converter(aba, f'{resposta[0]}{numero}', campo, resposta[1])
+            if valor is None:
+                continue
+            antes = getattr(self.propriedade, nome_campo)
+            if antes == valor:
+                resumo.iguais += 1
+            else:
+                resumo.alterado(campo.verbose_name, antes, valor)
+                setattr(self.propriedade, nome_campo, valor)
+                alterados.append(nome_campo)
+
+        if alterados and not self.simular:
+            self.propriedade.save(update_fields=[*alterados, 'data_atualizacao'])
+
+    # Dados de Prod
+
+    def _producao(self, aba, linhas):
+        tabela = None  # 'plantel' ou (model, campo do valor)
+        coluna_rotulo = None
+        colunas = None  # coluna -> campo do lote ou mês
+        ultima_linha = 0
+        for numero, celulas in linhas:
+            if numero > ultima_linha + 1 and tabela is not None and colunas is not None:
+                # Uma linha em branco encerra a tabela
+                self._gravar_lotes()
+                tabela = None
+            ultima_linha = numero
+            textos = {coluna: normalizar(valor) for coluna, valor in celulas.items() if isinstance(valor, str)}
+
+            # Título de uma tabela: a coluna do título é a dos nomes dos lotes
+            ancora = next(
+                ((coluna, texto) for coluna, texto in textos.items()
+                 if texto == ANCORA_PLANTEL or texto in TABELAS_MENSAIS), None
+            )
+            if ancora is not None:
+                self._gravar_lotes()
+                coluna_rotulo = ancora[0]
+                tabela = 'plantel' if ancora[1] == ANCORA_PLANTEL else TABELAS_MENSAIS[ancora[1]]
+                colunas = None
+                continue
+            if tabela is None:
+                continue
+
+            if colunas is None:
+                colunas = _colunas_cabecalho(textos, tabela)
+                continue
+
+            rotulo = celulas.get(coluna_rotulo)
+            if not isinstance(rotulo, str) or not rotulo.strip():
+                # Fim da tabela
+                self._gravar_lotes()
+                tabela = None
+                continue
+            if normalizar(rotulo) == 'dias':
+                continue
+
+            if tabela == 'plantel':
+                self._lote(aba, numero, rotulo.strip(), {
+                    nome_campo: (coluna, celulas[coluna]) for coluna, nome_campo in colunas.items() if coluna in celulas
+                })
+            else:
+                self._linha_mensal(aba, numero, rotulo.strip(), celulas, colunas, *tabela)
+
+        self._gravar_lotes()
+
+    def _lote(self, aba, numero, nome, valores):
+        resumo = self._resumo(Lote)
+        chave = normalizar(nome)
+        lote = self._lotes.get(chave)
+        novo = lote is None
+
+        convertidos = {}
+        for nome_campo, (coluna, bruto) in valores.items():
+            valor = self._converter(aba, f'{coluna}{numero}', Lote._meta.get_field(nome_campo), bruto)
+            if valor is not None:
+                convertidos[nome_campo] = valor
+
+        if novo:
+            faltando = [
+                str(Lote._meta.get_field(nome_campo).verbose_name)
+                for _, nome_campo in CABECALHOS_PLANTEL if nome_campo not in convertidos
+            ]
+            if faltando:
+                self.erros.append(f'{aba}!{numero}: lote "{nome}" sem {", ".join(faltando)}; não importado.')
+                return
+            lote = Lote(propriedade=self.propriedade, nome=nome, tipo=_tipo_do_nome(nome), **convertidos)
+            self._lotes[chave] = lote
+            self._lotes_novos.append(lote)
+            resumo.novos += 1
+        else:
+            mudancas = {nome_campo: valor for nome_campo, valor in convertidos.items()
+                        if getattr(lote, nome_campo) != valor}
+            if not mudancas:
+                resumo.iguais += 1
+                return
+            for nome_campo, valor in mudancas.items():
+                resumo.alterado(f'{nome} ({Lote._meta.get_field(nome_campo).verbose_name})',
+                                getattr(lote, nome_campo), valor)
+                setattr(lote, nome_campo, valor)
+            self._lotes_alterados.setdefault(lote.id, (lote, set()))[1].update(mudancas)
+
+        if len(self._lotes_novos) + len(self._lotes_alterados) >= self.tamanho_bloco:
+            self._gravar_lotes()
+
+    def _gravar_lotes(self):
+        """Cria e atualiza os lotes lidos até aqui (antes das tabelas mensais que os referenciam)"""
+        if not self.simular:
+            if self._lotes_novos:
+                Lote.objects.bulk_create(self._lotes_novos, batch_size=self.tamanho_bloco)
+            if self._lotes_alterados:
+                agora = timezone.now()
+                campos = {'data_atualizacao'}
+                for lote, alterados in self._lotes_alterados.values():
+                    # bulk_update não aplica o auto_now
+                    lote.data_atualizacao = agora
+                    campos |= alterados
+                Lote.objects.bulk_update(
+                    [lote for lote, _ in self._lotes_alterados.values()], sorted(campos),
+                    batch_size=self.tamanho_bloco
+                )
+            self.lote_ids.update(lote.id for lote in self._lotes_novos)
+            self.lote_ids.update(self._lotes_alterados)
+        self._lotes_novos = []
+        self._lotes_alterados = {}
+
+    def _linha_mensal(self, aba, numero, nome, celulas, colunas, modelo, nome_campo):
+        lote = self._lotes.get(normalizar(nome))
+        if lote is None:
+            self.erros.append(f'{aba}!{numero}: lote "{nome}" não está no histórico do plantel; linha ignorada.')
+            return
+        campo = modelo._meta.get_field(nome_campo)
+        for coluna, mes in colunas.items():
+            bruto = celulas.get(coluna)
+            if bruto is None:
+                continue
+            valor = self._converter(aba, f'{coluna}{numero}', campo, bruto)
+            if valor is not None:
+                self._adicionar(modelo(lote=lote, ano=self.ano, mes=mes, **{nome_campo: valor}))
+
+    # Fluxo
+
+    def _fluxo(self, aba, linhas):
+        colunas = None  # coluna -> (ano, mes)
+        for numero, celulas in linhas:
+            if colunas is None:
+                # Cabeçalho: a primeira linha com datas
+                colunas = {
+                    coluna: (data.year, data.month)
+                    for coluna, data in (
+                        (coluna, data_excel(valor)) for coluna, valor in celulas.items()
+                        if isinstance(valor, Decimal) and valor >= SERIAL_DATA_MINIMO
+                    )
+                } or None
+                continue
+
+            linha = next(
+                (LINHAS_FLUXO[normalizar(valor)] for valor in celulas.values()
+                 if isinstance(valor, str) and normalizar(valor) in LINHAS_FLUXO), None
+            )
+            if linha is None:
+                continue
+            modelo, tipo = linha
+            campo = modelo._meta.get_field('valor')
+            for coluna, (ano, mes) in colunas.items():
+                bruto = celulas.get(coluna)
+                if bruto is None:
+                    continue
+                valor = self._converter(aba, f'{coluna}{numero}', campo, bruto)
+                if valor is not None:
+                    self._adicionar(modelo(propriedade=self.propriedade, tipo=tipo, ano=ano, mes=mes, valor=valor))
+
+    # Gravação em blocos
+
+    def _adicionar(self, objeto):
+        pendentes = self._pendentes.setdefault(type(objeto), [])
+        pendentes.append(objeto)
+        if len(pendentes) >= self.tamanho_bloco:
+            self._gravar(type(objeto))
+
+    def _gravar(self, modelo):
+        """Compara o bloco com o banco (uma consulta) e grava os novos e alterados"""
+        unicos, nome_campo = GRAVACOES[modelo]
+        atributos = [modelo._meta.get_field(nome).attname for nome in unicos]
+
+        def chave(objeto):
+            # Na simulação os lotes novos ainda não têm id
+            lote = objeto.lote if 'lote' in unicos else None
+            if lote is not None and lote.pk is None:
+                return (id(lote), *(getattr(objeto, atributo) for atributo in atributos[1:]))
+            return tuple(getattr(objeto, atributo) for atributo in atributos)
+
+        # Células repetidas na planilha: vale a última
+        objetos = {}
+        for objeto in self._pendentes.pop(modelo, []):
+            objetos[chave(objeto)] = objeto
+        if not objetos:
+            return
+
+        existentes = {}
+        salvos = [objeto for objeto in objetos.values() if getattr(objeto, atributos[0]) is not None]
+        if salvos:
+            filtro = {f'{atributo}__in': {getattr(objeto, atributo) for objeto in salvos} for atributo in atributos}
+            for *chave_existente, valor in modelo.objects.filter(**filtro).values_list(*atributos, nome_campo):
+                existentes[tuple(chave_existente)] = valor
+
+        resumo = self._resumo(modelo)
+        gravar = []
+        for chave_objeto, objeto in objetos.items():
+            if chave_objeto not in existentes:
+                resumo.novos += 1
+            elif existentes[chave_objeto] != getattr(objeto, nome_campo):
+                resumo.alterado(_descricao(objeto), existentes[chave_objeto], getattr(objeto, nome_campo))
+            else:
+                resumo.iguais += 1
+                continue
+            gravar.append(objeto)
+
+        if not self.simular:
+            salvar_grade(modelo, gravar, list(unicos), [nome_campo])
+            if 'lote' in unicos:
+                self.lote_ids.update(objeto.lote_id for objeto in gravar)
+
+
+def _colunas_cabecalho(textos, tabela):
+    """Colunas do cabeçalho da tabela (None se a linha não for o cabeçalho)"""
+    if tabela == 'plantel':
+        colunas = {}
+        for coluna, texto in textos.items():
+            for inicio, nome_campo in CABECALHOS_PLANTEL:
+                if texto.startswith(inicio):
+                    colunas[coluna] = nome_campo
+                    break
+        return colunas if 'sexo' in colunas.values() else None
+    colunas = {coluna: MESES_CABECALHO[texto] for coluna, texto in textos.items() if texto in MESES_CABECALHO}
+    return colunas or None
+
+
+def _valor_do_campo(campo, bruto):
+    """Converte o valor da célula para o campo do model e valida (ValidationError se inválido)"""
+    if isinstance(campo, models.BooleanField):
+        if isinstance(bruto, bool):
+            return bruto
+        resposta = normalizar(bruto)
+        if resposta in RESPOSTAS_SIM:
+            return True
+        if resposta in RESPOSTAS_NAO:
+            return False
+        raise ValidationError('Responda Sim ou Não.')
+
+    if isinstance(bruto, Decimal):
+        if isinstance(campo, models.DecimalField):
+            bruto = bruto.quantize(Decimal(1).scaleb(-campo.decimal_places))
+        elif isinstance(campo, models.IntegerField):
+            if bruto != bruto.to_integral_value():
+                raise ValidationError('Informe um número inteiro.')
+            bruto = int(bruto)
+        elif isinstance(campo, models.CharField):
+            bruto = format(bruto.normalize(), 'f')
+    elif isinstance(bruto, str):
+        bruto = bruto.strip()
+        if campo.choices:
+            # Aceita o rótulo da opção ("Macho") além do valor ("M")
+            rotulos = {normalizar(rotulo): valor for valor, rotulo in campo.choices}
+            bruto = rotulos.get(normalizar(bruto), bruto)
+    return campo.clean(bruto, None)
+
+
+def _tipo_do_nome(nome):
+    """'Pasto da Mata' -> pasto, 'Curral 01' -> curral; os demais são lotes"""
+    primeira = normalizar(nome).split(' ', 1)[0]
+    return primeira if primeira in ('pasto', 'curral') else 'lote'
+
+
+def _descricao(objeto):
+    periodo = f'{objeto.get_mes_display()}/{objeto.ano}'
+    if hasattr(objeto, 'tipo'):
+        return f'{objeto.get_tipo_display()} {periodo}'
+    return f'{objeto.lote.nome} {periodo}'
@@ -0,0 +1,151 @@
+"""
+Manutenção do livro mensal dos lotes (LoteMes).
+
+Cada linha guarda, para um lote em um mês, o ganho projetado, o peso acumulado
+e o gasto nutricional já calculados, para que os dashboards leiam tudo com uma
+única consulta. O livro é recalculado por lote, a partir do mês alterado,
+sempre que uma projeção, gasto, período personalizado ou o próprio lote mudam
+(ver signals.py), e pode ser reconstruído com o comando ``rebuild_lote_mes``.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Lote, LoteMes
+from .projecao import carregar_dados, dias_no_mes, projetar
+
+
+CAMPOS_CALCULADOS = [
+    'dias_mes', 'periodo_dias', 'gmd_kg', 'ganho_kg', 'peso_acumulado_kg',
+    'gasto_diario', 'gasto_mensal', 'gasto_total_lote', 'data_atualizacao',
+]
+
+# Atributo da conexão com os recálculos agendados na transação em andamento
+ATRIBUTO_PENDENTES = 'livro_mensal_pendente'
+
+
+def calcular_linhas(lotes):
+    """Calcula (sem gravar) as linhas do livro mensal dos lotes informados"""
+    if not lotes:
+        return []
+
+    # Projeções, períodos e gastos de todos os lotes; o peso acumulado é contínuo e usa os dias do mês
+    dados = carregar_dados(None, lotes=lotes, com_periodos=True, com_gastos=True)
+    matriz = projetar(dados)
+
+    gastos_por_lote = {}
+    for (lote_id, ano, mes), gasto_diario in dados.gastos.items():
+        gastos_por_lote.setdefault(lote_id, {})[(ano, mes)] = gasto_diario
+
+    linhas = []
+    for lote in lotes:
+        projecao = matriz.get(lote.id)
+        meses_projetados = projecao.por_chave if projecao else {}
+        gastos_lote = gastos_por_lote.get(lote.id, {})
+        quantidade = Decimal(lote.quantidade)
+
+        for ano, mes in sorted(set(meses_projetados) | set(gastos_lote)):
+            dias_mes = dias_no_mes(ano, mes)
+            linha = LoteMes(
+                lote=lote,
+                ano=ano,
+                mes=mes,
+                dias_mes=dias_mes,
+                periodo_dias=dados.periodos.get((lote.id, ano, mes)),
+            )
+
+            mes_projetado = meses_projetados.get((ano, mes))
+            if mes_projetado is not None:
+                linha.gmd_kg = mes_projetado.gmd
+                linha.ganho_kg = mes_projetado.ganho
+                linha.peso_acumulado_kg = mes_projetado.peso_saida
+
+            gasto_diario = gastos_lote.get((ano, mes))
+            if gasto_diario is not None:
+                linha.gasto_diario = gasto_diario
+                linha.gasto_mensal = gasto_diario * Decimal(dias_mes)
+                linha.gasto_total_lote = linha.gasto_mensal * quantidade
+
+            linhas.append(linha)
+    return linhas
+
+
+def atualizar_lotes(lote_ids, desde=None):
+    """
+    Recalcula e grava o livro mensal dos lotes informados. Com ``desde``
+    (ano, mes), apenas as linhas a partir desse mês são regravadas.
+    """
+    lote_ids = list(lote_ids)
+    lotes = list(Lote.objects.filter(id__in=lote_ids))
+    linhas = calcular_linhas(lotes)
+
+    antigas = LoteMes.objects.filter(lote_id__in=lote_ids)
+    if desde is not None:
+        ano, mes = desde
+        antigas = antigas.filter(Q(ano__gt=ano) | Q(ano=ano, mes__gte=mes))
+        linhas = [linha for linha in linhas if (linha.ano, linha.mes) >= desde]
+
+    with transaction.atomic():
+        antigas.delete()
+        # update_conflicts protege contra uma gravação concorrente do mesmo lote
+        LoteMes.objects.bulk_create(
+            linhas,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['lote', 'ano', 'mes'],
+            update_fields=CAMPOS_CALCULADOS,
+        )
+    return len(linhas)
+
+
+class AtualizacoesPendentes:
+    """
+    Recálculos do livro agendados na transação atual, reunidos em um único
+    callback de commit: lote_id -> mês a partir do qual recalcular (None = o
+    livro inteiro), guardando o mês mais antigo de cada lote.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.desde = {}
+        self.agendada = False
+
+    def incluir(self, lote_id, desde):
+        if lote_id in self.desde:
+            anterior = self.desde[lote_id]
+            desde = None if anterior is None or desde is None else min(anterior, desde)
+        self.desde[lote_id] = desde
+
+    def ativa(self):
+        # Um rollback descarta o callback sem executá-lo: fora de uma transação, o agendamento ficou para trás
+        return self.agendada and self.connection.in_atomic_block
+
+    def __call__(self):
+        self.agendada = False
+        if getattr(self.connection, ATRIBUTO_PENDENTES, None) is self:
+            setattr(self.connection, ATRIBUTO_PENDENTES, None)
+        lotes_por_desde = {}
+        for lote_id, desde in self.desde.items():
+            lotes_por_desde.setdefault(desde, []).append(lote_id)
+        for desde, lote_ids in lotes_por_desde.items():
+            atualizar_lotes(lote_ids, desde=desde)
+
+
+def agendar_atualizacao(lote_id, ano=None, mes=None):
+    """
+    Agenda o recálculo do livro do lote para depois do commit da transação
+    atual; os recálculos da mesma transação rodam juntos (AtualizacoesPendentes).
+    """
+    desde = (ano, mes) if ano is not None and mes is not None else None
+    connection = transaction.get_connection()
+    pendentes = getattr(connection, ATRIBUTO_PENDENTES, None)
+    if pendentes is not None and pendentes.ativa():
+        pendentes.incluir(lote_id, desde)
+        return
+    pendentes = AtualizacoesPendentes(connection)
+    pendentes.incluir(lote_id, desde)
+    setattr(connection, ATRIBUTO_PENDENTES, pendentes)
+    pendentes.agendada = True
+    # Fora de uma transação, o on_commit executa na hora
+    transaction.on_commit(pendentes)
@@ -0,0 +1,68 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from usuarios.bancada import LIMITE, PORTES, REPETICOES, VIEWS, comparar, medir
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede tempo, queries e pico de memória das telas de dashboard em fazendas sintéticas '
+        '(pequena, média e grande), em um banco de testes criado para isso. Grava o resultado em JSON '
+        'e, com --referencia, aponta o que piorou além do limite (e termina com erro).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--portes', nargs='+', choices=list(PORTES), default=list(PORTES),
+                            help='Portes das fazendas (padrão: todos)')
+        parser.add_argument('--views', nargs='+', choices=list(VIEWS), default=list(VIEWS),
+                            help='Views medidas (padrão: todas)')
+        parser.add_argument('--repeticoes', type=int, default=REPETICOES,
+                            help=f'Requisições medidas por view, depois do aquecimento (padrão: {REPETICOES})')
+        parser.add_argument('--semente', type=int, default=0,
+                            help='Semente das fazendas sintéticas (padrão: 0)')
+        parser.add_argument('--saida', help='Arquivo JSON onde gravar o resultado')
+        parser.add_argument('--referencia', help='Resultado JSON anterior para comparar')
+        parser.add_argument('--limite', type=float, default=LIMITE,
+                            help=f'Piora tolerada no tempo e na memória, em fração (padrão: {LIMITE})')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Mantém o banco de testes (e as fazendas geradas) para a próxima execução')
+
+    def handle(self, *args, **options):
+        referencia = None
+        if options['referencia']:
+            try:
+                with open(options['referencia']) as arquivo:
+                    referencia = json.load(arquivo)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Não foi possível ler a referência: {e}')
+
+        def progresso(nome, medidas):
+            self.stdout.write(
+                f'{nome:<50} {medidas["tempo_ms"]:>9.1f} ms {medidas["queries"]:>4} queries '
+                f'{medidas["memoria_pico_kb"]:>9.0f} KB'
+            )
+
+        nome_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            resultado = medir(
+                options['portes'], options['views'], options['repeticoes'], options['semente'], progresso,
+            )
+        finally:
+            connection.creation.destroy_test_db(nome_original, verbosity=0, keepdb=options['keepdb'])
+
+        if options['saida']:
+            with open(options['saida'], 'w') as arquivo:
+                json.dump(resultado, arquivo, indent=2)
+            self.stdout.write(f'Resultado gravado em {options["saida"]}')
+
+        if referencia is None:
+            return
+        regressoes = comparar(resultado, referencia, options['limite'])
+        for nome, medida, antes, depois in regressoes:
+            self.stdout.write(self.style.ERROR(f'✗ {nome}: {medida} {antes} -> {depois}'))
+        if regressoes:
+            raise CommandError(f'{len(regressoes)} regressão(ões) em relação à referência.')
+        self.stdout.write(self.style.SUCCESS('✓ Nenhuma regressão em relação à referência'))
@@ -0,0 +1,39 @@
+import os
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from usuarios.benchmark import MIN_PROPRIEDADES, PROPRIEDADES_POR_BLOCO, atualizar_benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Calcula as métricas de todas as propriedades e grava os percentis (p10/p50/p90) '
+        'por grupo na tabela de benchmark. Feito para rodar uma vez por noite (cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ano', type=int, default=timezone.now().year,
+                            help='Ano das métricas (padrão: ano atual)')
+        parser.add_argument('--processos', type=int, default=os.cpu_count() or 1,
+                            help='Quantidade de processos de cálculo (padrão: um por CPU)')
+        parser.add_argument('--tamanho-bloco', type=int, default=PROPRIEDADES_POR_BLOCO,
+                            help=f'Propriedades calculadas por tarefa (padrão: {PROPRIEDADES_POR_BLOCO})')
+        parser.add_argument('--minimo', type=int, default=MIN_PROPRIEDADES,
+                            help=f'Mínimo de propriedades para gravar um grupo (padrão: {MIN_PROPRIEDADES})')
+
+    def handle(self, *args, **options):
+        def progresso(feitas, total):
+            self.stdout.write(f'{feitas}/{total} propriedades calculadas')
+
+        benchmarks = atualizar_benchmarks(
+            options['ano'],
+            processos=options['processos'],
+            tamanho_bloco=options['tamanho_bloco'],
+            minimo=options['minimo'],
+            progresso=progresso,
+        )
+        grupos = {(benchmark.dimensao, benchmark.grupo) for benchmark in benchmarks}
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Benchmark de {options["ano"]}: {len(grupos)} grupo(s), {len(benchmarks)} linha(s)'
+        ))
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from usuarios.importacao import ImportadorPlanilha
+from usuarios.models import Propriedade, Usuario
+from usuarios.xlsx import ErroPlanilha, LeitorXlsx
+
+
+class Command(BaseCommand):
+    help = 'Importa a planilha "Dashboard Boi de Lucro" (XLSX) para a propriedade de um usuário'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo .xlsx')
+        parser.add_argument('--usuario', required=True, help='Email do usuário dono da propriedade')
+        parser.add_argument('--ano', type=int, default=timezone.now().year,
+                            help='Ano dos meses das tabelas de produção, que não têm ano na planilha (padrão: ano atual)')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Só mostra o que seria criado ou alterado, sem gravar nada')
+        parser.add_argument('--tamanho-bloco', type=int, default=1000,
+                            help='Quantidade de registros gravados por comando (padrão: 1000)')
+
+    def handle(self, *args, **options):
+        try:
+            usuario = Usuario.objects.get(email=options['usuario'])
+        except Usuario.DoesNotExist:
+            raise CommandError(f'Usuário {options["usuario"]} não encontrado.')
+        propriedade = Propriedade.objects.filter(usuario=usuario).first() or Propriedade(usuario=usuario)
+
+        importador = ImportadorPlanilha(
+            propriedade, options['ano'], simular=options['dry_run'], tamanho_bloco=options['tamanho_bloco']
+        )
+        try:
+            with LeitorXlsx(options['arquivo']) as leitor:
+                importador.importar(leitor)
+        except (OSError, ErroPlanilha) as e:
+            raise CommandError(str(e))
+
+        for resumo in importador.resumos.values():
+            self.stdout.write(str(resumo))
+            if options['verbosity'] >= 2:
+                for alteracao in resumo.alteracoes:
+                    self.stdout.write(f'  {alteracao}')
+        for erro in importador.erros:
+            self.stdout.write(self.style.WARNING(erro))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.NOTICE('Simulação: nada foi gravado.'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✓ Planilha importada para a propriedade {propriedade.id}'))
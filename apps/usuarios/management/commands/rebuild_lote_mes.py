@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from usuarios.lote_mes import atualizar_lotes
+from usuarios.models import Lote
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói do zero o livro mensal dos lotes (LoteMes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--propriedade', type=int, help='ID da propriedade (padrão: todas)')
+        parser.add_argument('--tamanho-bloco', type=int, default=200,
+                            help='Quantidade de lotes recalculados por transação (padrão: 200)')
+
+    def handle(self, *args, **options):
+        lotes = Lote.objects.order_by('id')
+        if options['propriedade']:
+            lotes = lotes.filter(propriedade_id=options['propriedade'])
+        lote_ids = list(lotes.values_list('id', flat=True))
+
+        tamanho = options['tamanho_bloco']
+        total_linhas = 0
+        for inicio in range(0, len(lote_ids), tamanho):
+            total_linhas += atualizar_lotes(lote_ids[inicio:inicio + tamanho])
+            self.stdout.write(f'{min(inicio + tamanho, len(lote_ids))}/{len(lote_ids)} lotes processados')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Livro mensal reconstruído: {len(lote_ids)} lote(s), {total_linhas} linha(s)'
+        ))
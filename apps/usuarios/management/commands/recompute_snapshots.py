@@ -0,0 +1,50 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from usuarios.snapshots import DASHBOARDS, EXECUTORES, PROPRIEDADES_POR_BLOCO, recalcular
+
+
+class Command(BaseCommand):
+    help = (
+        'Calcula os dashboards de todas as propriedades e grava as fotografias (snapshots) '
+        'lidas pelas telas enquanto os dados não mudarem. Feito para rodar uma vez por noite (cron).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dashboards', nargs='+', choices=list(DASHBOARDS), default=list(DASHBOARDS),
+                            help='Dashboards a recalcular (padrão: todos)')
+        parser.add_argument('--anos', nargs='+', type=int, default=[timezone.now().year],
+                            help='Anos do fluxo de caixa e do ponto de equilíbrio (padrão: ano atual)')
+        parser.add_argument('--propriedade', type=int, action='append',
+                            help='ID da propriedade (pode repetir; padrão: todas)')
+        parser.add_argument('--executor', choices=list(EXECUTORES), default='processos',
+                            help='Onde os blocos são calculados (padrão: processos; '
+                                 '"interpretadores" exige Python 3.14)')
+        parser.add_argument('--trabalhadores', type=int, default=os.cpu_count() or 1,
+                            help='Quantidade de processos, threads ou interpretadores (padrão: um por CPU)')
+        parser.add_argument('--tamanho-bloco', type=int, default=PROPRIEDADES_POR_BLOCO,
+                            help=f'Propriedades calculadas por tarefa (padrão: {PROPRIEDADES_POR_BLOCO})')
+
+    def handle(self, *args, **options):
+        inicio = timezone.now()
+
+        def progresso(feitas, total, gravadas):
+            self.stdout.write(f'{feitas}/{total} propriedades processadas ({gravadas} fotografia(s))')
+
+        try:
+            gravadas = recalcular(
+                options['dashboards'],
+                options['anos'],
+                executor=options['executor'],
+                trabalhadores=options['trabalhadores'],
+                tamanho_bloco=options['tamanho_bloco'],
+                propriedade_ids=options['propriedade'],
+                progresso=progresso,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        segundos = (timezone.now() - inicio).total_seconds()
+        self.stdout.write(self.style.SUCCESS(f'✓ {gravadas} fotografia(s) gravada(s) em {segundos:.1f}s'))
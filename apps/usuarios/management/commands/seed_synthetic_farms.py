@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from usuarios.sinteticos import PROPRIEDADES_POR_BLOCO, apagar, gerar
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera fazendas sintéticas (usuário, propriedade, lotes e anos de projeções, gastos, mortalidade, '
+        'períodos, custos fixos e receitas com sazonalidade) para testes de carga. '
+        'A mesma semente gera os mesmos dados.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--propriedades', type=int, default=10,
+                            help='Quantidade de usuários/propriedades (padrão: 10)')
+        parser.add_argument('--lotes', type=int, default=10,
+                            help='Lotes por propriedade (padrão: 10)')
+        parser.add_argument('--anos', type=int, default=2,
+                            help='Anos de dados por lote e propriedade, terminando em --ano-final (padrão: 2)')
+        parser.add_argument('--ano-final', type=int, default=timezone.now().year,
+                            help='Último ano com dados (padrão: ano atual)')
+        parser.add_argument('--semente', type=int, default=0,
+                            help='Semente do gerador aleatório (padrão: 0)')
+        parser.add_argument('--prefixo', default='fazenda',
+                            help='Prefixo dos emails, fazenda000000@sintetico.agrodash em diante (padrão: fazenda)')
+        parser.add_argument('--senha',
+                            help='Senha de todos os usuários gerados (padrão: nenhuma, não conseguem entrar)')
+        parser.add_argument('--tamanho-bloco', type=int, default=PROPRIEDADES_POR_BLOCO,
+                            help=f'Propriedades gravadas por transação (padrão: {PROPRIEDADES_POR_BLOCO})')
+        parser.add_argument('--sem-livro-mensal', action='store_true',
+                            help='Não calcula o livro mensal (depois, rode rebuild_lote_mes)')
+        parser.add_argument('--substituir', action='store_true',
+                            help='Apaga antes as fazendas sintéticas com o mesmo prefixo')
+
+    def handle(self, *args, **options):
+        inicio = timezone.now()
+        if options['substituir']:
+            apagados = apagar(options['prefixo'])
+            self.stdout.write(f'{apagados} registro(s) sintético(s) apagado(s)')
+
+        def progresso(feitas, total, gravadas):
+            self.stdout.write(f'{feitas}/{total} propriedades geradas ({sum(gravadas.values())} linha(s))')
+
+        anos = range(options['ano_final'] - options['anos'] + 1, options['ano_final'] + 1)
+        try:
+            gravadas = gerar(
+                options['propriedades'],
+                options['lotes'],
+                anos,
+                semente=options['semente'],
+                prefixo=options['prefixo'],
+                tamanho_bloco=options['tamanho_bloco'],
+                senha=options['senha'],
+                livro_mensal=not options['sem_livro_mensal'],
+                progresso=progresso,
+            )
+        except ValueError as e:
+            raise CommandError(f'{e} Use --substituir ou outro --prefixo.')
+
+        segundos = (timezone.now() - inicio).total_seconds()
+        total = sum(gravadas.values())
+        for modelo, linhas in gravadas.items():
+            self.stdout.write(f'  {modelo._meta.verbose_name_plural}: {linhas}')
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {total} linha(s) gravada(s) em {segundos:.1f}s ({total / max(segundos, 0.001):.0f} linhas/s)'
+        ))
@@ -0,0 +1,172 @@
+"""
+Memória dos workers por view, para achar o que cresce e o que fica retido.
+
+Com ``MEMORIA_MONITOR`` ligado, o DesempenhoMiddleware (perf.py) lê o RSS do
+processo antes e depois de cada requisição e soma o crescimento à view que a
+atendeu; o total também vai para o ``/metrics``
+(agrodash_memoria_crescimento_bytes_total), somado entre os workers. Em
+workers com várias threads ou assíncronos, requisições simultâneas dividem o
+mesmo RSS, então o número por view é uma tendência, não uma conta exata.
+
+Com ``MEMORIA_TRACEMALLOC_FRAMES`` maior que zero, o processo também liga o
+tracemalloc (deixa o Python bem mais lento: para ligar em um worker por vez
+ou por algumas horas). Cada view passa a acumular a memória Python que ficou
+alocada depois da requisição (retida) e a página ``/_perf/memoria/`` (staff)
+mostra os pontos de alocação com mais memória viva, ou o quanto cresceram
+desde uma referência marcada na própria página.
+"""
+from collections import namedtuple
+import os
+import threading
+import tracemalloc
+
+from django.conf import settings
+from django.utils import timezone
+
+from .metricas import contar
+
+
+# Pontos de alocação listados na página
+ALOCACOES_LISTADAS = 25
+
+try:
+    _TAMANHO_PAGINA = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _TAMANHO_PAGINA = None
+
+Leitura = namedtuple('Leitura', 'rss python')
+
+
+def rss():
+    """Memória residente do processo em bytes (None fora do Linux)"""
+    if _TAMANHO_PAGINA is None:
+        return None
+    try:
+        with open('/proc/self/statm') as arquivo:
+            return int(arquivo.read().split()[1]) * _TAMANHO_PAGINA
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def ativa():
+    return getattr(settings, 'MEMORIA_MONITOR', False)
+
+
+def ler():
+    """RSS e memória Python rastreada (None se o tracemalloc estiver desligado)"""
+    python = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+    return Leitura(rss(), python)
+
+
+def ligar_tracemalloc():
+    """Liga o tracemalloc neste processo se MEMORIA_TRACEMALLOC_FRAMES pedir"""
+    frames = getattr(settings, 'MEMORIA_TRACEMALLOC_FRAMES', 0)
+    if frames > 0 and ativa() and not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+class MemoriaView:
+    """Crescimento de memória nas requisições de uma view"""
+
+    def __init__(self, view):
+        self.view = view
+        self.requisicoes = 0
+        self.cresceu = 0
+        self.crescimento_rss = 0
+        self.maior_crescimento = 0
+        self.retido_python = 0
+
+    def registrar(self, antes, depois):
+        self.requisicoes += 1
+        if antes.rss is not None and depois.rss is not None and depois.rss > antes.rss:
+            crescimento = depois.rss - antes.rss
+            self.cresceu += 1
+            self.crescimento_rss += crescimento
+            self.maior_crescimento = max(self.maior_crescimento, crescimento)
+        if antes.python is not None and depois.python is not None:
+            self.retido_python += depois.python - antes.python
+
+    def resumo(self):
+        return {
+            'view': self.view,
+            'requisicoes': self.requisicoes,
+            'cresceu': self.cresceu,
+            'crescimento_rss': self.crescimento_rss,
+            'crescimento_medio': self.crescimento_rss / self.requisicoes,
+            'maior_crescimento': self.maior_crescimento,
+            'retido_python': self.retido_python,
+        }
+
+
+class Memoria:
+    """Crescimento por view e referência do tracemalloc deste processo"""
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.referencia = None
+        self.zerar()
+
+    def zerar(self):
+        with self._trava:
+            self.desde = timezone.now()
+            self.rss_inicial = rss()
+            self.por_view = {}
+
+    def registrar(self, view, antes, depois):
+        with self._trava:
+            totais = self.por_view.get(view)
+            if totais is None:
+                totais = self.por_view[view] = MemoriaView(view)
+            totais.registrar(antes, depois)
+        if antes.rss is not None and depois.rss is not None and depois.rss > antes.rss:
+            contar('agrodash_memoria_crescimento_bytes_total', depois.rss - antes.rss, view=view)
+
+    def marcar_referencia(self):
+        """Guarda o estado atual do tracemalloc; as próximas listas mostram o que cresceu desde então"""
+        self.referencia = _fotografia()
+        self.referencia_em = timezone.now()
+
+    def alocacoes(self, limite=ALOCACOES_LISTADAS):
+        """Pontos de alocação (pilhas) com mais memória viva, ou que mais cresceram desde a referência"""
+        if not tracemalloc.is_tracing():
+            return []
+        fotografia = _fotografia()
+        if self.referencia is not None:
+            estatisticas = fotografia.compare_to(self.referencia, 'traceback')
+        else:
+            estatisticas = fotografia.statistics('traceback')
+        return [
+            {
+                'tamanho': estatistica.size,
+                'quantidade': estatistica.count,
+                'diferenca': getattr(estatistica, 'size_diff', None),
+                'pilha': '\n'.join(estatistica.traceback.format(most_recent_first=True)),
+            }
+            for estatistica in estatisticas[:limite]
+        ]
+
+    def contexto(self):
+        with self._trava:
+            views = [totais.resumo() for totais in self.por_view.values()]
+        return {
+            'pid': os.getpid(),
+            'desde': self.desde,
+            'rss_inicial': self.rss_inicial,
+            'rss_atual': rss(),
+            'tracemalloc': tracemalloc.is_tracing(),
+            'python_rastreado': tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None,
+            'referencia_em': self.referencia_em if self.referencia is not None else None,
+            'views': sorted(views, key=lambda linha: linha['crescimento_rss'], reverse=True),
+        }
+
+
+def _fotografia():
+    return tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        tracemalloc.Filter(False, '<unknown>'),
+    ])
+
+
+MEMORIA = Memoria()
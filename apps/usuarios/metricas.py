@@ -0,0 +1,238 @@
+"""
+Métricas no formato de texto do Prometheus, somadas entre os processos.
+
+Cada processo (worker do gunicorn, do uvicorn ou filho de um pool) acumula
+contadores e histogramas em memória; gravar uma métrica custa só uma trava e
+algumas somas. A cada ``METRICAS_INTERVALO`` segundos, ao fim de uma
+requisição, o processo grava o estado inteiro em ``METRICAS_DIR/<pid>.json``.
+A view ``/metrics`` lê os arquivos de todos os processos e soma. Os arquivos de
+processos que já terminaram (reciclados pelo ``--max-requests``) são somados em
+``encerrados.json`` e apagados, para que os contadores nunca voltem atrás.
+"""
+from bisect import bisect_left
+import fcntl
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+
+BUCKETS_REQUISICAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CALCULO = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+# nome -> (tipo, descrição, buckets dos histogramas)
+METRICAS = {
+    'agrodash_requisicao_segundos': (
+        'histogram', 'Tempo das requisições por view', BUCKETS_REQUISICAO,
+    ),
+    'agrodash_respostas_total': ('counter', 'Respostas por view e status', None),
+    'agrodash_db_queries_total': ('counter', 'Queries feitas nas requisições de cada view', None),
+    'agrodash_db_segundos_total': ('counter', 'Tempo no banco nas requisições de cada view', None),
+    'agrodash_cache_total': (
+        'counter', 'Buscas no cache dos dashboards por resultado (acerto ou falta)', None,
+    ),
+    'agrodash_snapshot_total': (
+        'counter', 'Leituras das fotografias noturnas por resultado (acerto ou falta)', None,
+    ),
+    'agrodash_memoria_crescimento_bytes_total': (
+        'counter', 'Crescimento do RSS dos workers durante as requisições de cada view (MEMORIA_MONITOR)', None,
+    ),
+    'agrodash_calculo_segundos': (
+        'histogram', 'Tempo dos trechos de cálculo medidos com perf.trecho()', BUCKETS_CALCULO,
+    ),
+}
+
+ARQUIVO_ENCERRADOS = 'encerrados.json'
+
+
+class Registro:
+    """Contadores e histogramas deste processo"""
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.zerar()
+
+    def zerar(self):
+        with self._trava:
+            # (nome, ((rótulo, valor), ...)) -> valor
+            self.contadores = {}
+            # (nome, ((rótulo, valor), ...)) -> [contagem por bucket..., +Inf, soma]
+            self.histogramas = {}
+            self.gravado_em = time.monotonic()
+
+    def contar(self, metrica, valor=1, /, **rotulos):
+        chave = (metrica, tuple(sorted(rotulos.items())))
+        with self._trava:
+            self.contadores[chave] = self.contadores.get(chave, 0) + valor
+
+    def observar(self, metrica, valor, /, **rotulos):
+        buckets = METRICAS[metrica][2]
+        chave = (metrica, tuple(sorted(rotulos.items())))
+        with self._trava:
+            linha = self.histogramas.get(chave)
+            if linha is None:
+                linha = self.histogramas[chave] = [0] * (len(buckets) + 2)
+            linha[bisect_left(buckets, valor)] += 1
+            linha[-1] += valor
+
+    def estado(self):
+        with self._trava:
+            return {
+                'contadores': [[nome, list(rotulos), valor] for (nome, rotulos), valor in self.contadores.items()],
+                'histogramas': [[nome, list(rotulos), list(linha)] for (nome, rotulos), linha in self.histogramas.items()],
+            }
+
+    def gravar(self):
+        """Grava o estado deste processo em METRICAS_DIR (troca atômica do arquivo)"""
+        self.gravado_em = time.monotonic()
+        pasta = settings.METRICAS_DIR
+        os.makedirs(pasta, exist_ok=True)
+        caminho = os.path.join(pasta, f'{os.getpid()}.json')
+        _gravar_json(caminho, self.estado())
+
+    def gravar_se_preciso(self):
+        if time.monotonic() - self.gravado_em >= settings.METRICAS_INTERVALO:
+            self.gravar()
+
+
+REGISTRO = Registro()
+
+
+def _reiniciar_no_filho():
+    # Filhos de fork (pools de processos) começam do zero, com o próprio arquivo;
+    # a trava é recriada porque outra thread podia estar com ela no momento do fork
+    REGISTRO._trava = threading.Lock()
+    REGISTRO.zerar()
+
+
+os.register_at_fork(after_in_child=_reiniciar_no_filho)
+
+
+def contar(metrica, valor=1, /, **rotulos):
+    REGISTRO.contar(metrica, valor, **rotulos)
+
+
+def observar(metrica, valor, /, **rotulos):
+    REGISTRO.observar(metrica, valor, **rotulos)
+
+
+def registrar_requisicao(medicao, status):
+    """Métricas de uma requisição medida pelo DesempenhoMiddleware (ver perf.py)"""
+    view = medicao.view
+    REGISTRO.observar('agrodash_requisicao_segundos', medicao.tempo_total, view=view)
+    REGISTRO.contar('agrodash_respostas_total', view=view, status=str(status))
+    if medicao.queries:
+        REGISTRO.contar('agrodash_db_queries_total', medicao.queries, view=view)
+        REGISTRO.contar('agrodash_db_segundos_total', medicao.tempo_db, view=view)
+    REGISTRO.gravar_se_preciso()
+
+
+def _gravar_json(caminho, dados):
+    temporario = f'{caminho}.{os.getpid()}.tmp'
+    with open(temporario, 'w') as arquivo:
+        json.dump(dados, arquivo)
+    os.replace(temporario, caminho)
+
+
+def _ler_json(caminho):
+    try:
+        with open(caminho) as arquivo:
+            return json.load(arquivo)
+    except (OSError, ValueError):
+        return None
+
+
+def _processo_ativo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _somar(total, estado):
+    for nome, rotulos, valor in estado['contadores']:
+        chave = (nome, tuple(tuple(par) for par in rotulos))
+        total.contadores[chave] = total.contadores.get(chave, 0) + valor
+    for nome, rotulos, linha in estado['histogramas']:
+        chave = (nome, tuple(tuple(par) for par in rotulos))
+        atual = total.histogramas.get(chave)
+        if atual is None or len(atual) != len(linha):
+            total.histogramas[chave] = list(linha)
+        else:
+            total.histogramas[chave] = [a + b for a, b in zip(atual, linha)]
+
+
+def coletar():
+    """Registro com a soma de todos os processos (o atual é gravado antes)"""
+    REGISTRO.gravar()
+    pasta = settings.METRICAS_DIR
+    total = Registro()
+    with open(os.path.join(pasta, '.trava'), 'w') as trava:
+        # Um coletor por vez junta os arquivos dos processos encerrados
+        fcntl.flock(trava, fcntl.LOCK_EX)
+        encerrados = Registro()
+        caminho_encerrados = os.path.join(pasta, ARQUIVO_ENCERRADOS)
+        estado = _ler_json(caminho_encerrados)
+        if estado is not None:
+            _somar(encerrados, estado)
+        mudou = False
+        for nome_arquivo in os.listdir(pasta):
+            pid, extensao = os.path.splitext(nome_arquivo)
+            if extensao != '.json' or not pid.isdigit():
+                continue
+            estado = _ler_json(os.path.join(pasta, nome_arquivo))
+            if estado is None:
+                continue
+            if _processo_ativo(int(pid)):
+                _somar(total, estado)
+            else:
+                _somar(encerrados, estado)
+                os.remove(os.path.join(pasta, nome_arquivo))
+                mudou = True
+        if mudou:
+            _gravar_json(caminho_encerrados, encerrados.estado())
+    _somar(total, encerrados.estado())
+    return total
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _rotulos(rotulos, extra=()):
+    pares = list(rotulos) + list(extra)
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{chave}="{_escapar(valor)}"' for chave, valor in pares) + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def exposicao(registro):
+    """Texto no formato de exposição do Prometheus (versão 0.0.4)"""
+    linhas = []
+    for nome, (tipo, descricao, buckets) in METRICAS.items():
+        linhas.append(f'# HELP {nome} {descricao}')
+        linhas.append(f'# TYPE {nome} {tipo}')
+        if tipo == 'counter':
+            for (metrica, rotulos), valor in sorted(registro.contadores.items()):
+                if metrica == nome:
+                    linhas.append(f'{nome}{_rotulos(rotulos)} {_numero(valor)}')
+            continue
+        for (metrica, rotulos), linha in sorted(registro.histogramas.items()):
+            if metrica != nome:
+                continue
+            acumulado = 0
+            for limite, contagem in zip([*buckets, '+Inf'], linha[:-1]):
+                acumulado += contagem
+                linhas.append(f'{nome}_bucket{_rotulos(rotulos, [("le", limite)])} {acumulado}')
+            linhas.append(f'{nome}_sum{_rotulos(rotulos)} {_numero(linha[-1])}')
+            linhas.append(f'{nome}_count{_rotulos(rotulos)} {acumulado}')
+    return '\n'.join(linhas) + '\n'
@@ -0,0 +1,38 @@
+# Generated by Django 6.0.1 on 2026-10-16 10:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0012_periodopersonalizado_alter_custofixo_ano_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoteMes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.IntegerField(choices=[(1, 'Janeiro'), (2, 'Fevereiro'), (3, 'Março'), (4, 'Abril'), (5, 'Maio'), (6, 'Junho'), (7, 'Julho'), (8, 'Agosto'), (9, 'Setembro'), (10, 'Outubro'), (11, 'Novembro'), (12, 'Dezembro')], verbose_name='Mês')),
+                ('ano', models.IntegerField(verbose_name='Ano')),
+                ('dias_mes', models.PositiveSmallIntegerField(verbose_name='Dias do Mês')),
+                ('periodo_dias', models.PositiveIntegerField(blank=True, null=True, verbose_name='Período Personalizado (dias)')),
+                ('gmd_kg', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='GMD (kg)')),
+                ('ganho_kg', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Ganho do Mês (kg)')),
+                ('peso_acumulado_kg', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Peso Acumulado (kg)')),
+                ('gasto_diario', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Gasto Diário (R$/dia)')),
+                ('gasto_mensal', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='Gasto Mensal por Animal (R$)')),
+                ('gasto_total_lote', models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True, verbose_name='Gasto Total do Lote (R$)')),
+                ('data_atualizacao', models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')),
+                ('lote', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='meses', to='usuarios.lote', verbose_name='Lote')),
+            ],
+            options={
+                'verbose_name': 'Mês do Lote',
+                'verbose_name_plural': 'Meses dos Lotes',
+                'ordering': ['ano', 'mes'],
+                'unique_together': {('lote', 'ano', 'mes')},
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+from calendar import monthrange
+from decimal import Decimal
+
+from django.db import migrations
+
+
+def preencher_livro_mensal(apps, schema_editor):
+    """Preenche o livro mensal dos lotes já cadastrados (mesmo cálculo de usuarios.lote_mes)"""
+    Lote = apps.get_model('usuarios', 'Lote')
+    ProjecaoGanho = apps.get_model('usuarios', 'ProjecaoGanho')
+    GastoNutricional = apps.get_model('usuarios', 'GastoNutricional')
+    PeriodoPersonalizado = apps.get_model('usuarios', 'PeriodoPersonalizado')
+    LoteMes = apps.get_model('usuarios', 'LoteMes')
+
+    projecoes = {}
+    for lote_id, ano, mes, gmd_kg in ProjecaoGanho.objects.values_list('lote_id', 'ano', 'mes', 'gmd_kg'):
+        projecoes.setdefault(lote_id, {})[(ano, mes)] = gmd_kg
+    gastos = {}
+    for lote_id, ano, mes, gasto in GastoNutricional.objects.values_list('lote_id', 'ano', 'mes', 'gasto_diario'):
+        gastos.setdefault(lote_id, {})[(ano, mes)] = gasto
+    periodos = {
+        (lote_id, ano, mes): dias
+        for lote_id, ano, mes, dias in PeriodoPersonalizado.objects.filter(periodo_dias__isnull=False).values_list(
+            'lote_id', 'ano', 'mes', 'periodo_dias'
+        )
+    }
+
+    linhas = []
+    for lote in Lote.objects.all().iterator():
+        projecoes_lote = projecoes.get(lote.id, {})
+        gastos_lote = gastos.get(lote.id, {})
+        peso = lote.peso_kg
+        for ano, mes in sorted(set(projecoes_lote) | set(gastos_lote)):
+            dias_mes = monthrange(ano, mes)[1]
+            linha = LoteMes(lote_id=lote.id, ano=ano, mes=mes, dias_mes=dias_mes,
+                            periodo_dias=periodos.get((lote.id, ano, mes)))
+            if (ano, mes) in projecoes_lote:
+                linha.gmd_kg = projecoes_lote[(ano, mes)]
+                linha.ganho_kg = linha.gmd_kg * Decimal(dias_mes)
+                peso = peso + linha.ganho_kg
+                linha.peso_acumulado_kg = peso
+            if (ano, mes) in gastos_lote:
+                linha.gasto_diario = gastos_lote[(ano, mes)]
+                linha.gasto_mensal = linha.gasto_diario * Decimal(dias_mes)
+                linha.gasto_total_lote = linha.gasto_mensal * Decimal(lote.quantidade)
+            linhas.append(linha)
+        if len(linhas) >= 1000:
+            LoteMes.objects.bulk_create(linhas)
+            linhas = []
+    LoteMes.objects.bulk_create(linhas)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0013_lotemes'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher_livro_mensal, migrations.RunPython.noop),
+    ]
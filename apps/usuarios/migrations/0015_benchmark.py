@@ -0,0 +1,34 @@
+# Generated by Django 6.1.2 on 2026-10-17 00:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0014_preencher_lotemes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Benchmark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ano', models.IntegerField(verbose_name='Ano')),
+                ('dimensao', models.CharField(choices=[('geral', 'Todas as propriedades'), ('municipio_estado', 'Município/Estado'), ('tipo_raca_animais', 'Tipo/raça dos Animais'), ('tipo_terminacao', 'Tipo de Terminação')], max_length=30, verbose_name='Dimensão')),
+                ('grupo', models.CharField(blank=True, max_length=255, verbose_name='Grupo')),
+                ('metrica', models.CharField(choices=[('gmd', 'GMD (kg/dia)'), ('custo_diario', 'Custo Diário por Animal (R$)'), ('ponto_equilibrio', 'Ponto de Equilíbrio (R$/@)'), ('rentabilidade', 'Rentabilidade (%)')], max_length=30, verbose_name='Métrica')),
+                ('propriedades', models.PositiveIntegerField(verbose_name='Propriedades no Grupo')),
+                ('p10', models.DecimalField(decimal_places=4, max_digits=14, verbose_name='Percentil 10')),
+                ('p50', models.DecimalField(decimal_places=4, max_digits=14, verbose_name='Mediana')),
+                ('p90', models.DecimalField(decimal_places=4, max_digits=14, verbose_name='Percentil 90')),
+                ('data_calculo', models.DateTimeField(auto_now=True, verbose_name='Data do Cálculo')),
+            ],
+            options={
+                'verbose_name': 'Benchmark',
+                'verbose_name_plural': 'Benchmarks',
+                'ordering': ['ano', 'dimensao', 'grupo', 'metrica'],
+                'unique_together': {('ano', 'dimensao', 'grupo', 'metrica')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.1.2 on 2026-10-17 00:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0015_benchmark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Snapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=50, verbose_name='Dashboard')),
+                ('ano', models.IntegerField(default=0, verbose_name='Ano')),
+                ('marca', models.CharField(max_length=40, verbose_name='Marca dos Dados')),
+                ('dados', models.BinaryField(verbose_name='Dados (pickle)')),
+                ('data_atualizacao', models.DateTimeField(auto_now=True, verbose_name='Data do Cálculo')),
+                ('propriedade', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='usuarios.propriedade', verbose_name='Propriedade')),
+            ],
+            options={
+                'verbose_name': 'Snapshot',
+                'verbose_name_plural': 'Snapshots',
+                'unique_together': {('propriedade', 'nome', 'ano')},
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.1.2 on 2026-10-17 00:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0016_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='perfilar_requisicoes',
+            field=models.BooleanField(default=False, verbose_name='Perfilar requisições'),
+        ),
+        migrations.CreateModel(
+            name='PerfilRequisicao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metodo', models.CharField(max_length=10, verbose_name='Método')),
+                ('caminho', models.CharField(max_length=2000, verbose_name='Caminho')),
+                ('status', models.PositiveSmallIntegerField(verbose_name='Status')),
+                ('tempo_ms', models.FloatField(verbose_name='Tempo (ms)')),
+                ('queries', models.PositiveIntegerField(blank=True, null=True, verbose_name='Queries')),
+                ('estatisticas', models.BinaryField(verbose_name='Estatísticas (pstats)')),
+                ('resumo', models.TextField(verbose_name='Resumo')),
+                ('data_criacao', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Data')),
+                ('usuario', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='perfis_requisicao', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Perfil de Requisição',
+                'verbose_name_plural': 'Perfis de Requisições',
+                'ordering': ['-data_criacao'],
+            },
+        ),
+    ]
@@ -66,6 +66,8 @@ class Usuario(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=True, verbose_name='Ativo')
     is_staff = models.BooleanField(default=False, verbose_name='É staff')
     date_joined = models.DateTimeField(default=timezone.now, verbose_name='Data de cadastro')
+    # Perfila (cProfile) todas as requisições do usuário; ver perfilador.py
+    perfilar_requisicoes = models.BooleanField(default=False, verbose_name='Perfilar requisições')
 
     objects = UsuarioManager()
 
@@ -732,3 +734,140 @@ class PeriodoPersonalizado(models.Model):
     
     def __str__(self):
         return f"{self.lote.nome} - {self.get_mes_display()}/{self.ano} - {self.periodo_dias} dias"
+
+
+class LoteMes(models.Model):
+    """Livro mensal desnormalizado do lote: ganho, peso acumulado e gasto nutricional por mês"""
+    MES_CHOICES = [
+        (1, 'Janeiro'), (2, 'Fevereiro'), (3, 'Março'), (4, 'Abril'), (5, 'Maio'), (6, 'Junho'),
+        (7, 'Julho'), (8, 'Agosto'), (9, 'Setembro'), (10, 'Outubro'), (11, 'Novembro'), (12, 'Dezembro'),
+    ]
+    
+    lote = models.ForeignKey(
+        Lote,
+        on_delete=models.CASCADE,
+        related_name='meses',
+        verbose_name='Lote'
+    )
+    mes = models.IntegerField(choices=MES_CHOICES, verbose_name='Mês')
+    ano = models.IntegerField(verbose_name='Ano')
+    dias_mes = models.PositiveSmallIntegerField(verbose_name='Dias do Mês')
+    periodo_dias = models.PositiveIntegerField(null=True, blank=True, verbose_name='Período Personalizado (dias)')
+    
+    # Projeção de ganho (nulos quando o mês não tem projeção)
+    gmd_kg = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, verbose_name='GMD (kg)')
+    ganho_kg = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name='Ganho do Mês (kg)')
+    peso_acumulado_kg = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True, verbose_name='Peso Acumulado (kg)'
+    )
+    
+    # Gasto nutricional (nulos quando o mês não tem gasto)
+    gasto_diario = models.DecimalField(
+        max_digits=10, decimal_places=2, null=True, blank=True, verbose_name='Gasto Diário (R$/dia)'
+    )
+    gasto_mensal = models.DecimalField(
+        max_digits=12, decimal_places=2, null=True, blank=True, verbose_name='Gasto Mensal por Animal (R$)'
+    )
+    gasto_total_lote = models.DecimalField(
+        max_digits=14, decimal_places=2, null=True, blank=True, verbose_name='Gasto Total do Lote (R$)'
+    )
+    
+    data_atualizacao = models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')
+    
+    class Meta:
+        verbose_name = 'Mês do Lote'
+        verbose_name_plural = 'Meses dos Lotes'
+        ordering = ['ano', 'mes']
+        unique_together = ['lote', 'ano', 'mes']
+    
+    def __str__(self):
+        return f"{self.lote.nome} - {self.get_mes_display()}/{self.ano}"
+
+
+class Benchmark(models.Model):
+    """Percentis de uma métrica entre as propriedades de um grupo, sem identificar as propriedades"""
+    DIMENSAO_CHOICES = [
+        ('geral', 'Todas as propriedades'),
+        ('municipio_estado', 'Município/Estado'),
+        ('tipo_raca_animais', 'Tipo/raça dos Animais'),
+        ('tipo_terminacao', 'Tipo de Terminação'),
+    ]
+    
+    METRICA_CHOICES = [
+        ('gmd', 'GMD (kg/dia)'),
+        ('custo_diario', 'Custo Diário por Animal (R$)'),
+        ('ponto_equilibrio', 'Ponto de Equilíbrio (R$/@)'),
+        ('rentabilidade', 'Rentabilidade (%)'),
+    ]
+    
+    ano = models.IntegerField(verbose_name='Ano')
+    dimensao = models.CharField(max_length=30, choices=DIMENSAO_CHOICES, verbose_name='Dimensão')
+    # Valor da dimensão normalizado (minúsculas, sem acentos); vazio na dimensão "geral"
+    grupo = models.CharField(max_length=255, blank=True, verbose_name='Grupo')
+    metrica = models.CharField(max_length=30, choices=METRICA_CHOICES, verbose_name='Métrica')
+    propriedades = models.PositiveIntegerField(verbose_name='Propriedades no Grupo')
+    p10 = models.DecimalField(max_digits=14, decimal_places=4, verbose_name='Percentil 10')
+    p50 = models.DecimalField(max_digits=14, decimal_places=4, verbose_name='Mediana')
+    p90 = models.DecimalField(max_digits=14, decimal_places=4, verbose_name='Percentil 90')
+    data_calculo = models.DateTimeField(auto_now=True, verbose_name='Data do Cálculo')
+    
+    class Meta:
+        verbose_name = 'Benchmark'
+        verbose_name_plural = 'Benchmarks'
+        ordering = ['ano', 'dimensao', 'grupo', 'metrica']
+        unique_together = ['ano', 'dimensao', 'grupo', 'metrica']
+    
+    def __str__(self):
+        return f"{self.get_metrica_display()} - {self.get_dimensao_display()} {self.grupo} ({self.ano})"
+
+
+class Snapshot(models.Model):
+    """Dados de um dashboard da propriedade calculados de antemão (ver snapshots.py)"""
+    propriedade = models.ForeignKey(
+        Propriedade,
+        on_delete=models.CASCADE,
+        related_name='snapshots',
+        verbose_name='Propriedade'
+    )
+    nome = models.CharField(max_length=50, verbose_name='Dashboard')
+    # 0 nos dashboards que não dependem do ano
+    ano = models.IntegerField(default=0, verbose_name='Ano')
+    # Marca dos dados da propriedade no momento do cálculo; se mudar, a fotografia está vencida
+    marca = models.CharField(max_length=40, verbose_name='Marca dos Dados')
+    dados = models.BinaryField(verbose_name='Dados (pickle)')
+    data_atualizacao = models.DateTimeField(auto_now=True, verbose_name='Data do Cálculo')
+    
+    class Meta:
+        verbose_name = 'Snapshot'
+        verbose_name_plural = 'Snapshots'
+        unique_together = ['propriedade', 'nome', 'ano']
+    
+    def __str__(self):
+        return f"{self.nome} ({self.ano or '-'}) - propriedade {self.propriedade_id}"
+
+
+class PerfilRequisicao(models.Model):
+    """Perfil (cProfile) de uma requisição, gravado pelo PerfiladorMiddleware (ver perfilador.py)"""
+    usuario = models.ForeignKey(
+        Usuario,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='perfis_requisicao',
+        verbose_name='Usuário'
+    )
+    metodo = models.CharField(max_length=10, verbose_name='Método')
+    caminho = models.CharField(max_length=2000, verbose_name='Caminho')
+    status = models.PositiveSmallIntegerField(verbose_name='Status')
+    tempo_ms = models.FloatField(verbose_name='Tempo (ms)')
+    queries = models.PositiveIntegerField(null=True, blank=True, verbose_name='Queries')
+    estatisticas = models.BinaryField(verbose_name='Estatísticas (pstats)')
+    resumo = models.TextField(verbose_name='Resumo')
+    data_criacao = models.DateTimeField(auto_now_add=True, verbose_name='Data', db_index=True)
+    
+    class Meta:
+        verbose_name = 'Perfil de Requisição'
+        verbose_name_plural = 'Perfis de Requisições'
+        ordering = ['-data_criacao']
+    
+    def __str__(self):
+        return f"{self.metodo} {self.caminho} ({self.tempo_ms:.0f} ms)"
@@ -0,0 +1,340 @@
+"""
+Medição de desempenho por requisição.
+
+O ``DesempenhoMiddleware`` mede, em cada requisição, o tempo total, a
+quantidade e o tempo das queries, o tempo de renderização dos templates e a
+view que atendeu. Requisições acima do orçamento da view (``PERF_ORCAMENTOS``
+em settings) vão para o log e os totais por view, guardados em memória em cada
+processo, aparecem na página ``/_perf/`` (só staff); somados entre os
+processos, vão para o ``/metrics`` (ver metricas.py). Toda resposta leva o
+cabeçalho ``Server-Timing`` com o tempo no banco, na renderização, no cálculo
+em Python (o resto) e nos trechos nomeados, que aparece no DevTools do
+navegador (aba Rede > Tempo).
+
+As queries são medidas por um execute_wrapper instalado em toda conexão nova
+(sinal connection_created) e os templates, pelo backend
+``DjangoTemplatesMedidos``. Trechos do cálculo são medidos com ``trecho()``,
+como bloco ``with`` ou decorador. A medição da requisição fica numa ContextVar, que
+o asgiref copia para as threads onde as views assíncronas fazem as consultas.
+"""
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import logging
+import os
+import re
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+from django.utils import timezone
+
+from . import memoria
+from .metricas import observar, registrar_requisicao
+
+
+logger = logging.getLogger(__name__)
+
+# Requisições recentes guardadas por view para os percentis de tempo
+AMOSTRAS_POR_VIEW = 200
+# Requisições acima do orçamento listadas na página
+EXCEDIDAS_RECENTES = 50
+
+_medicao_atual = ContextVar('medicao_desempenho', default=None)
+
+
+class Medicao:
+    """Tempos e queries de uma requisição"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.tempo_total = 0.0
+        self.queries = 0
+        self.tempo_db = 0.0
+        self.tempo_template = 0.0
+        # nome do trecho -> [segundos, vezes]
+        self.trechos = {}
+        self.view = None
+        # RSS e memória Python no início, com MEMORIA_MONITOR (ver memoria.py)
+        self.memoria = memoria.ler() if memoria.ativa() else None
+
+    def encerrar(self):
+        self.tempo_total = time.perf_counter() - self.inicio
+
+    def medidas(self):
+        """{medida: valor} comparadas com o orçamento; tempos em milissegundos"""
+        return {
+            'queries': self.queries,
+            'tempo_ms': self.tempo_total * 1000,
+            'db_ms': self.tempo_db * 1000,
+            'template_ms': self.tempo_template * 1000,
+        }
+
+    def excessos(self, orcamento):
+        """[(medida, valor, limite)] acima do orçamento"""
+        return [
+            (medida, valor, orcamento[medida])
+            for medida, valor in self.medidas().items()
+            if medida in orcamento and valor > orcamento[medida]
+        ]
+
+    def server_timing(self):
+        """Valor do cabeçalho Server-Timing (durações em milissegundos)"""
+        calculo = max(self.tempo_total - self.tempo_db - self.tempo_template, 0)
+        partes = [
+            f'db;dur={self.tempo_db * 1000:.2f};desc="{self.queries} queries"',
+            f'render;dur={self.tempo_template * 1000:.2f};desc="templates"',
+            f'compute;dur={calculo * 1000:.2f};desc="Python"',
+        ]
+        for nome, (segundos, vezes) in self.trechos.items():
+            descricao = nome if vezes == 1 else f'{nome} ({vezes}x)'
+            partes.append(f'{_token(nome)};dur={segundos * 1000:.2f};desc="{descricao}"')
+        partes.append(f'total;dur={self.tempo_total * 1000:.2f}')
+        return ', '.join(partes)
+
+
+def _token(nome):
+    # Nomes do Server-Timing só aceitam os caracteres de token do HTTP
+    return re.sub(r"[^\w!#$%&'*+.^`|~-]", '-', nome, flags=re.ASCII)
+
+
+def medicao_atual():
+    """Medição da requisição em andamento (None fora do middleware)"""
+    return _medicao_atual.get()
+
+
+@contextmanager
+def trecho(nome):
+    """
+    Mede um trecho do cálculo: soma o tempo em ``nome`` no Server-Timing da
+    requisição atual e o observa em agrodash_calculo_segundos{calculo=nome}.
+    Serve como bloco ``with trecho(...)`` ou decorador de funções síncronas.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracao = time.perf_counter() - inicio
+        observar('agrodash_calculo_segundos', duracao, calculo=nome)
+        medicao = _medicao_atual.get()
+        if medicao is not None:
+            total = medicao.trechos.get(nome)
+            if total is None:
+                medicao.trechos[nome] = [duracao, 1]
+            else:
+                total[0] += duracao
+                total[1] += 1
+
+
+def orcamento_da_view(view):
+    """Limites da view em PERF_ORCAMENTOS: pelo caminho completo, pelo nome da função ou o padrão '*'"""
+    orcamentos = getattr(settings, 'PERF_ORCAMENTOS', {})
+    for chave in (view, view.rsplit('.', 1)[-1], '*'):
+        if chave in orcamentos:
+            return orcamentos[chave]
+    return {}
+
+
+def _medir_query(execute, sql, params, many, context):
+    medicao = _medicao_atual.get()
+    if medicao is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicao.queries += 1
+        medicao.tempo_db += time.perf_counter() - inicio
+
+
+@receiver(connection_created)
+def _instalar_medicao_queries(sender, connection, **kwargs):
+    # No início da lista: ``connection.execute_wrapper()`` remove sempre o último
+    if _medir_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _medir_query)
+
+
+class TemplateMedido(Template):
+    """Template que soma o tempo de renderização à medição da requisição"""
+
+    def render(self, context=None, request=None):
+        medicao = _medicao_atual.get()
+        if medicao is None:
+            return super().render(context, request)
+        inicio = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            medicao.tempo_template += time.perf_counter() - inicio
+
+
+class DjangoTemplatesMedidos(DjangoTemplates):
+    """Backend de templates do Django com a renderização medida (usado em TEMPLATES)"""
+
+    def get_template(self, template_name):
+        return TemplateMedido(super().get_template(template_name).template, self)
+
+    def from_string(self, template_code):
+        return TemplateMedido(self.engine.from_string(template_code), self)
+
+
+class TotaisView:
+    """Totais das requisições de uma view"""
+
+    def __init__(self, view):
+        self.view = view
+        self.requisicoes = 0
+        self.excedidas = 0
+        self.tempo_total = 0.0
+        self.tempo_maximo = 0.0
+        self.queries = 0
+        self.queries_maximo = 0
+        self.tempo_db = 0.0
+        self.tempo_template = 0.0
+        self.tempos = deque(maxlen=AMOSTRAS_POR_VIEW)
+
+    def registrar(self, medicao, excedida):
+        self.requisicoes += 1
+        self.excedidas += excedida
+        self.tempo_total += medicao.tempo_total
+        self.tempo_maximo = max(self.tempo_maximo, medicao.tempo_total)
+        self.queries += medicao.queries
+        self.queries_maximo = max(self.queries_maximo, medicao.queries)
+        self.tempo_db += medicao.tempo_db
+        self.tempo_template += medicao.tempo_template
+        self.tempos.append(medicao.tempo_total)
+
+    def resumo(self):
+        """Médias e percentis em milissegundos, no formato da página"""
+        # Importado aqui: simulacao -> projecao -> perf
+        from .simulacao import percentis
+
+        p50, p95 = percentis(self.tempos, (50, 95))
+        return {
+            'view': self.view,
+            'requisicoes': self.requisicoes,
+            'excedidas': self.excedidas,
+            'tempo_medio_ms': self.tempo_total / self.requisicoes * 1000,
+            'tempo_p50_ms': p50 * 1000,
+            'tempo_p95_ms': p95 * 1000,
+            'tempo_maximo_ms': self.tempo_maximo * 1000,
+            'queries_media': self.queries / self.requisicoes,
+            'queries_maximo': self.queries_maximo,
+            'db_medio_ms': self.tempo_db / self.requisicoes * 1000,
+            'template_medio_ms': self.tempo_template / self.requisicoes * 1000,
+        }
+
+
+class Agregados:
+    """Totais por view das requisições atendidas por este processo"""
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.zerar()
+
+    def zerar(self):
+        with self._trava:
+            self.desde = timezone.now()
+            self.por_view = {}
+            self.excedidas = deque(maxlen=EXCEDIDAS_RECENTES)
+
+    def registrar(self, request, medicao, excessos):
+        with self._trava:
+            totais = self.por_view.get(medicao.view)
+            if totais is None:
+                totais = self.por_view[medicao.view] = TotaisView(medicao.view)
+            totais.registrar(medicao, bool(excessos))
+            if excessos:
+                self.excedidas.appendleft({
+                    'quando': timezone.now(),
+                    'view': medicao.view,
+                    'metodo': request.method,
+                    'caminho': request.get_full_path(),
+                    'excessos': excessos,
+                })
+
+    def contexto(self):
+        """Totais por view (da mais lenta para a mais rápida em média) e excedidas recentes"""
+        with self._trava:
+            views = [totais.resumo() for totais in self.por_view.values()]
+            excedidas = list(self.excedidas)
+        return {
+            'desde': self.desde,
+            'pid': os.getpid(),
+            'views': sorted(views, key=lambda linha: linha['tempo_medio_ms'], reverse=True),
+            'excedidas': excedidas,
+        }
+
+
+AGREGADOS = Agregados()
+
+
+def _nome_view(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    funcao = match.func
+    return f'{funcao.__module__}.{getattr(funcao, "__qualname__", type(funcao).__qualname__)}'
+
+
+class DesempenhoMiddleware:
+    """
+    Mede cada requisição resolvida para uma view, registra nos agregados e
+    avisa no log quando ela passa do orçamento. Deve ser o primeiro da lista
+    MIDDLEWARE, para que o tempo inclua os demais.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        memoria.ligar_tracemalloc()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        medicao = Medicao()
+        token = _medicao_atual.set(medicao)
+        try:
+            response = self.get_response(request)
+        finally:
+            _medicao_atual.reset(token)
+        self.encerrar(request, response, medicao)
+        return response
+
+    async def __acall__(self, request):
+        medicao = Medicao()
+        token = _medicao_atual.set(medicao)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _medicao_atual.reset(token)
+        self.encerrar(request, response, medicao)
+        return response
+
+    def encerrar(self, request, response, medicao):
+        medicao.encerrar()
+        if getattr(settings, 'PERF_SERVER_TIMING', True):
+            response['Server-Timing'] = medicao.server_timing()
+        medicao.view = _nome_view(request)
+        if medicao.view is None:
+            # Estáticos, 404 de rota e afins não entram nos agregados
+            return
+        excessos = medicao.excessos(orcamento_da_view(medicao.view))
+        if excessos:
+            logger.warning(
+                '%s acima do orçamento em %s %s: %s', medicao.view, request.method, request.path,
+                ', '.join(f'{medida} {valor:.0f} > {limite}' for medida, valor, limite in excessos),
+            )
+        AGREGADOS.registrar(request, medicao, excessos)
+        if medicao.memoria is not None:
+            memoria.MEMORIA.registrar(medicao.view, medicao.memoria, memoria.ler())
+        registrar_requisicao(medicao, response.status_code)
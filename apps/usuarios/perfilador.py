@@ -0,0 +1,167 @@
+"""
+Perfil (cProfile) de requisições sob demanda, em produção.
+
+Uma requisição é perfilada quando o usuário logado tem ``perfilar_requisicoes``
+marcado no admin ou quando um staff acrescenta ``?__profile=<assinatura>`` ao
+endereço; a assinatura vale por uma hora, só para quem a gerou, e aparece na
+página ``/_perf/``. O resultado (estatísticas no formato do pstats e um resumo
+em texto ordenado pelo tempo acumulado) fica em PerfilRequisicao, com os
+arquivos para baixar no admin; só os últimos perfis de cada usuário são
+guardados.
+
+O cProfile mede o processo inteiro (sys.monitoring), então um processo perfila
+uma requisição por vez e as que chegam enquanto isso seguem sem perfil. Em
+workers assíncronos, o perfil inclui o que outras requisições fizeram no mesmo
+intervalo.
+"""
+import cProfile
+import io
+import logging
+import marshal
+import pstats
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.core import signing
+
+from .models import PerfilRequisicao
+from .perf import medicao_atual
+
+
+logger = logging.getLogger(__name__)
+
+PARAMETRO = '__profile'
+VALIDADE_ASSINATURA = 3600
+# Funções listadas no resumo em texto
+LINHAS_RESUMO = 80
+# Perfis guardados por usuário; os mais antigos são apagados a cada perfil novo
+PERFIS_POR_USUARIO = 20
+
+_signer = signing.TimestampSigner(salt='usuarios.perfilador')
+_trava = threading.Lock()
+
+
+def assinatura(usuario):
+    """Valor de ``?__profile=`` que perfila as requisições de ``usuario`` (staff) por uma hora"""
+    return _signer.sign(str(usuario.pk))
+
+
+def _assinatura_valida(valor, usuario):
+    try:
+        return _signer.unsign(valor, max_age=VALIDADE_ASSINATURA) == str(usuario.pk)
+    except signing.BadSignature:
+        return False
+
+
+def _tem_sessao(request):
+    # Sem sessão não há usuário logado para perfilar; assim as requisições sem
+    # cookie (o coletor do /metrics, com token) não resolvem o request.user
+    sessao = getattr(request, 'session', None)
+    return sessao is not None and sessao.session_key is not None
+
+
+def deve_perfilar(request, usuario):
+    if not usuario.is_authenticated:
+        return False
+    if usuario.perfilar_requisicoes:
+        return True
+    valor = request.GET.get(PARAMETRO)
+    return bool(valor) and usuario.is_staff and _assinatura_valida(valor, usuario)
+
+
+def _iniciar():
+    """Profiler ligado, ou None se outro perfil estiver em andamento no processo"""
+    if not _trava.acquire(blocking=False):
+        return None
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Outra ferramenta (um depurador, por exemplo) já usa o sys.monitoring
+        _trava.release()
+        return None
+    return profiler
+
+
+def _parar(profiler):
+    profiler.disable()
+    _trava.release()
+
+
+def resumo(estatisticas):
+    """Texto do pstats ordenado pelo tempo acumulado (e, depois, pelo tempo próprio)"""
+    saida = io.StringIO()
+    estatisticas.stream = saida
+    estatisticas.sort_stats(pstats.SortKey.CUMULATIVE, pstats.SortKey.TIME).print_stats(LINHAS_RESUMO)
+    return saida.getvalue()
+
+
+def salvar(request, usuario, response, profiler, segundos):
+    estatisticas = pstats.Stats(profiler)
+    medicao = medicao_atual()
+    perfil = PerfilRequisicao.objects.create(
+        usuario=usuario,
+        metodo=request.method,
+        caminho=request.get_full_path()[:PerfilRequisicao._meta.get_field('caminho').max_length],
+        status=response.status_code,
+        tempo_ms=segundos * 1000,
+        queries=medicao.queries if medicao is not None else None,
+        # O mesmo conteúdo que pstats.Stats.dump_stats grava em arquivo
+        estatisticas=marshal.dumps(estatisticas.stats),
+        resumo=resumo(estatisticas),
+    )
+    antigos = PerfilRequisicao.objects.filter(usuario=usuario).order_by('-data_criacao', '-id').values_list(
+        'id', flat=True
+    )[PERFIS_POR_USUARIO:]
+    PerfilRequisicao.objects.filter(id__in=list(antigos)).delete()
+    return perfil
+
+
+def _gravar(request, *args):
+    # Um perfil que não pôde ser gravado não derruba a resposta
+    try:
+        salvar(request, *args)
+    except Exception:
+        logger.exception('Não foi possível gravar o perfil de %s', request.path)
+
+
+class PerfiladorMiddleware:
+    """Perfila as requisições marcadas (ver acima); vem depois do AuthenticationMiddleware"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        usuario = request.user if _tem_sessao(request) else None
+        profiler = _iniciar() if usuario is not None and deve_perfilar(request, usuario) else None
+        if profiler is None:
+            return self.get_response(request)
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _parar(profiler)
+        _gravar(request, usuario, response, profiler, time.perf_counter() - inicio)
+        return response
+
+    async def __acall__(self, request):
+        usuario = await request.auser() if _tem_sessao(request) else None
+        profiler = _iniciar() if usuario is not None and deve_perfilar(request, usuario) else None
+        if profiler is None:
+            return await self.get_response(request)
+        inicio = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _parar(profiler)
+        await sync_to_async(_gravar)(request, usuario, response, profiler, time.perf_counter() - inicio)
+        return response
@@ -0,0 +1,249 @@
+"""
+Motor de projeção de peso dos lotes.
+
+Carrega de uma só vez as projeções de ganho (GMD), os períodos personalizados
+e os gastos nutricionais de todos os lotes de uma propriedade e calcula a matriz
+lote × mês de ganho e peso acumulado. Cada lote é uma linha do tempo contínua,
+atravessando quantos anos houver: o peso nunca reinicia na virada do ano e cada
+view recorta a janela de meses que exibe. É a base comum do dashboard de lotes,
+do faturamento e do ponto de equilíbrio.
+"""
+from bisect import bisect_left, bisect_right
+from calendar import monthrange
+from decimal import Decimal
+from functools import lru_cache
+from itertools import accumulate
+
+from .models import Lote, ProjecaoGanho, PeriodoPersonalizado, GastoNutricional
+from .perf import trecho
+
+
+MESES_NOMES = dict(ProjecaoGanho.MES_CHOICES)
+KG_POR_ARROBA = Decimal('15')
+
+
+@lru_cache(maxsize=None)
+def dias_no_mes(ano, mes):
+    """Retorna a quantidade de dias do mês"""
+    return monthrange(ano, mes)[1]
+
+
+@lru_cache(maxsize=None)
+def _decimal(valor):
+    return Decimal(valor)
+
+
+class DadosProjecao:
+    """Linhas cruas de projeção, período personalizado e gasto de uma propriedade, indexadas por lote"""
+
+    def __init__(self, lotes, projecoes, periodos, gastos=None):
+        self.lotes = lotes
+        # lote_id -> [(ano, mes, gmd_kg), ...] em ordem cronológica
+        self.projecoes = projecoes
+        # (lote_id, ano, mes) -> periodo_dias
+        self.periodos = periodos
+        # (lote_id, ano, mes) -> gasto_diario
+        self.gastos = gastos or {}
+
+    def tem_projecao(self, lote_id):
+        return bool(self.projecoes.get(lote_id))
+
+    def primeiro_gmd(self, lote_id):
+        """GMD da primeira projeção (em ordem de ano/mês) do lote"""
+        registros = self.projecoes.get(lote_id)
+        return registros[0][2] if registros else None
+
+    def gasto_diario(self, lote_id, ano, mes):
+        """Gasto nutricional diário do lote no mês (None se não cadastrado)"""
+        return self.gastos.get((lote_id, ano, mes))
+
+
+class MesProjetado:
+    """Ganho e peso projetados de um lote em um mês"""
+    __slots__ = ('ano', 'mes', 'gmd', 'dias', 'periodo_personalizado', 'ganho', 'peso_entrada', 'peso_saida')
+
+    def __init__(self, ano, mes, gmd, dias, periodo_personalizado, ganho, peso_entrada, peso_saida):
+        self.ano = ano
+        self.mes = mes
+        self.gmd = gmd
+        self.dias = dias
+        self.periodo_personalizado = periodo_personalizado
+        self.ganho = ganho
+        self.peso_entrada = peso_entrada
+        self.peso_saida = peso_saida
+
+    @property
+    def chave(self):
+        return (self.ano, self.mes)
+
+    @property
+    def mes_nome(self):
+        return MESES_NOMES[self.mes]
+
+
+class ProjecaoLote:
+    """Sequência cronológica (linha do tempo) de meses projetados de um lote"""
+
+    def __init__(self, lote, meses):
+        self.lote = lote
+        self.meses = meses
+        self.por_chave = {mes.chave: mes for mes in meses}
+        self._chaves = [mes.chave for mes in meses]
+
+    def antes(self, inicio):
+        """Meses anteriores a ``inicio`` (ano, mes)"""
+        return self.meses[:bisect_left(self._chaves, inicio)]
+
+    def janela(self, inicio, fim):
+        """Meses de ``inicio`` a ``fim`` (ano, mes), inclusive, com o peso acumulado de toda a linha do tempo"""
+        return self.meses[bisect_left(self._chaves, inicio):bisect_right(self._chaves, fim)]
+
+    @property
+    def peso_inicial(self):
+        return self.lote.peso_kg
+
+    @property
+    def peso_final(self):
+        return self.meses[-1].peso_saida if self.meses else self.lote.peso_kg
+
+
+class MatrizProjecao:
+    """Matriz lote × mês com as projeções de todos os lotes de uma propriedade"""
+
+    def __init__(self, linhas):
+        self.linhas = linhas
+        self.por_lote = {linha.lote.id: linha for linha in linhas}
+        self.chaves = sorted({chave for linha in linhas for chave in linha.por_chave})
+
+    def __iter__(self):
+        return iter(self.linhas)
+
+    def __len__(self):
+        return len(self.linhas)
+
+    def get(self, lote_id):
+        return self.por_lote.get(lote_id)
+
+
+def carregar_dados(propriedade, lotes=None, ano=None, meses=None, com_periodos=False, com_gastos=False):
+    """
+    Busca lotes, projeções de ganho e (opcionalmente) períodos personalizados
+    e gastos nutricionais da propriedade com um número fixo de queries. Sem
+    propriedade, carrega apenas os lotes informados.
+    """
+    if lotes is None:
+        lotes = list(Lote.objects.filter(propriedade=propriedade).order_by('nome'))
+    consultas = _consultas_dados(propriedade, lotes, ano, meses, com_periodos, com_gastos)
+    return _montar_dados(lotes, *(list(consulta) for consulta in consultas))
+
+
+async def carregar_dados_async(propriedade, lotes=None, ano=None, meses=None, com_periodos=False,
+                               com_gastos=False):
+    """
+    Versão de ``carregar_dados`` para as views assíncronas: as consultas de
+    lotes, projeções, períodos e gastos rodam pelo ORM assíncrono sem prender
+    o laço de eventos.
+    """
+    consultas = list(_consultas_dados(propriedade, lotes, ano, meses, com_periodos, com_gastos))
+    if lotes is None:
+        consultas.append(Lote.objects.filter(propriedade=propriedade).order_by('nome'))
+    linhas = await listar_todas_async(consultas)
+    if lotes is None:
+        lotes = linhas.pop()
+    return _montar_dados(lotes, *linhas)
+
+
+async def listar_async(consulta):
+    """Linhas da consulta com o ORM assíncrono"""
+    return [linha async for linha in consulta]
+
+
+async def listar_todas_async(consultas):
+    """Linhas de cada consulta, na ordem recebida"""
+    # Uma por vez: o ORM assíncrono executa cada consulta na mesma thread do
+    # executor sensível a threads (a da conexão da requisição), então disparar
+    # todas com asyncio.gather só as enfileiraria lá do mesmo jeito
+    return [await listar_async(consulta) for consulta in consultas]
+
+
+def _consultas_dados(propriedade, lotes, ano, meses, com_periodos, com_gastos):
+    # Consultas de projeções, períodos e gastos, ainda não executadas; as
+    # desligadas viram consultas vazias, resolvidas sem ir ao banco
+    if propriedade is not None:
+        filtros = {'lote__propriedade': propriedade}
+    else:
+        filtros = {'lote__in': [lote.id for lote in lotes]}
+    if ano is not None:
+        filtros['ano'] = ano
+    if meses is not None:
+        filtros['mes__in'] = list(meses)
+
+    projecoes = ProjecaoGanho.objects.filter(**filtros).order_by('lote_id', 'ano', 'mes').values_list(
+        'lote_id', 'ano', 'mes', 'gmd_kg'
+    )
+    periodos = PeriodoPersonalizado.objects.filter(**filtros, periodo_dias__isnull=False).values_list(
+        'lote_id', 'ano', 'mes', 'periodo_dias'
+    )
+    gastos = GastoNutricional.objects.filter(**filtros).values_list('lote_id', 'ano', 'mes', 'gasto_diario')
+    return projecoes, periodos if com_periodos else periodos.none(), gastos if com_gastos else gastos.none()
+
+
+def _montar_dados(lotes, linhas_projecoes, linhas_periodos, linhas_gastos):
+    projecoes = {}
+    for lote_id, ano_proj, mes, gmd_kg in linhas_projecoes:
+        projecoes.setdefault(lote_id, []).append((ano_proj, mes, gmd_kg))
+
+    periodos = {}
+    for lote_id, ano_periodo, mes, periodo_dias in linhas_periodos:
+        periodos[(lote_id, ano_periodo, mes)] = periodo_dias
+
+    gastos = {}
+    for lote_id, ano_gasto, mes, gasto_diario in linhas_gastos:
+        gastos[(lote_id, ano_gasto, mes)] = gasto_diario
+
+    return DadosProjecao(lotes, projecoes, periodos, gastos)
+
+
+def projetar(dados, usar_periodos=False, gmd_por_lote=None):
+    """
+    Calcula a matriz de projeção a partir dos dados carregados.
+
+    - usar_periodos: usa o período personalizado (quando houver) no lugar dos dias do mês
+    - gmd_por_lote: {lote_id: gmd} para substituir o GMD das projeções por um valor fixo
+    """
+    gmd_por_lote = gmd_por_lote or {}
+    linhas = []
+    with trecho('projecao'):
+        for lote in dados.lotes:
+            registros = dados.projecoes.get(lote.id)
+            if not registros:
+                continue
+            linhas.append(_projetar_lote(
+                lote, registros, dados.periodos if usar_periodos else None, gmd_por_lote.get(lote.id)
+            ))
+    return MatrizProjecao(linhas)
+
+
+def _projetar_lote(lote, registros, periodos, gmd_fixo):
+    # Colunas do lote calculadas de uma vez: GMD, dias, ganho e peso acumulado
+    anos = [registro[0] for registro in registros]
+    meses = [registro[1] for registro in registros]
+    gmds = [gmd_fixo if gmd_fixo is not None else registro[2] for registro in registros]
+
+    personalizados = [None] * len(registros)
+    if periodos:
+        personalizados = [periodos.get((lote.id, ano, mes)) for ano, mes in zip(anos, meses)]
+    dias = [
+        personalizado or dias_no_mes(ano, mes)
+        for ano, mes, personalizado in zip(anos, meses, personalizados)
+    ]
+    ganhos = [gmd * _decimal(d) for gmd, d in zip(gmds, dias)]
+
+    pesos = list(accumulate(ganhos, initial=lote.peso_kg))
+    entradas = pesos[:-1]
+    saidas = pesos[1:]
+
+    return ProjecaoLote(lote, [
+        MesProjetado(*valores)
+        for valores in zip(anos, meses, gmds, dias, personalizados, ganhos, entradas, saidas)
+    ])
@@ -0,0 +1,243 @@
+"""
+Análise de sensibilidade do faturamento e do ponto de equilíbrio.
+
+Avalia uma grade de cenários GMD × valor da @ × rendimento de carcaça para
+todos os lotes de uma propriedade, sem gravar nada no banco. A projeção de
+cada lote é feita uma única vez (``carregar_base``). Depois disso cada
+cenário é aritmética em forma fechada: somar ``d`` kg/dia ao GMD de todos os
+meses leva o peso final de ``P`` para ``P + d × dias``. O faturamento é
+``(valor da @ + Δ) × quantidade × peso × rendimento / 1500``, um produto
+externo de três vetores por lote. O ponto de equilíbrio (ao fim da projeção,
+com os períodos personalizados e os gastos nutricionais) não depende do valor
+da @, então é calculado só sobre GMD × rendimento.
+
+A grade tem um limite de células (lote × cenário) e os cubos de cada lote só
+vão na resposta em grades pequenas; nas demais, só os totais da propriedade,
+somados sem montar os cubos. ``avaliar`` pode dividir os lotes entre
+processos, para uso fora das requisições; por isso este módulo só importa os
+models dentro de ``carregar_base`` e os processos filhos importam apenas as
+funções de cálculo.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import math
+
+
+# Variações padrão em torno dos valores salvos de cada lote
+VARIACOES_GMD = (-0.2, -0.1, 0.0, 0.1, 0.2)  # kg/dia
+VARIACOES_ARROBA = (-20.0, -10.0, 0.0, 10.0, 20.0)  # R$/@
+VARIACOES_RENDIMENTO = (-2.0, -1.0, 0.0, 1.0, 2.0)  # pontos percentuais
+
+MAX_VALORES_POR_EIXO = 41
+# Células (lote × cenário) aceitas em uma grade
+MAX_CELULAS = 2_000_000
+# Até quantas células a resposta traz os cubos de cada lote, além dos totais
+MAX_CELULAS_POR_LOTE = 50_000
+
+RENDIMENTO_PADRAO = 50.0
+
+
+class BaseLote:
+    """Projeção de um lote reduzida ao que a grade precisa (valores em float)"""
+    __slots__ = (
+        'lote_id', 'nome', 'quantidade', 'gmd', 'valor_arroba',
+        'peso_final', 'dias', 'peso_final_pe', 'dias_pe', 'custo_total',
+    )
+
+    def __init__(self, lote_id, nome, quantidade, gmd, valor_arroba,
+                 peso_final, dias, peso_final_pe, dias_pe, custo_total):
+        self.lote_id = lote_id
+        self.nome = nome
+        self.quantidade = quantidade
+        # GMD base e valor da @ salvos (None se não houver)
+        self.gmd = gmd
+        self.valor_arroba = valor_arroba
+        # Faturamento: peso final e dias projetados como em faturamento_view
+        self.peso_final = peso_final
+        self.dias = dias
+        # Ponto de equilíbrio: projeção com os períodos personalizados e custo acumulado
+        self.peso_final_pe = peso_final_pe
+        self.dias_pe = dias_pe
+        self.custo_total = custo_total
+
+
+def carregar_base(propriedade):
+    """
+    Projeta todos os lotes da propriedade uma vez (número fixo de queries) e
+    retorna (rendimento base, [BaseLote]).
+    """
+    from decimal import Decimal
+
+    from .models import Lote
+    from .projecao import carregar_dados, projetar
+
+    lotes = list(Lote.objects.filter(propriedade=propriedade).order_by('nome'))
+    dados = carregar_dados(propriedade, lotes=lotes, com_periodos=True, com_gastos=True)
+
+    # Mesma regra do faturamento: com algum GMD salvo, cada lote usa um GMD fixo
+    # (o salvo ou o da primeira projeção); sem nenhum, valem os GMDs das projeções
+    gmd_fixo_por_lote = {}
+    if any(lote.ultimo_gmd_usado for lote in lotes):
+        gmd_fixo_por_lote = {
+            lote.id: lote.ultimo_gmd_usado or dados.primeiro_gmd(lote.id)
+            for lote in lotes if dados.tem_projecao(lote.id)
+        }
+    matriz_faturamento = projetar(dados, gmd_por_lote=gmd_fixo_por_lote)
+    matriz_pe = projetar(dados, usar_periodos=True)
+
+    base = []
+    for linha in matriz_faturamento:
+        lote = linha.lote
+        linha_pe = matriz_pe.get(lote.id)
+        custo_total = Decimal(lote.valor_compra) + sum(
+            (dados.gasto_diario(lote.id, mes.ano, mes.mes) or Decimal('0')) * mes.dias
+            for mes in linha_pe.meses
+        )
+        gmd = gmd_fixo_por_lote.get(lote.id) or dados.primeiro_gmd(lote.id)
+        base.append(BaseLote(
+            lote_id=lote.id,
+            nome=lote.nome,
+            quantidade=lote.quantidade,
+            gmd=float(gmd),
+            valor_arroba=float(lote.ultimo_valor_arroba) if lote.ultimo_valor_arroba else None,
+            peso_final=float(linha.peso_final),
+            dias=sum(mes.dias for mes in linha.meses),
+            peso_final_pe=float(linha_pe.peso_final),
+            dias_pe=sum(mes.dias for mes in linha_pe.meses),
+            custo_total=float(custo_total),
+        ))
+
+    rendimento = float(propriedade.ultimo_rendimento_carcaca or RENDIMENTO_PADRAO)
+    return rendimento, base
+
+
+def avaliar_lotes(base, variacoes_gmd, variacoes_arroba, rendimentos):
+    """
+    Avalia a grade para cada lote. Retorna, na ordem de ``base``, pares
+    (faturamento[g][a][r] ou None sem valor da @, ponto_equilibrio[g][r]).
+    """
+    fatores = [rendimento / 100 / 15 for rendimento in rendimentos]
+    resultados = []
+    for lote in base:
+        # Arrobas de carcaça por cenário de GMD e rendimento (matriz g × r)
+        pesos = [lote.peso_final + delta * lote.dias for delta in variacoes_gmd]
+        arrobas = [[lote.quantidade * peso * fator for fator in fatores] for peso in pesos]
+
+        faturamento = None
+        if lote.valor_arroba is not None:
+            valores = [lote.valor_arroba + delta for delta in variacoes_arroba]
+            faturamento = [[[valor * a for a in linha] for valor in valores] for linha in arrobas]
+
+        pesos_pe = [lote.peso_final_pe + delta * lote.dias_pe for delta in variacoes_gmd]
+        ponto_equilibrio = [
+            [lote.custo_total / (peso * fator) if peso * fator > 0 else None for fator in fatores]
+            for peso in pesos_pe
+        ]
+        resultados.append((faturamento, ponto_equilibrio))
+    return resultados
+
+
+def avaliar(base, variacoes_gmd, variacoes_arroba, rendimentos, processos=None):
+    """
+    Avalia a grade para todos os lotes; com ``processos``, divide-os entre
+    processos (para cálculos em lote, nunca dentro de uma requisição).
+    """
+    processos = min(processos or 1, len(base))
+    if processos <= 1:
+        return avaliar_lotes(base, variacoes_gmd, variacoes_arroba, rendimentos)
+
+    tamanho = -(-len(base) // processos)
+    blocos = [base[inicio:inicio + tamanho] for inicio in range(0, len(base), tamanho)]
+    eixos = (variacoes_gmd, variacoes_arroba, rendimentos)
+    resultados = []
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        for parcial in executor.map(avaliar_lotes, blocos, *[[eixo] * len(blocos) for eixo in eixos]):
+            resultados.extend(parcial)
+    return resultados
+
+
+def faturamento_total(base, variacoes_gmd, variacoes_arroba, rendimentos):
+    """
+    Faturamento da propriedade por cenário [g][a][r] (lotes com valor da @
+    salvo), sem montar o cubo de cada lote: com as arrobas ``A`` do lote,
+    Σ (valor + Δ) × A = Σ valor × A + Δ × Σ A.
+    """
+    fatores = [rendimento / 100 / 15 for rendimento in rendimentos]
+    soma_valor = [[0.0] * len(fatores) for _ in variacoes_gmd]
+    soma_arrobas = [[0.0] * len(fatores) for _ in variacoes_gmd]
+    for lote in base:
+        if lote.valor_arroba is None:
+            continue
+        for g, delta in enumerate(variacoes_gmd):
+            peso = lote.quantidade * (lote.peso_final + delta * lote.dias)
+            for r, fator in enumerate(fatores):
+                arrobas = peso * fator
+                soma_valor[g][r] += lote.valor_arroba * arrobas
+                soma_arrobas[g][r] += arrobas
+    return [
+        [[valor + delta * arrobas for valor, arrobas in zip(valores, somas)] for delta in variacoes_arroba]
+        for valores, somas in zip(soma_valor, soma_arrobas)
+    ]
+
+
+def grade_sensibilidade(rendimento_base, base, variacoes_gmd=VARIACOES_GMD,
+                        variacoes_arroba=VARIACOES_ARROBA, variacoes_rendimento=VARIACOES_RENDIMENTO):
+    """
+    Monta o resultado da grade no formato servido como JSON. ValueError se a
+    grade passar de ``MAX_CELULAS``; acima de ``MAX_CELULAS_POR_LOTE``, sem os
+    cubos dos lotes (``lotes`` é None).
+    """
+    celulas = len(base) * len(variacoes_gmd) * len(variacoes_arroba) * len(variacoes_rendimento)
+    if celulas > MAX_CELULAS:
+        raise ValueError(
+            f'A grade teria {celulas} células (lotes × cenários); o máximo é {MAX_CELULAS}. '
+            'Informe menos valores por eixo.'
+        )
+    rendimentos = [rendimento_base + delta for delta in variacoes_rendimento]
+    resultado = {
+        'eixos': {
+            'gmd': list(variacoes_gmd),
+            'valor_arroba': list(variacoes_arroba),
+            'rendimento': rendimentos,
+        },
+        'rendimento_base': rendimento_base,
+        'faturamento_total': faturamento_total(base, variacoes_gmd, variacoes_arroba, rendimentos),
+        'lotes': None,
+    }
+    if celulas > MAX_CELULAS_POR_LOTE:
+        return resultado
+
+    resultados = avaliar_lotes(base, variacoes_gmd, variacoes_arroba, rendimentos)
+    resultado['lotes'] = [
+        {
+            'lote_id': lote.lote_id,
+            'lote_nome': lote.nome,
+            'gmd': lote.gmd,
+            'valor_arroba': lote.valor_arroba,
+            'faturamento': faturamento,
+            'ponto_equilibrio': ponto_equilibrio,
+        }
+        for lote, (faturamento, ponto_equilibrio) in zip(base, resultados)
+    ]
+    return resultado
+
+
+def ler_variacoes(texto, padrao, nome):
+    """
+    Lê uma lista de variações do parâmetro da URL (ValueError se inválida).
+    Aceita ``-0.1,0,0.1`` ou, com vírgula decimal, ``-0,1;0;0,1``.
+    """
+    if not texto:
+        return padrao
+    if ';' in texto:
+        partes = [parte.replace(',', '.') for parte in texto.split(';')]
+    else:
+        partes = texto.split(',')
+    try:
+        valores = tuple(float(parte.strip()) for parte in partes)
+    except ValueError:
+        raise ValueError(f'Parâmetro {nome} inválido.')
+    if len(valores) > MAX_VALORES_POR_EIXO:
+        raise ValueError(f'Informe no máximo {MAX_VALORES_POR_EIXO} valores no parâmetro {nome}.')
+    if not all(math.isfinite(valor) for valor in valores):
+        raise ValueError(f'Os valores do parâmetro {nome} devem ser números finitos.')
+    return valores
@@ -0,0 +1,73 @@
+"""
+Sinais que mantêm os dados derivados (livro mensal dos lotes e cache dos
+dashboards) em dia com as gravações feitas pelas views, pelo admin e pelos
+formulários.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import (
+    Usuario, Propriedade, Lote, ProjecaoGanho, GastoNutricional, CustoFixo, Receita, Mortalidade, PeriodoPersonalizado
+)
+from .lote_mes import agendar_atualizacao
+from .cache_propriedade import agendar_invalidacao, propriedade_do_registro
+
+
+# Campos do lote que não influenciam o livro mensal
+CAMPOS_LOTE_FORA_DO_LIVRO = {'ultimo_gmd_usado', 'ultimo_valor_arroba', 'data_atualizacao'}
+
+# Exclusões em cascata a partir destes modelos levam junto o livro e o cache dos lotes
+ORIGENS_EM_CASCATA = (Usuario, Propriedade, Lote)
+
+
+@receiver([post_save, post_delete], sender=ProjecaoGanho)
+@receiver([post_save, post_delete], sender=GastoNutricional)
+@receiver([post_save, post_delete], sender=PeriodoPersonalizado)
+def atualizar_livro_mensal(sender, instance, signal, created=False, origin=None, **kwargs):
+    """Recalcula o livro mensal do lote a partir do mês inserido ou removido"""
+    if isinstance(origin, ORIGENS_EM_CASCATA):
+        # Exclusão em cascata: as linhas do livro do lote também são apagadas
+        return
+    if signal is post_save and not created:
+        # Uma edição pode ter mudado o mês/ano do registro: recalcula o lote inteiro
+        agendar_atualizacao(instance.lote_id)
+    else:
+        agendar_atualizacao(instance.lote_id, instance.ano, instance.mes)
+
+
+@receiver(post_save, sender=Lote)
+def atualizar_livro_mensal_lote(sender, instance, created, update_fields=None, **kwargs):
+    """Peso inicial e quantidade de animais entram em todas as linhas do livro do lote"""
+    if created:
+        return
+    if update_fields and set(update_fields) <= CAMPOS_LOTE_FORA_DO_LIVRO:
+        return
+    agendar_atualizacao(instance.id)
+
+
+# Os receptores abaixo são registrados depois dos do livro mensal para que a
+# invalidação do cache aconteça após o livro ser recalculado no commit
+
+@receiver([post_save, post_delete], sender=Propriedade)
+def invalidar_cache_propriedade(sender, instance, **kwargs):
+    agendar_invalidacao(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Lote)
+@receiver([post_save, post_delete], sender=CustoFixo)
+@receiver([post_save, post_delete], sender=Receita)
+def invalidar_cache_registro_propriedade(sender, instance, **kwargs):
+    agendar_invalidacao(instance.propriedade_id)
+
+
+@receiver([post_save, post_delete], sender=ProjecaoGanho)
+@receiver([post_save, post_delete], sender=GastoNutricional)
+@receiver([post_save, post_delete], sender=Mortalidade)
+@receiver([post_save, post_delete], sender=PeriodoPersonalizado)
+def invalidar_cache_registro_lote(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, ORIGENS_EM_CASCATA):
+        # Exclusão em cascata: a propriedade ou o lote de origem já invalida o cache
+        return
+    propriedade_id = propriedade_do_registro(instance)
+    if propriedade_id is not None:
+        agendar_invalidacao(propriedade_id)
@@ -0,0 +1,315 @@
+"""
+Simulação de Monte Carlo do resultado dos lotes.
+
+Sorteia cenários correlacionados de GMD, valor da @ e mortalidade e calcula,
+para cada lote e para a propriedade, faixas de percentis do resultado, da
+rentabilidade e do ponto de equilíbrio (R$/@), com as mesmas regras do
+faturamento e do fluxo de caixa.
+
+Em cada cenário:
+
+- O GMD de cada mês projetado (``ProjecaoGanho``) é
+  ``gmd × (1 + cv × ε)``, com ``ε = √ρ z + √(1-ρ) η``. O choque ``z`` é comum
+  à propriedade e ``η`` é próprio de cada lote e mês. Como o ganho total é uma
+  soma de normais, os meses se reduzem a uma fórmula fechada:
+  ``ganho = G + cv √ρ G z + cv √(1-ρ) H η'``, com ``G = Σ gmd × dias`` e
+  ``H = √Σ (gmd × dias)²``. É um sorteio por lote, qualquer que seja o
+  número de meses.
+- O valor da @ e a taxa de mortalidade recebem choques lognormais comuns a
+  todos os lotes. Os três choques comuns são correlacionados pela fatoração
+  de Cholesky da matriz de correlação.
+
+Os cenários são processados em blocos de tamanho fixo e, ao fim de cada
+bloco, ``simular`` produz os percentis parciais da propriedade. A semente
+torna o resultado reproduzível. Só ``carregar_lotes`` consulta o banco, então
+a simulação pode ser transmitida aos poucos depois que os dados foram lidos.
+"""
+from array import array
+from decimal import Decimal
+import math
+import random
+
+from django.db.models import Sum
+
+from .fluxo_caixa import PERCENTUAL_IMPOSTOS, PERCENTUAL_SANITARIO, PERCENTUAL_SERVICOS
+from .models import CustoFixo, Lote, Mortalidade
+from .projecao import carregar_dados, projetar
+
+
+PERCENTIS = (5, 25, 50, 75, 95)
+# Tamanho fixo dos blocos: a ordem dos sorteios, e portanto o resultado, não depende de quantos blocos houver
+CENARIOS_POR_BLOCO = 1000
+MAX_CENARIOS = 20000
+
+RENDIMENTO_PADRAO = 50.0
+
+
+class Parametros:
+    """Distribuições sorteadas na simulação"""
+
+    CAMPOS = {
+        'cenarios': (int, 10000),
+        'semente': (int, 0),
+        # Coeficiente de variação do GMD mensal e parcela da variação comum a todos os lotes
+        'cv_gmd': (float, 0.15),
+        'correlacao_lotes': (float, 0.5),
+        # Volatilidade (desvio do log) do valor da @ e da taxa de mortalidade no horizonte
+        'volatilidade_arroba': (float, 0.12),
+        'volatilidade_mortalidade': (float, 0.5),
+        # Correlação entre os choques comuns
+        'correlacao_gmd_arroba': (float, -0.2),
+        'correlacao_gmd_mortalidade': (float, -0.3),
+        'correlacao_arroba_mortalidade': (float, 0.0),
+    }
+
+    def __init__(self, **valores):
+        for campo, (_, padrao) in self.CAMPOS.items():
+            setattr(self, campo, valores.get(campo, padrao))
+        self._validar()
+
+    @classmethod
+    def do_request(cls, dados):
+        """Lê os parâmetros da query string (ValueError se inválidos)"""
+        valores = {}
+        for campo, (tipo, _) in cls.CAMPOS.items():
+            texto = dados.get(campo, '').strip()
+            if texto:
+                try:
+                    valores[campo] = tipo(texto.replace(',', '.'))
+                except ValueError:
+                    raise ValueError(f'Parâmetro {campo} inválido.')
+        return cls(**valores)
+
+    def _validar(self):
+        if not 1 <= self.cenarios <= MAX_CENARIOS:
+            raise ValueError(f'A quantidade de cenários deve estar entre 1 e {MAX_CENARIOS}.')
+        for campo, (tipo, _) in self.CAMPOS.items():
+            if tipo is float and not math.isfinite(getattr(self, campo)):
+                raise ValueError(f'O parâmetro {campo} deve ser um número.')
+        for campo in ('cv_gmd', 'volatilidade_arroba', 'volatilidade_mortalidade'):
+            valor = getattr(self, campo)
+            if valor < 0:
+                raise ValueError(f'O parâmetro {campo} deve ser um número não negativo.')
+        if not 0 <= self.correlacao_lotes <= 1:
+            raise ValueError('A correlação entre os lotes deve estar entre 0 e 1.')
+        self.cholesky = _cholesky([
+            [1.0, self.correlacao_gmd_arroba, self.correlacao_gmd_mortalidade],
+            [self.correlacao_gmd_arroba, 1.0, self.correlacao_arroba_mortalidade],
+            [self.correlacao_gmd_mortalidade, self.correlacao_arroba_mortalidade, 1.0],
+        ])
+
+    def como_dict(self):
+        return {campo: getattr(self, campo) for campo in self.CAMPOS}
+
+
+class LoteSimulado:
+    """Valores de um lote que não mudam entre os cenários (em float)"""
+    __slots__ = (
+        'lote_id', 'nome', 'quantidade', 'peso_inicial', 'ganho', 'desvio_mensal',
+        'valor_arroba', 'mortalidade', 'investimento', 'alimentacao',
+    )
+
+    def __init__(self, lote_id, nome, quantidade, peso_inicial, ganho, desvio_mensal,
+                 valor_arroba, mortalidade, investimento, alimentacao):
+        self.lote_id = lote_id
+        self.nome = nome
+        self.quantidade = quantidade
+        self.peso_inicial = peso_inicial
+        # G = Σ gmd × dias e H = √Σ (gmd × dias)² da projeção
+        self.ganho = ganho
+        self.desvio_mensal = desvio_mensal
+        self.valor_arroba = valor_arroba
+        # Taxa de mortalidade acumulada no horizonte (0 a 1)
+        self.mortalidade = mortalidade
+        self.investimento = investimento
+        self.alimentacao = alimentacao
+
+
+def carregar_lotes(propriedade, valor_arroba_padrao=None):
+    """
+    Projeta os lotes com os GMDs mês a mês e os períodos personalizados e
+    retorna (rendimento, custos fixos do horizonte, [LoteSimulado], [nomes
+    dos lotes sem valor da @]). Os lotes sem valor da @ salvo usam
+    ``valor_arroba_padrao``; sem ele, ficam de fora.
+    """
+    lotes = list(Lote.objects.filter(propriedade=propriedade).order_by('nome'))
+    dados = carregar_dados(propriedade, lotes=lotes, com_periodos=True, com_gastos=True)
+    matriz = projetar(dados, usar_periodos=True)
+
+    mortalidades = {}
+    for lote_id, ano, mes, percentual in Mortalidade.objects.filter(lote__propriedade=propriedade).values_list(
+        'lote_id', 'ano', 'mes', 'percentual'
+    ):
+        mortalidades[(lote_id, ano, mes)] = float(percentual) / 100
+
+    simulados = []
+    sem_preco = []
+    anos = set()
+    for linha in matriz:
+        lote = linha.lote
+        valor_arroba = lote.ultimo_valor_arroba or valor_arroba_padrao
+        if not valor_arroba:
+            sem_preco.append(lote.nome)
+            continue
+
+        sobrevivencia = 1.0
+        gasto_por_animal = Decimal('0')
+        ganhos = []
+        for mes in linha.meses:
+            anos.add(mes.ano)
+            ganhos.append(float(mes.ganho))
+            sobrevivencia *= 1 - mortalidades.get((lote.id, mes.ano, mes.mes), 0.0)
+            gasto_por_animal += (dados.gasto_diario(lote.id, mes.ano, mes.mes) or Decimal('0')) * mes.dias
+
+        simulados.append(LoteSimulado(
+            lote_id=lote.id,
+            nome=lote.nome,
+            quantidade=lote.quantidade,
+            peso_inicial=float(lote.peso_kg),
+            ganho=sum(ganhos),
+            desvio_mensal=math.sqrt(sum(ganho * ganho for ganho in ganhos)),
+            valor_arroba=float(valor_arroba),
+            mortalidade=1 - sobrevivencia,
+            investimento=float(lote.valor_compra),
+            alimentacao=float(gasto_por_animal * lote.quantidade),
+        ))
+
+    custos_fixos = CustoFixo.objects.filter(propriedade=propriedade, ano__in=anos).aggregate(
+        total=Sum('valor')
+    )['total'] or Decimal('0')
+    rendimento = float(propriedade.ultimo_rendimento_carcaca or RENDIMENTO_PADRAO)
+    return rendimento, float(custos_fixos), simulados, sem_preco
+
+
+def simular(rendimento, custos_fixos, lotes, parametros):
+    """
+    Gera os resultados da simulação: um dict ``parcial`` com os percentis da
+    propriedade ao fim de cada bloco de cenários e, por último, um dict
+    ``final`` com os percentis da propriedade e de cada lote.
+    """
+    gerador = random.Random(parametros.semente)
+    gauss = gerador.gauss
+    fator = parametros.cholesky
+    cv = parametros.cv_gmd
+    peso_comum = cv * math.sqrt(parametros.correlacao_lotes)
+    peso_proprio = cv * math.sqrt(1 - parametros.correlacao_lotes)
+    vol_arroba = parametros.volatilidade_arroba
+    vol_mortalidade = parametros.volatilidade_mortalidade
+    arroba_por_kg = rendimento / 100 / 15
+    # Impostos e serviços incidem sobre a receita; o sanitário sobre a alimentação
+    sobre_receita = float(PERCENTUAL_IMPOSTOS + PERCENTUAL_SERVICOS)
+    fator_alimentacao = 1 + float(PERCENTUAL_SANITARIO)
+
+    por_lote = [{'resultado': array('d'), 'rentabilidade': array('d'), 'ponto_equilibrio': array('d')} for _ in lotes]
+    propriedade = {'resultado': array('d'), 'rentabilidade': array('d'), 'ponto_equilibrio': array('d')}
+    investimento_total = sum(lote.investimento for lote in lotes)
+
+    feitos = 0
+    while feitos < parametros.cenarios:
+        n = min(CENARIOS_POR_BLOCO, parametros.cenarios - feitos)
+
+        # Choques comuns correlacionados de cada cenário: GMD, valor da @ e mortalidade
+        z_gmd, z_arroba, z_mortalidade = [], [], []
+        for _ in range(n):
+            a, b, c = gauss(), gauss(), gauss()
+            z_gmd.append(fator[0][0] * a)
+            z_arroba.append(fator[1][0] * a + fator[1][1] * b)
+            z_mortalidade.append(fator[2][0] * a + fator[2][1] * b + fator[2][2] * c)
+        fator_arroba = [math.exp(vol_arroba * z - vol_arroba * vol_arroba / 2) for z in z_arroba]
+        fator_mortalidade = [
+            math.exp(vol_mortalidade * z - vol_mortalidade * vol_mortalidade / 2) for z in z_mortalidade
+        ]
+
+        receita_total = [0.0] * n
+        custo_total = [0.0] * n
+        arrobas_total = [0.0] * n
+        for lote, series in zip(lotes, por_lote):
+            # Peso final: ganho total com o choque comum e um sorteio próprio que resume todos os meses
+            comum = peso_comum * lote.ganho
+            proprio = peso_proprio * lote.desvio_mensal
+            base = lote.peso_inicial + lote.ganho
+            pesos = [max(base + comum * z + proprio * gauss(), 0.0) for z in z_gmd]
+            # Animais vendidos e arrobas de carcaça
+            q, m = lote.quantidade, lote.mortalidade
+            arrobas = [q * (1 - min(m * f, 1.0)) * peso * arroba_por_kg for peso, f in zip(pesos, fator_mortalidade)]
+            receitas = [a * lote.valor_arroba * f for a, f in zip(arrobas, fator_arroba)]
+            custo = lote.investimento + lote.alimentacao * fator_alimentacao
+
+            resultados = [r * (1 - sobre_receita) - custo for r in receitas]
+            series['resultado'].extend(resultados)
+            if lote.investimento > 0:
+                series['rentabilidade'].extend(r / lote.investimento * 100 for r in resultados)
+            # Valor da @ que zera o resultado (os impostos e serviços crescem com o preço)
+            series['ponto_equilibrio'].extend(
+                custo / (a * (1 - sobre_receita)) if a > 0 else math.inf for a in arrobas
+            )
+
+            receita_total = [t + r for t, r in zip(receita_total, receitas)]
+            arrobas_total = [t + a for t, a in zip(arrobas_total, arrobas)]
+            custo_total = [t + custo for t in custo_total]
+
+        custo_total = [c + custos_fixos for c in custo_total]
+        resultados = [r * (1 - sobre_receita) - c for r, c in zip(receita_total, custo_total)]
+        propriedade['resultado'].extend(resultados)
+        if investimento_total > 0:
+            propriedade['rentabilidade'].extend(r / investimento_total * 100 for r in resultados)
+        propriedade['ponto_equilibrio'].extend(
+            c / (a * (1 - sobre_receita)) if a > 0 else math.inf for c, a in zip(custo_total, arrobas_total)
+        )
+
+        feitos += n
+        if feitos < parametros.cenarios:
+            yield {'tipo': 'parcial', 'cenarios': feitos, 'propriedade': _faixas(propriedade)}
+
+    yield {
+        'tipo': 'final',
+        'cenarios': feitos,
+        'percentis': list(PERCENTIS),
+        'parametros': parametros.como_dict(),
+        'propriedade': _faixas(propriedade),
+        'lotes': [
+            {'lote_id': lote.lote_id, 'lote_nome': lote.nome, **_faixas(series)}
+            for lote, series in zip(lotes, por_lote)
+        ],
+    }
+
+
+def percentis(valores, niveis=PERCENTIS):
+    """Percentis com interpolação linear entre os valores ordenados (None sem valores)"""
+    ordenados = sorted(valores)
+    if not ordenados:
+        return [None] * len(niveis)
+    ultimo = len(ordenados) - 1
+    resultado = []
+    for nivel in niveis:
+        posicao = nivel / 100 * ultimo
+        abaixo = math.floor(posicao)
+        acima = min(abaixo + 1, ultimo)
+        fracao = posicao - abaixo
+        if fracao == 0:
+            valor = ordenados[abaixo]
+        else:
+            valor = ordenados[abaixo] + (ordenados[acima] - ordenados[abaixo]) * fracao
+        resultado.append(valor if math.isfinite(valor) else None)
+    return resultado
+
+
+def _faixas(series):
+    return {nome: percentis(valores) for nome, valores in series.items()}
+
+
+def _cholesky(matriz):
+    """Fator triangular inferior de uma matriz de correlação (ValueError se não for positiva definida)"""
+    n = len(matriz)
+    fator = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1):
+            soma = sum(fator[i][k] * fator[j][k] for k in range(j))
+            if i == j:
+                resto = matriz[i][i] - soma
+                if resto <= 0:
+                    raise ValueError('As correlações informadas não formam uma matriz de correlação válida.')
+                fator[i][j] = math.sqrt(resto)
+            else:
+                fator[i][j] = (matriz[i][j] - soma) / fator[j][j]
+    return fator
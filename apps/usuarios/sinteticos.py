@@ -0,0 +1,293 @@
+"""
+Fazendas sintéticas para testes de carga e benchmarks.
+
+Gera usuários com propriedade, lotes e alguns anos de projeções de ganho,
+gastos nutricionais, mortalidade, períodos personalizados, custos fixos e
+receitas, com a sazonalidade da pecuária a pasto no Brasil Central: GMD alto
+nas águas (outubro a março) e baixo na seca, suplementação mais cara na seca,
+vendas de boi concentradas na entressafra e de bezerros na desmama, 13º da mão
+de obra em dezembro. Confinamento tem GMD e custo altos e sem sazonalidade.
+
+Cada propriedade usa um gerador aleatório próprio, semeado com a semente e o
+índice da propriedade, então a mesma semente gera os mesmos dados em qualquer
+tamanho de bloco. As linhas são gravadas com ``bulk_create`` em lotes, por
+bloco de propriedades (uma transação por bloco), e o livro mensal é calculado
+no fim de cada bloco, porque o ``bulk_create`` não dispara os sinais.
+"""
+import calendar
+from decimal import Decimal
+import random
+import re
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from .grades import apagar_celulas
+from .lote_mes import atualizar_lotes
+from .models import (
+    CustoFixo, GastoNutricional, Lote, LoteMes, Mortalidade, PeriodoPersonalizado, ProjecaoGanho, Propriedade,
+    Receita, Snapshot, Usuario,
+)
+from .projecao import KG_POR_ARROBA
+
+
+DOMINIO = 'sintetico.agrodash'
+PROPRIEDADES_POR_BLOCO = 50
+LINHAS_POR_INSERT = 5000
+
+# Fator do mês (1 a 12) sobre o GMD a pasto: águas acima de 1, seca abaixo
+SAZONALIDADE_GMD = (None, 1.15, 1.2, 1.1, 0.95, 0.75, 0.6, 0.55, 0.55, 0.65, 0.85, 1.05, 1.15)
+# Fator do mês sobre o gasto com suplementação a pasto (proteinado na seca)
+SAZONALIDADE_GASTO = (None, 0.8, 0.8, 0.85, 1.0, 1.3, 1.55, 1.6, 1.6, 1.45, 1.15, 0.9, 0.8)
+# Fator do mês sobre a mortalidade (águas: clostridioses, carrapato)
+SAZONALIDADE_MORTALIDADE = (None, 1.3, 1.3, 1.2, 1.0, 0.8, 0.7, 0.7, 0.8, 0.9, 1.1, 1.2, 1.3)
+
+# terminação -> (GMD base em kg/dia, gasto diário base em R$/animal, sazonal)
+TERMINACOES = {
+    'pasto': (0.55, 1.8, True),
+    'TIP': (0.8, 4.5, True),
+    'confinamento': (1.45, 14.0, False),
+}
+PESOS_TERMINACAO = (0.6, 0.25, 0.15)
+
+MUNICIPIOS = (
+    'Campo Grande/MS', 'Dourados/MS', 'Três Lagoas/MS', 'Cuiabá/MT', 'Rondonópolis/MT', 'Cáceres/MT',
+    'Goiânia/GO', 'Rio Verde/GO', 'Uberaba/MG', 'Araçatuba/SP', 'Marabá/PA', 'Araguaína/TO',
+)
+RACAS = ('Nelore', 'Angus x Nelore', 'Brangus', 'Senepol', 'Tabapuã', 'Guzerá')
+
+# tipo do custo fixo -> R$ por mês por 100 animais
+CUSTOS_FIXOS = {
+    'arrendamento': 2200,
+    'amortizacao': 900,
+    'prolabore': 1500,
+    'manutencao': 600,
+    'combustivel': 450,
+    'mao_de_obra': 2400,
+    'servicos_tecnicos': 300,
+    'supermercado': 250,
+    'fretes': 350,
+    'energia': 280,
+    'tele_internet': 40,
+    'contador': 120,
+}
+# ITR: pago uma vez por ano, em setembro
+ITR_POR_100_ANIMAIS = 1800
+MES_ITR = 9
+
+# tipo da receita -> (meses de venda, R$ por venda por 100 animais)
+RECEITAS = {
+    'venda_bois': ((9, 10, 11), 60000),
+    'venda_vacas': ((4, 5, 6), 18000),
+    'venda_bezerros': ((5, 6, 7), 22000),
+    'venda_bezerras': ((5, 6, 7), 15000),
+    'venda_novilhas': ((8, 9), 12000),
+    'venda_garrote': ((3, 4), 10000),
+    'venda_silagem': ((7, 8), 3000),
+}
+
+
+def _decimal(valor, casas=2):
+    return Decimal(f'{valor:.{casas}f}')
+
+
+def _variar(rng, valor, desvio=0.1):
+    """``valor`` com ruído normal relativo, nunca negativo"""
+    return max(valor * rng.gauss(1, desvio), 0)
+
+
+def email(prefixo, indice):
+    return f'{prefixo}{indice:06d}@{DOMINIO}'
+
+
+class Fazenda:
+    """Dados de uma propriedade sintética (ainda não gravados), gerados pela semente e pelo índice"""
+
+    def __init__(self, semente, indice, quantidade_lotes, anos, prefixo, senha):
+        self.rng = rng = random.Random(f'{semente}:{indice}')
+        self.anos = anos
+        self.terminacao = rng.choices(list(TERMINACOES), PESOS_TERMINACAO)[0]
+        self.usuario = Usuario(email=email(prefixo, indice), nome=f'Fazenda Sintética {indice}', password=senha)
+        self.propriedade = Propriedade(
+            proprietario=f'Produtor Sintético {indice}',
+            municipio_estado=rng.choice(MUNICIPIOS),
+            tipo_raca_animais=rng.choice(RACAS),
+            tipo_terminacao=self.terminacao,
+            area_total_ha=_decimal(rng.uniform(200, 5000)),
+            ultimo_rendimento_carcaca=_decimal(rng.uniform(50, 55)),
+        )
+        self.lotes = [self._lote(numero) for numero in range(1, quantidade_lotes + 1)]
+        self.animais = sum(lote.quantidade for lote in self.lotes)
+        self.propriedade.quantidade_animais = self.animais
+
+    def _lote(self, numero):
+        rng = self.rng
+        sexo = rng.choice('MF')
+        peso_kg = rng.uniform(180, 420) * (1 if sexo == 'M' else 0.88)
+        quantidade = rng.randint(20, 200)
+        peso_arroba = Decimal(f'{peso_kg:.2f}') / KG_POR_ARROBA
+        return Lote(
+            nome=f'Lote {numero:03d}',
+            tipo='curral' if self.terminacao == 'confinamento' else rng.choice(('lote', 'pasto')),
+            sexo=sexo,
+            idade_meses=rng.randint(8, 30),
+            quantidade=quantidade,
+            peso_kg=_decimal(peso_kg),
+            peso_arroba=_decimal(peso_arroba),
+            valor_compra=_decimal(quantidade * float(peso_arroba) * _variar(rng, 310, 0.08)),
+            ultimo_valor_arroba=_decimal(_variar(rng, 320, 0.06)),
+        )
+
+    def linhas_dos_lotes(self):
+        """Projeções, gastos, mortalidade e períodos de todos os lotes (já com ``lote`` gravado)"""
+        rng = self.rng
+        gmd_base, gasto_base, sazonal = TERMINACOES[self.terminacao]
+        projecoes, gastos, mortalidades, periodos = [], [], [], []
+        for lote in self.lotes:
+            gmd_lote = _variar(rng, gmd_base, 0.12)
+            gasto_lote = _variar(rng, gasto_base, 0.15)
+            mortalidade_lote = rng.uniform(0.05, 0.2)
+            for ano in self.anos:
+                # Entradas e saídas no meio do mês: um ou dois períodos personalizados por ano
+                meses_parciais = rng.sample(range(1, 13), rng.randint(1, 2))
+                for mes in range(1, 13):
+                    fator_gmd = SAZONALIDADE_GMD[mes] if sazonal else 1
+                    fator_gasto = SAZONALIDADE_GASTO[mes] if sazonal else 1
+                    projecoes.append(ProjecaoGanho(
+                        lote=lote, ano=ano, mes=mes, gmd_kg=_decimal(_variar(rng, gmd_lote * fator_gmd, 0.08)),
+                    ))
+                    gastos.append(GastoNutricional(
+                        lote=lote, ano=ano, mes=mes, gasto_diario=_decimal(_variar(rng, gasto_lote * fator_gasto, 0.05)),
+                    ))
+                    mortalidades.append(Mortalidade(
+                        lote=lote, ano=ano, mes=mes,
+                        percentual=_decimal(min(rng.expovariate(1 / mortalidade_lote) * SAZONALIDADE_MORTALIDADE[mes], 5)),
+                    ))
+                    if mes in meses_parciais:
+                        periodos.append(PeriodoPersonalizado(
+                            lote=lote, ano=ano, mes=mes,
+                            periodo_dias=rng.randint(5, calendar.monthrange(ano, mes)[1] - 1),
+                        ))
+        return {
+            ProjecaoGanho: projecoes,
+            GastoNutricional: gastos,
+            Mortalidade: mortalidades,
+            PeriodoPersonalizado: periodos,
+        }
+
+    def linhas_da_propriedade(self):
+        """Custos fixos e receitas (já com ``propriedade`` gravada)"""
+        rng = self.rng
+        propriedade = self.propriedade
+        escala = self.animais / 100
+        custos, receitas = [], []
+        for ano in self.anos:
+            for mes in range(1, 13):
+                for tipo, valor in CUSTOS_FIXOS.items():
+                    if tipo == 'mao_de_obra' and mes == 12:
+                        valor *= 2
+                    if tipo == 'combustivel' and not SAZONALIDADE_GMD[mes] > 1:
+                        # Trato e suplementação na seca rodam mais máquinas
+                        valor *= 1.4
+                    custos.append(CustoFixo(
+                        propriedade=propriedade, ano=ano, mes=mes, tipo=tipo,
+                        valor=_decimal(_variar(rng, valor * escala, 0.1)),
+                    ))
+                if mes == MES_ITR:
+                    custos.append(CustoFixo(
+                        propriedade=propriedade, ano=ano, mes=mes, tipo='itr',
+                        valor=_decimal(_variar(rng, ITR_POR_100_ANIMAIS * escala, 0.05)),
+                    ))
+            for tipo, (meses, valor) in RECEITAS.items():
+                # Nem toda fazenda vende de tudo todo ano
+                if rng.random() < 0.35:
+                    continue
+                for mes in rng.sample(meses, rng.randint(1, len(meses))):
+                    receitas.append(Receita(
+                        propriedade=propriedade, ano=ano, mes=mes, tipo=tipo,
+                        valor=_decimal(_variar(rng, valor * escala / len(meses), 0.25)),
+                    ))
+        return {CustoFixo: custos, Receita: receitas}
+
+
+def gerar_bloco(indices, semente, quantidade_lotes, anos, prefixo, senha, livro_mensal=True):
+    """Grava as fazendas dos ``indices`` em uma transação; retorna {modelo: linhas gravadas}"""
+    fazendas = [Fazenda(semente, indice, quantidade_lotes, anos, prefixo, senha) for indice in indices]
+    gravadas = {}
+
+    def gravar(modelo, objetos):
+        modelo.objects.bulk_create(objetos, batch_size=LINHAS_POR_INSERT)
+        gravadas[modelo] = gravadas.get(modelo, 0) + len(objetos)
+
+    with transaction.atomic():
+        gravar(Usuario, [fazenda.usuario for fazenda in fazendas])
+        for fazenda in fazendas:
+            fazenda.propriedade.usuario = fazenda.usuario
+        gravar(Propriedade, [fazenda.propriedade for fazenda in fazendas])
+        for fazenda in fazendas:
+            for lote in fazenda.lotes:
+                lote.propriedade = fazenda.propriedade
+        gravar(Lote, [lote for fazenda in fazendas for lote in fazenda.lotes])
+
+        linhas = {}
+        for fazenda in fazendas:
+            for modelo, objetos in (fazenda.linhas_dos_lotes() | fazenda.linhas_da_propriedade()).items():
+                linhas.setdefault(modelo, []).extend(objetos)
+        for modelo, objetos in linhas.items():
+            gravar(modelo, objetos)
+
+    if livro_mensal:
+        # Fora da transação dos dados, como no rebuild_lote_mes
+        atualizar_lotes([lote.id for fazenda in fazendas for lote in fazenda.lotes])
+    return gravadas
+
+
+def apagar(prefixo):
+    """
+    Apaga os usuários sintéticos com o prefixo, as propriedades e os dados.
+    Cada tabela é apagada com um único DELETE, dos dados dos lotes para cima,
+    sem carregar as linhas nem disparar os sinais por linha (o livro mensal
+    sai junto e as propriedades deixam de existir). Retorna quantas linhas apagou.
+    """
+    usuarios = _sinteticos(prefixo)
+    apagadas = 0
+    with transaction.atomic():
+        for modelo in (LoteMes, ProjecaoGanho, GastoNutricional, Mortalidade, PeriodoPersonalizado):
+            apagadas += apagar_celulas(modelo.objects.filter(lote__propriedade__usuario__in=usuarios))
+        for modelo in (CustoFixo, Receita, Snapshot, Lote):
+            apagadas += apagar_celulas(modelo.objects.filter(propriedade__usuario__in=usuarios))
+        apagadas += apagar_celulas(Propriedade.objects.filter(usuario__in=usuarios))
+        # Os usuários (poucos) pelo ORM, que cuida de tokens, perfis, sessões do admin e permissões
+        apagadas += usuarios.delete()[0]
+    return apagadas
+
+
+def _sinteticos(prefixo):
+    # O email completo (prefixo + índice + domínio): o prefixo "faz" não pega as fazendas "fazenda"
+    padrao = rf'^{re.escape(prefixo)}[0-9]{{6,}}@{re.escape(DOMINIO)}$'
+    return Usuario.objects.filter(email__regex=padrao)
+
+
+def gerar(quantidade_propriedades, quantidade_lotes, anos, semente=0, prefixo='fazenda',
+          tamanho_bloco=PROPRIEDADES_POR_BLOCO, senha=None, livro_mensal=True, progresso=None):
+    """
+    Gera ``quantidade_propriedades`` fazendas sintéticas com ``quantidade_lotes``
+    lotes e dados nos ``anos``. Os usuários entram com ``senha`` (a mesma para
+    todos; sem senha, não conseguem entrar). ``progresso(feitas, total, gravadas)``
+    é chamado a cada bloco. Retorna {modelo: linhas gravadas}.
+    """
+    if _sinteticos(prefixo).exists():
+        raise ValueError(f'Já existem fazendas sintéticas com o prefixo "{prefixo}".')
+    # Uma senha só, com o hash calculado uma vez: o hash custa centenas de milissegundos
+    senha = make_password(senha)
+    anos = list(anos)
+    gravadas = {}
+    for inicio in range(0, quantidade_propriedades, tamanho_bloco):
+        indices = range(inicio, min(inicio + tamanho_bloco, quantidade_propriedades))
+        for modelo, linhas in gerar_bloco(
+            indices, semente, quantidade_lotes, anos, prefixo, senha, livro_mensal
+        ).items():
+            gravadas[modelo] = gravadas.get(modelo, 0) + linhas
+        if progresso:
+            progresso(indices.stop, quantidade_propriedades, gravadas)
+    return gravadas
@@ -0,0 +1,197 @@
+"""
+Fotografias (snapshots) dos dashboards gravadas no banco.
+
+O comando ``recompute_snapshots``, agendado para a madrugada, calcula os dados
+dos dashboards de cada propriedade e os grava na tabela Snapshot. Cada
+fotografia leva a marca dos dados da propriedade no momento do cálculo: o maior
+``data_atualizacao`` e a quantidade de linhas de cada tabela, como nos gráficos
+(graficos.py), além da versão do formato dos dados gravados. Na leitura,
+``ler_ou_calcular`` só usa a fotografia se a marca ainda for a mesma; do
+contrário, calcula ao vivo. O cache por propriedade
+(cache_propriedade) continua na frente, então a fotografia só é lida quando o
+cache não tem o resultado.
+
+O cálculo é dividido em blocos de propriedades distribuídos por um executor
+configurável: processos, threads ou subinterpretadores
+(``InterpreterPoolExecutor``, Python 3.14+).
+"""
+import concurrent.futures
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import pickle
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.db.models import Count, Max, OuterRef, Subquery
+
+from .graficos import MarcaDados
+from .grades import salvar_grade
+from .metricas import contar
+from .models import (
+    CustoFixo, GastoNutricional, Lote, LoteMes, Mortalidade, PeriodoPersonalizado, ProjecaoGanho, Propriedade,
+    Receita, Snapshot,
+)
+
+
+# Dashboards gravados: nome (o mesmo do cache) -> se depende do ano
+DASHBOARDS = {
+    'lotes_dashboard': False,
+    'nutricional_dashboard': False,
+    'faturamento': False,
+    'fluxo_caixa': True,
+    'ponto_equilibrio': True,
+}
+
+# Tabelas de que os dashboards dependem -> caminho até a propriedade
+TABELAS = {
+    Lote: 'propriedade',
+    LoteMes: 'lote__propriedade',
+    ProjecaoGanho: 'lote__propriedade',
+    GastoNutricional: 'lote__propriedade',
+    PeriodoPersonalizado: 'lote__propriedade',
+    Mortalidade: 'lote__propriedade',
+    CustoFixo: 'propriedade',
+    Receita: 'propriedade',
+}
+
+PROPRIEDADES_POR_BLOCO = 50
+
+# Trocar quando o formato ou o cálculo dos dados de algum dashboard mudar, para
+# que as fotografias gravadas antes deixem de valer
+VERSAO_FORMATO = 2
+
+
+def marcas(propriedade_ids):
+    """{id: marca dos dados} das propriedades, em uma única consulta"""
+    anotacoes = {}
+    for modelo, caminho in TABELAS.items():
+        linhas = modelo.objects.filter(**{caminho: OuterRef('id')}).order_by().values(caminho)
+        nome = modelo._meta.model_name
+        anotacoes[f'{nome}_ultima'] = Subquery(linhas.annotate(valor=Max('data_atualizacao')).values('valor'))
+        anotacoes[f'{nome}_quantidade'] = Subquery(linhas.annotate(valor=Count('id')).values('valor'))
+
+    resultado = {}
+    linhas = Propriedade.objects.filter(id__in=propriedade_ids).order_by().annotate(**anotacoes).values(
+        'id', 'data_atualizacao', *anotacoes
+    )
+    for linha in linhas:
+        agregados = [(linha['data_atualizacao'], 1)] + [
+            (linha[f'{modelo._meta.model_name}_ultima'], linha[f'{modelo._meta.model_name}_quantidade'] or 0)
+            for modelo in TABELAS
+        ]
+        resultado[linha['id']] = MarcaDados(f'propriedade:v{VERSAO_FORMATO}', agregados).etag
+    return resultado
+
+
+def ler_ou_calcular(propriedade, nome, calcular, ano=0):
+    """Dados da fotografia, se ainda valer para os dados atuais da propriedade; senão ``calcular()``"""
+    snapshot = Snapshot.objects.filter(propriedade=propriedade, nome=nome, ano=ano).values_list(
+        'marca', 'dados'
+    ).first()
+    if snapshot is not None and snapshot[0] == marcas([propriedade.id]).get(propriedade.id):
+        contar('agrodash_snapshot_total', nome=nome, resultado='acerto')
+        return pickle.loads(snapshot[1])
+    contar('agrodash_snapshot_total', nome=nome, resultado='falta')
+    return calcular()
+
+
+async def ler_ou_calcular_async(propriedade, nome, calcular, ano=0):
+    """Versão de ``ler_ou_calcular`` para as views assíncronas; ``calcular()`` retorna um awaitable"""
+    snapshot = await Snapshot.objects.filter(propriedade=propriedade, nome=nome, ano=ano).values_list(
+        'marca', 'dados'
+    ).afirst()
+    if snapshot is not None and snapshot[0] == (await sync_to_async(marcas)([propriedade.id])).get(propriedade.id):
+        contar('agrodash_snapshot_total', nome=nome, resultado='acerto')
+        return pickle.loads(snapshot[1])
+    contar('agrodash_snapshot_total', nome=nome, resultado='falta')
+    return await calcular()
+
+
+def recalcular_bloco(propriedade_ids, nomes, anos, fechar_conexoes=False):
+    """Calcula e grava (em um comando) as fotografias de um bloco de propriedades; retorna quantas"""
+    from .views import CALCULOS_DASHBOARD
+
+    try:
+        # A marca é lida antes do cálculo: uma gravação durante o cálculo vence a fotografia
+        marcas_bloco = marcas(propriedade_ids)
+        snapshots = []
+        for propriedade in Propriedade.objects.filter(id__in=propriedade_ids).order_by('id'):
+            for nome in nomes:
+                calcular = CALCULOS_DASHBOARD[nome]
+                for ano in (anos if DASHBOARDS[nome] else [0]):
+                    dados = calcular(propriedade, ano) if DASHBOARDS[nome] else calcular(propriedade)
+                    snapshots.append(Snapshot(
+                        propriedade=propriedade, nome=nome, ano=ano, marca=marcas_bloco[propriedade.id],
+                        dados=pickle.dumps(dados, pickle.HIGHEST_PROTOCOL),
+                    ))
+        return salvar_grade(Snapshot, snapshots, ['propriedade', 'nome', 'ano'], ['marca', 'dados'])
+    finally:
+        if fechar_conexoes:
+            # Threads e subinterpretadores abrem suas próprias conexões, que não fecham sozinhas
+            connections.close_all()
+
+
+def _iniciar_django():
+    # Processos ("spawn") e subinterpretadores começam sem o Django configurado
+    import django
+    django.setup()
+
+
+def _executor_processos(trabalhadores):
+    # Os filhos não podem herdar as conexões abertas do processo pai
+    connections.close_all()
+    return ProcessPoolExecutor(max_workers=trabalhadores, initializer=_iniciar_django)
+
+
+def _executor_threads(trabalhadores):
+    return ThreadPoolExecutor(max_workers=trabalhadores)
+
+
+def _executor_interpretadores(trabalhadores):
+    classe = getattr(concurrent.futures, 'InterpreterPoolExecutor', None)
+    if classe is None:
+        raise ValueError('O executor "interpretadores" exige Python 3.14 ou mais recente.')
+    return classe(max_workers=trabalhadores, initializer=_iniciar_django)
+
+
+# nome -> função (trabalhadores) que cria o executor; "serial" roda no próprio processo
+EXECUTORES = {
+    'processos': _executor_processos,
+    'threads': _executor_threads,
+    'interpretadores': _executor_interpretadores,
+    'serial': None,
+}
+
+
+def recalcular(nomes, anos, executor='processos', trabalhadores=1, tamanho_bloco=PROPRIEDADES_POR_BLOCO,
+               propriedade_ids=None, progresso=None):
+    """
+    Recalcula as fotografias dos dashboards ``nomes`` (e dos ``anos``, nos que
+    dependem do ano) de todas as propriedades, ou das ``propriedade_ids``.
+    ``progresso(feitas, total, gravadas)`` é chamado a cada bloco concluído.
+    Retorna a quantidade de fotografias gravadas.
+    """
+    if executor not in EXECUTORES:
+        raise ValueError(f'Executor desconhecido: {executor}.')
+    propriedades = Propriedade.objects.order_by('id')
+    if propriedade_ids is not None:
+        propriedades = propriedades.filter(id__in=propriedade_ids)
+    ids = list(propriedades.values_list('id', flat=True))
+    blocos = [ids[inicio:inicio + tamanho_bloco] for inicio in range(0, len(ids), tamanho_bloco)]
+
+    feitas = gravadas = 0
+    if EXECUTORES[executor] is None:
+        for bloco in blocos:
+            gravadas += recalcular_bloco(bloco, nomes, anos)
+            feitas += len(bloco)
+            if progresso:
+                progresso(feitas, len(ids), gravadas)
+        return gravadas
+
+    with EXECUTORES[executor](trabalhadores) as pool:
+        tarefas = {pool.submit(recalcular_bloco, bloco, nomes, anos, True): bloco for bloco in blocos}
+        for tarefa in concurrent.futures.as_completed(tarefas):
+            gravadas += tarefa.result()
+            feitas += len(tarefas[tarefa])
+            if progresso:
+                progresso(feitas, len(ids), gravadas)
+    return gravadas
@@ -1,3 +1,1198 @@
+from decimal import Decimal
+from io import BytesIO, StringIO
+import json
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import (
+    Usuario, Propriedade, Lote, ProjecaoGanho, GastoNutricional, PeriodoPersonalizado, CustoFixo, Receita, LoteMes,
+    Benchmark, Snapshot, PerfilRequisicao,
+)
+from . import snapshots
+from .lote_mes import AtualizacoesPendentes
+from .projecao import carregar_dados, projetar
+
+
+class PropriedadeTestCase(TestCase):
+    """Propriedade com lotes projetados e cliente autenticado no ponto de equilíbrio"""
+
+    ano = 2025
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuario.objects.create_user(email='produtor@teste.com', password='senha123')
+        self.propriedade = Propriedade.objects.create(usuario=self.usuario, ultimo_rendimento_carcaca=Decimal('52'))
+        self.client.force_login(self.usuario)
+
+    def criar_lotes(self, quantidade):
+        # Executa os callbacks de commit (livro mensal e invalidação do cache)
+        with self.captureOnCommitCallbacks(execute=True):
+            for indice in range(Lote.objects.count(), Lote.objects.count() + quantidade):
+                self.criar_lote(indice)
+
+    def criar_lote(self, indice):
+        lote = Lote.objects.create(
+            propriedade=self.propriedade,
+            nome=f'Lote {indice:03d}',
+            sexo='M',
+            idade_meses=12,
+            quantidade=50,
+            peso_kg=Decimal('300'),
+            peso_arroba=Decimal('20'),
+            valor_compra=Decimal('150000'),
+        )
+        for mes in range(1, 12):
+            ProjecaoGanho.objects.create(lote=lote, mes=mes, ano=self.ano, gmd_kg=Decimal('0.85'))
+            GastoNutricional.objects.create(lote=lote, mes=mes, ano=self.ano, gasto_diario=Decimal('8.50'))
+        PeriodoPersonalizado.objects.create(lote=lote, mes=3, ano=self.ano, periodo_dias=20)
+
+    def contar_queries(self):
+        with CaptureQueriesContext(connection) as contexto:
+            resposta = self.client.get(reverse('ponto_equilibrio'), {'ano': self.ano})
+        self.assertEqual(resposta.status_code, 200)
+        return len(contexto), resposta
+
+
+class MotorProjecaoTest(PropriedadeTestCase):
+    """Cadeia de pesos do motor de projeção: cada mês entra com o peso de saída do anterior"""
+
+    def setUp(self):
+        super().setUp()
+        self.lote = Lote.objects.create(
+            propriedade=self.propriedade, nome='Lote 001', sexo='M', idade_meses=12, quantidade=10,
+            peso_kg=Decimal('300'), peso_arroba=Decimal('20'), valor_compra=Decimal('60000'),
+        )
+        # Novembro e dezembro de um ano e janeiro do seguinte, com dezembro de 10 dias
+        for ano, mes, gmd_kg in ((self.ano, 11, '1.00'), (self.ano, 12, '0.50'), (self.ano + 1, 1, '2.00')):
+            ProjecaoGanho.objects.create(lote=self.lote, ano=ano, mes=mes, gmd_kg=Decimal(gmd_kg))
+        PeriodoPersonalizado.objects.create(lote=self.lote, ano=self.ano, mes=12, periodo_dias=10)
+
+    def pesos(self, **opcoes):
+        dados = carregar_dados(self.propriedade, com_periodos=True)
+        projecao = projetar(dados, **opcoes).get(self.lote.id)
+        return [(mes.chave, mes.dias, mes.peso_entrada, mes.peso_saida) for mes in projecao.meses]
+
+    def test_peso_atravessa_a_virada_do_ano(self):
+        self.assertEqual(self.pesos(), [
+            ((self.ano, 11), 30, Decimal('300'), Decimal('330.00')),
+            ((self.ano, 12), 31, Decimal('330.00'), Decimal('345.5000')),
+            ((self.ano + 1, 1), 31, Decimal('345.5000'), Decimal('407.5000')),
+        ])
+
+    def test_usa_periodos_personalizados(self):
+        self.assertEqual(self.pesos(usar_periodos=True), [
+            ((self.ano, 11), 30, Decimal('300'), Decimal('330.00')),
+            ((self.ano, 12), 10, Decimal('330.00'), Decimal('335.0000')),
+            ((self.ano + 1, 1), 31, Decimal('335.0000'), Decimal('397.0000')),
+        ])
+
+    def test_gmd_por_lote_substitui_as_projecoes(self):
+        pesos = self.pesos(gmd_por_lote={self.lote.id: Decimal('1')})
+        self.assertEqual([saida for *_, saida in pesos], [Decimal('330'), Decimal('361'), Decimal('392')])
+
+
+class LivroMensalTest(PropriedadeTestCase):
+    """Os sinais mantêm o livro mensal (LoteMes) em dia com projeções, gastos, períodos e o lote"""
+
+    def setUp(self):
+        super().setUp()
+        self.criar_lotes(1)
+        self.lote = Lote.objects.get()
+
+    def linha(self, mes, ano=None):
+        return self.lote.meses.filter(ano=ano or self.ano, mes=mes).first()
+
+    def test_projecao_salva_editada_e_apagada(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ProjecaoGanho.objects.create(lote=self.lote, mes=12, ano=self.ano, gmd_kg=Decimal('1.00'))
+        self.assertEqual(self.linha(12).ganho_kg, Decimal('31.00'))
+        peso_novembro = self.linha(11).peso_acumulado_kg
+        self.assertEqual(self.linha(12).peso_acumulado_kg, peso_novembro + 31)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            projecao = ProjecaoGanho.objects.get(lote=self.lote, mes=12)
+            projecao.gmd_kg = Decimal('2.00')
+            projecao.save()
+        self.assertEqual(self.linha(12).ganho_kg, Decimal('62.00'))
+
+        # Mudar o mês da projeção recalcula o lote inteiro: a linha do mês antigo sai do livro
+        with self.captureOnCommitCallbacks(execute=True):
+            projecao.mes, projecao.ano = 1, self.ano + 1
+            projecao.save()
+        self.assertIsNone(self.linha(12))
+        self.assertEqual(self.linha(1, self.ano + 1).peso_acumulado_kg, peso_novembro + 62)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            projecao.delete()
+        self.assertIsNone(self.linha(1, self.ano + 1))
+
+    def test_gasto_e_periodo(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            GastoNutricional.objects.filter(lote=self.lote, mes=5).get().delete()
+            PeriodoPersonalizado.objects.create(lote=self.lote, mes=6, ano=self.ano, periodo_dias=15)
+        self.assertIsNone(self.linha(5).gasto_diario)
+        self.assertEqual(self.linha(6).periodo_dias, 15)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            gasto = GastoNutricional.objects.get(lote=self.lote, mes=6)
+            gasto.gasto_diario = Decimal('10.00')
+            gasto.save()
+            PeriodoPersonalizado.objects.filter(lote=self.lote, mes=6).get().delete()
+        self.assertEqual(self.linha(6).gasto_total_lote, Decimal('15000.00'))
+        self.assertIsNone(self.linha(6).periodo_dias)
+
+    def test_insercao_regrava_a_partir_do_mes(self):
+        LoteMes.objects.filter(lote=self.lote).update(ganho_kg=Decimal('0'))
+        with self.captureOnCommitCallbacks(execute=True):
+            PeriodoPersonalizado.objects.create(lote=self.lote, mes=9, ano=self.ano, periodo_dias=10)
+        self.assertEqual(self.linha(8).ganho_kg, Decimal('0'))
+        self.assertEqual(self.linha(9).ganho_kg, Decimal('25.50'))
+
+        # Uma edição recalcula o lote desde o início
+        with self.captureOnCommitCallbacks(execute=True):
+            periodo = PeriodoPersonalizado.objects.get(lote=self.lote, mes=9)
+            periodo.periodo_dias = 12
+            periodo.save()
+        self.assertEqual(self.linha(1).ganho_kg, Decimal('26.35'))
+
+    def test_alteracao_do_lote(self):
+        peso_janeiro = self.linha(1).peso_acumulado_kg
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lote.peso_kg = Decimal('310')
+            self.lote.save()
+        self.assertEqual(self.linha(1).peso_acumulado_kg, peso_janeiro + 10)
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.lote.ultimo_valor_arroba = Decimal('320')
+            self.lote.save(update_fields=['ultimo_valor_arroba'])
+        self.assertFalse([callback for callback in callbacks if isinstance(callback, AtualizacoesPendentes)])
+
+    def test_um_recalculo_por_transacao(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            ProjecaoGanho.objects.create(lote=self.lote, mes=12, ano=self.ano, gmd_kg=Decimal('1.00'))
+            GastoNutricional.objects.filter(lote=self.lote, mes=3).get().delete()
+            GastoNutricional.objects.create(lote=self.lote, mes=12, ano=self.ano, gasto_diario=Decimal('9.00'))
+        recalculos = [callback for callback in callbacks if isinstance(callback, AtualizacoesPendentes)]
+        self.assertEqual(len(recalculos), 1)
+        self.assertEqual(recalculos[0].desde, {self.lote.id: (self.ano, 3)})
+
+    def test_exclusao_em_cascata_nao_recalcula(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.lote.delete()
+        self.assertFalse([callback for callback in callbacks if isinstance(callback, AtualizacoesPendentes)])
+        self.assertFalse(LoteMes.objects.exists())
+
+
+class PontoEquilibrioQueriesTest(PropriedadeTestCase):
+    """O ponto de equilíbrio deve ser calculado com um número fixo de queries"""
+
+    def test_queries_nao_crescem_com_os_lotes(self):
+        self.criar_lotes(2)
+        queries_poucos_lotes, _ = self.contar_queries()
+
+        self.criar_lotes(8)
+        queries_muitos_lotes, resposta = self.contar_queries()
+
+        self.assertEqual(len(resposta.context['dados_lotes']), 10)
+        self.assertEqual(queries_muitos_lotes, queries_poucos_lotes)
+
+    def test_usa_gasto_e_periodo_do_mes(self):
+        self.criar_lotes(1)
+        _, resposta = self.contar_queries()
+
+        marco = resposta.context['dados_lotes'][0]['meses'][3]
+        self.assertEqual(marco['dias_mes'], 20)
+        self.assertEqual(marco['custo_diaria'], 8.5)
+        self.assertEqual(marco['gasto_nutricional_mes'], 170.0)
+
+
+class CacheDashboardsTest(PropriedadeTestCase):
+    """Os dashboards são servidos do cache até a próxima gravação na propriedade"""
+
+    def test_segunda_visita_usa_cache(self):
+        self.criar_lotes(3)
+        queries_primeira, _ = self.contar_queries()
+        queries_segunda, resposta = self.contar_queries()
+
+        self.assertLess(queries_segunda, queries_primeira)
+        self.assertEqual(len(resposta.context['dados_lotes']), 3)
+
+    def test_gravacao_invalida_cache(self):
+        self.criar_lotes(1)
+        _, resposta = self.contar_queries()
+        self.assertEqual(resposta.context['dados_lotes'][0]['meses'][1]['custo_diaria'], 8.5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            gasto = GastoNutricional.objects.get(mes=1, ano=self.ano)
+            gasto.gasto_diario = Decimal('9.00')
+            gasto.save()
+
+        _, resposta = self.contar_queries()
+        self.assertEqual(resposta.context['dados_lotes'][0]['meses'][1]['custo_diaria'], 9.0)
+
+    def test_cache_separado_por_propriedade(self):
+        self.criar_lotes(2)
+        self.contar_queries()
+
+        outro_usuario = Usuario.objects.create_user(email='vizinho@teste.com', password='senha123')
+        Propriedade.objects.create(usuario=outro_usuario)
+        self.client.force_login(outro_usuario)
+
+        _, resposta = self.contar_queries()
+        self.assertEqual(resposta.context['dados_lotes'], [])
+
+
+class GraficosJsonTest(PropriedadeTestCase):
+    """Os dados dos gráficos respondem 304 enquanto os dados da propriedade não mudam"""
+
+    def test_responde_304_com_a_mesma_etag(self):
+        self.criar_lotes(2)
+        url = reverse('grafico', args=['faturamento-evolucao'])
+
+        resposta = self.client.get(url)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(len(resposta.json()['datasets']), 2)
+        etag = resposta['ETag']
+
+        resposta = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(resposta.status_code, 304)
+
+    def test_etag_muda_com_os_dados(self):
+        self.criar_lotes(1)
+        url = reverse('grafico', args=['nutricional-por-lote'])
+        etag = self.client.get(url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            GastoNutricional.objects.filter(mes=1, ano=self.ano).first().delete()
+
+        resposta = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta['ETag'], etag)
+
+    def test_grafico_inexistente(self):
+        resposta = self.client.get(reverse('grafico', args=['nao-existe']))
+        self.assertEqual(resposta.status_code, 404)
+
+
+class GradeNutricionalTest(PropriedadeTestCase):
+    """A grade anual de gastos e GMD é gravada com um comando por modelo"""
+
+    def setUp(self):
+        super().setUp()
+        self.criar_lotes(1)
+        self.lote = Lote.objects.get()
+
+    def postar_grade(self, gasto, gmd):
+        dados = {'salvar_gastos': '1', 'ano': self.ano, 'lote_id': self.lote.id}
+        for mes in range(1, 13):
+            dados[f'gasto_mes_{mes}'] = gasto
+            dados[f'gmd_mes_{mes}'] = gmd
+        with CaptureQueriesContext(connection) as contexto:
+            with self.captureOnCommitCallbacks(execute=True):
+                resposta = self.client.post(reverse('nutricional'), dados)
+        self.assertEqual(resposta.status_code, 302)
+        return [query['sql'] for query in contexto.captured_queries]
+
+    def test_um_insert_por_modelo(self):
+        queries = self.postar_grade('9.25', '1.10')
+
+        inserts = [sql for sql in queries if sql.startswith('INSERT') and ('gastonutricional' in sql or 'projecaoganho' in sql)]
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(GastoNutricional.objects.filter(lote=self.lote, ano=self.ano).count(), 12)
+        self.assertEqual(ProjecaoGanho.objects.get(lote=self.lote, ano=self.ano, mes=12).gmd_kg, Decimal('1.10'))
+        self.assertEqual(self.lote.meses.get(ano=self.ano, mes=1).gasto_diario, Decimal('9.25'))
+
+    def test_regrava_valores_existentes(self):
+        self.postar_grade('9.25', '1.10')
+        self.postar_grade('7.00', '0.90')
+
+        self.assertEqual(GastoNutricional.objects.filter(lote=self.lote, ano=self.ano).count(), 12)
+        self.assertEqual(GastoNutricional.objects.get(lote=self.lote, ano=self.ano, mes=5).gasto_diario, Decimal('7.00'))
+
+    def test_celulas_invalidas_sao_informadas(self):
+        dados = {
+            'salvar_gastos': '1', 'ano': self.ano, 'lote_id': self.lote.id,
+            'gasto_mes_1': '-3', 'gasto_mes_2': 'abc', 'gasto_mes_3': '10.00',
+        }
+        resposta = self.client.post(reverse('nutricional'), dados, follow=True)
+
+        mensagens = [str(mensagem) for mensagem in resposta.context['messages']]
+        self.assertTrue(any('Gasto de Janeiro' in mensagem and 'Gasto de Fevereiro' in mensagem for mensagem in mensagens))
+        self.assertEqual(GastoNutricional.objects.get(lote=self.lote, ano=self.ano, mes=3).gasto_diario, Decimal('10.00'))
+        self.assertEqual(GastoNutricional.objects.get(lote=self.lote, ano=self.ano, mes=1).gasto_diario, Decimal('8.50'))
+
+
+class GradeFluxoCaixaTest(PropriedadeTestCase):
+    """As grades de custos fixos e receitas são gravadas com um comando por modelo"""
+
+    def test_grade_anual_em_um_insert(self):
+        dados = {'salvar_custos_fixos': '1', 'ano': self.ano}
+        for tipo, _ in CustoFixo.TIPO_CHOICES:
+            for mes in range(1, 13):
+                dados[f'custo_fixo_{tipo}_{mes}'] = '100.00'
+        dados['custo_fixo_{}_5'.format(CustoFixo.TIPO_CHOICES[0][0])] = '1,5'
+
+        with CaptureQueriesContext(connection) as contexto:
+            resposta = self.client.post(reverse('fluxo_caixa'), dados, follow=True)
+
+        inserts = [query['sql'] for query in contexto.captured_queries if query['sql'].startswith('INSERT INTO "usuarios_custofixo"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(CustoFixo.objects.filter(propriedade=self.propriedade).count(), len(CustoFixo.TIPO_CHOICES) * 12 - 1)
+        mensagens = [str(mensagem) for mensagem in resposta.context['messages']]
+        self.assertTrue(any('Maio' in mensagem for mensagem in mensagens))
+
+    def test_regrava_receita(self):
+        tipo = Receita.TIPO_CHOICES[0][0]
+        for valor in ('500.00', '750.00'):
+            self.client.post(reverse('fluxo_caixa'), {'salvar_receitas': '1', 'ano': self.ano, f'receita_{tipo}_3': valor})
+
+        receita = Receita.objects.get(propriedade=self.propriedade)
+        self.assertEqual(receita.valor, Decimal('750.00'))
+
+    def test_grade_vazia_avisa_que_nada_foi_salvo(self):
+        resposta = self.client.post(reverse('fluxo_caixa'), {'salvar_receitas': '1', 'ano': self.ano}, follow=True)
+
+        mensagens = [(mensagem.level_tag, str(mensagem)) for mensagem in resposta.context['messages']]
+        self.assertEqual(mensagens, [('warning', 'Nenhum dado foi salvo. Verifique os valores informados.')])
+
+
+class GradePeriodosTest(PropriedadeTestCase):
+    """A grade de períodos personalizados é gravada com um número fixo de comandos"""
+
+    def postar_periodos(self, valor_por_celula):
+        dados = {'salvar_periodo': '1', 'ano': self.ano}
+        for lote_id in Lote.objects.values_list('id', flat=True):
+            for mes in range(1, 12):
+                dados[f'periodo_lote_{lote_id}_mes_{mes}'] = valor_por_celula(lote_id, mes)
+        with CaptureQueriesContext(connection) as contexto:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                resposta = self.client.post(reverse('ponto_equilibrio'), dados)
+        self.assertEqual(resposta.status_code, 302)
+        for callback in callbacks:
+            callback()
+        return len(contexto)
+
+    def test_comandos_nao_crescem_com_os_lotes(self):
+        self.criar_lotes(2)
+        queries_poucos_lotes = self.postar_periodos(lambda lote_id, mes: '25')
+
+        self.criar_lotes(10)
+        queries_muitos_lotes = self.postar_periodos(lambda lote_id, mes: '26')
+
+        self.assertEqual(queries_muitos_lotes, queries_poucos_lotes)
+        self.assertEqual(PeriodoPersonalizado.objects.filter(ano=self.ano, periodo_dias=26).count(), 12 * 11)
+
+    def test_celulas_esvaziadas_sao_apagadas(self):
+        self.criar_lotes(1)
+        lote = Lote.objects.get()
+        self.postar_periodos(lambda lote_id, mes: '' if mes in (3, 4) else '28')
+
+        meses = set(PeriodoPersonalizado.objects.filter(lote=lote, ano=self.ano).values_list('mes', flat=True))
+        self.assertEqual(meses, set(range(1, 12)) - {3, 4})
+        self.assertIsNone(lote.meses.get(ano=self.ano, mes=3).periodo_dias)
+        self.assertEqual(lote.meses.get(ano=self.ano, mes=5).periodo_dias, 28)
+
+    def test_grade_rejeitada_nao_mostra_sucesso(self):
+        self.criar_lotes(1)
+        lote_id = Lote.objects.get().id
+        dados = {'salvar_periodo': '1', 'ano': self.ano, f'periodo_lote_{lote_id}_mes_1': 'x'}
+        resposta = self.client.post(reverse('ponto_equilibrio'), dados, follow=True)
+
+        niveis = [mensagem.level_tag for mensagem in resposta.context['messages']]
+        self.assertEqual(niveis, ['error', 'warning'])
+
+
+class FaturamentoLotesTest(PropriedadeTestCase):
+    """GMD e valor da @ de todos os lotes são gravados com um único UPDATE"""
+
+    def test_um_update_para_todos_os_lotes(self):
+        self.criar_lotes(15)
+        dados = {'calcular_faturamento_valor': '1', 'active_tab': 'faturamento'}
+        for lote_id in Lote.objects.values_list('id', flat=True):
+            dados[f'valor_arroba_lote_{lote_id}'] = '310.50'
+
+        with CaptureQueriesContext(connection) as contexto:
+            with self.captureOnCommitCallbacks(execute=True):
+                resposta = self.client.post(reverse('faturamento'), dados)
+
+        self.assertEqual(resposta.status_code, 302)
+        updates = [query['sql'] for query in contexto.captured_queries if query['sql'].startswith('UPDATE "usuarios_lote"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(Lote.objects.filter(ultimo_valor_arroba=Decimal('310.50')).count(), 15)
+
+    def test_gmd_invalido_nao_e_gravado(self):
+        self.criar_lotes(2)
+        primeiro, segundo = Lote.objects.all()
+        dados = {'calcular_faturamento': '1', f'gmd_lote_{primeiro.id}': '1.25', f'gmd_lote_{segundo.id}': 'x'}
+        self.client.post(reverse('faturamento'), dados)
+
+        primeiro.refresh_from_db()
+        segundo.refresh_from_db()
+        self.assertEqual(primeiro.ultimo_gmd_usado, Decimal('1.25'))
+        self.assertIsNone(segundo.ultimo_gmd_usado)
+
+
+class LinhaDoTempoTest(PropriedadeTestCase):
+    """A projeção segue contínua de um ano para o outro"""
+
+    def setUp(self):
+        super().setUp()
+        self.criar_lotes(1)
+        lote = Lote.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            ProjecaoGanho.objects.create(lote=lote, mes=12, ano=self.ano, gmd_kg=Decimal('1'))
+            ProjecaoGanho.objects.create(lote=lote, mes=1, ano=self.ano + 1, gmd_kg=Decimal('1'))
+
+    def test_ponto_equilibrio_continua_no_ano_seguinte(self):
+        _, resposta = self.contar_queries()
+        dezembro = resposta.context['dados_lotes'][0]['meses'][12]
+
+        resposta = self.client.get(reverse('ponto_equilibrio'), {'ano': self.ano + 1})
+        janeiro = resposta.context['dados_lotes'][0]['meses'][1]
+
+        self.assertEqual(janeiro['peso_entrada_kg'], dezembro['peso_saida_kg'])
+        self.assertEqual(janeiro['valor_animal'], dezembro['valor_final'])
+
+    def test_peso_do_dashboard_nao_reinicia(self):
+        resposta = self.client.get(reverse('grafico', args=['lotes-peso']))
+        serie = resposta.json()['datasets'][0]['data']
+        self.assertEqual(serie, sorted(serie))
+        self.assertGreater(serie[-1], serie[0])
+
+
+class SensibilidadeTest(PropriedadeTestCase):
+    """A grade de sensibilidade reproduz o faturamento e o ponto de equilíbrio sem gravar nada"""
+
+    def setUp(self):
+        super().setUp()
+        self.criar_lotes(3)
+        Lote.objects.update(ultimo_gmd_usado=Decimal('0.85'), ultimo_valor_arroba=Decimal('300'))
+
+    def faturamento_total(self):
+        resposta = self.client.get(reverse('faturamento'))
+        return sum(linha['faturamento'] for linha in resposta.context['tabela_faturamento'])
+
+    def test_cenario_sem_variacao_igual_as_views(self):
+        resposta = self.client.get(reverse('sensibilidade'), {'gmd': '0', 'arroba': '0', 'rendimento': '0'})
+        grade = resposta.json()
+
+        self.assertAlmostEqual(grade['faturamento_total'][0][0][0], self.faturamento_total(), places=4)
+        _, resposta = self.contar_queries()
+        novembro = resposta.context['dados_lotes'][0]['meses'][11]
+        self.assertAlmostEqual(grade['lotes'][0]['ponto_equilibrio'][0][0], novembro['ponto_equilibrio'], places=6)
+
+    def test_variacao_igual_a_gravar_os_valores(self):
+        grade = self.client.get(reverse('sensibilidade'), {
+            'gmd': '-0,1;0', 'arroba': '20', 'rendimento': '1'
+        }).json()
+
+        Lote.objects.update(ultimo_gmd_usado=Decimal('0.75'), ultimo_valor_arroba=Decimal('320'))
+        self.propriedade.ultimo_rendimento_carcaca = Decimal('53')
+        self.propriedade.save()
+        self.assertAlmostEqual(grade['faturamento_total'][0][0][0], self.faturamento_total(), places=4)
+        self.assertEqual(Lote.objects.filter(ultimo_gmd_usado=Decimal('0.75')).count(), 3)
+
+    def test_processos_dao_o_mesmo_resultado(self):
+        from .sensibilidade import avaliar, avaliar_lotes, carregar_base
+
+        _, base = carregar_base(self.propriedade)
+        eixos = ((-0.1, 0.0, 0.1), (0.0, 15.0), (50.0, 52.0))
+        self.assertEqual(avaliar(base, *eixos, processos=2), avaliar_lotes(base, *eixos))
+
+    def test_parametro_invalido(self):
+        resposta = self.client.get(reverse('sensibilidade'), {'gmd': 'abc'})
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(resposta.json(), {'erro': 'Parâmetro gmd inválido.'})
+
+    def test_grade_grande(self):
+        from . import sensibilidade
+
+        parametros = {'gmd': '-0.1,0,0.1', 'arroba': '-10,0,10', 'rendimento': '0,1'}
+        detalhada = self.client.get(reverse('sensibilidade'), parametros).json()
+        self.assertEqual(len(detalhada['lotes']), 3)
+
+        # 3 lotes × 18 cenários = 54 células: acima do limite dos cubos, só os totais; acima do máximo, erro
+        with mock.patch.object(sensibilidade, 'MAX_CELULAS_POR_LOTE', 50):
+            totais = self.client.get(reverse('sensibilidade'), parametros).json()
+        self.assertIsNone(totais['lotes'])
+        self.assertEqual(totais['faturamento_total'], detalhada['faturamento_total'])
+
+        with mock.patch.object(sensibilidade, 'MAX_CELULAS', 50):
+            resposta = self.client.get(reverse('sensibilidade'), parametros)
+        self.assertEqual(resposta.status_code, 400)
+
+
+class SimulacaoTest(PropriedadeTestCase):
+    """A simulação é reproduzível e transmite os percentis aos poucos"""
+
+    def setUp(self):
+        super().setUp()
+        self.criar_lotes(2)
+        Lote.objects.update(ultimo_valor_arroba=Decimal('300'))
+
+    def simular(self, **parametros):
+        resposta = self.client.get(reverse('simulacao'), parametros)
+        self.assertEqual(resposta['Content-Type'], 'application/x-ndjson')
+        return [json.loads(linha) for linha in b''.join(resposta.streaming_content).splitlines()]
+
+    def test_mesma_semente_mesmo_resultado(self):
+        linhas = self.simular(cenarios=2500, semente=7)
+        self.assertEqual([linha['tipo'] for linha in linhas], ['inicio', 'parcial', 'parcial', 'final'])
+        self.assertEqual(linhas[2]['cenarios'], 2000)
+
+        final = linhas[-1]
+        self.assertEqual(final, self.simular(cenarios=2500, semente=7)[-1])
+        self.assertNotEqual(final, self.simular(cenarios=2500, semente=8)[-1])
+        self.assertEqual(len(final['lotes']), 2)
+        resultado = final['propriedade']['resultado']
+        self.assertEqual(resultado, sorted(resultado))
+
+    def test_sem_variacao_igual_ao_deterministico(self):
+        from .simulacao import carregar_lotes
+
+        final = self.simular(cenarios=10, cv_gmd=0, volatilidade_arroba=0, volatilidade_mortalidade=0)[-1]
+        _, _, lotes, _ = carregar_lotes(self.propriedade)
+        lote = lotes[0]
+        arrobas = lote.quantidade * (lote.peso_inicial + lote.ganho) * 52 / 100 / 15
+        esperado = arrobas * 300 * (1 - 0.025) - lote.investimento - lote.alimentacao * 1.01
+        self.assertEqual(lote.mortalidade, 0)
+        for valor in final['lotes'][0]['resultado']:
+            self.assertAlmostEqual(valor, esperado, places=4)
+
+    def test_parametro_invalido(self):
+        resposta = self.client.get(reverse('simulacao'), {'correlacao_gmd_arroba': '2'})
+        self.assertEqual(resposta.status_code, 400)
+
+
+class ImportacaoPlanilhaTest(PropriedadeTestCase):
+    """A planilha modelo é importada em blocos e a simulação não grava nada"""
+
+    arquivo = settings.BASE_DIR / 'Dashboard Boi de Lucro 2.0 (1).xlsx'
+
+    def importar(self, **opcoes):
+        saida = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('importar_planilha', str(self.arquivo), usuario=self.usuario.email, ano=self.ano,
+                         stdout=saida, **opcoes)
+        return saida.getvalue()
+
+    def test_simulacao_nao_grava(self):
+        saida = self.importar(dry_run=True)
+        self.assertIn('Lotes: 3 novo(s)', saida)
+        self.assertIn('Custos Fixos: 143 novo(s)', saida)
+        self.assertFalse(Lote.objects.exists())
+        self.assertFalse(CustoFixo.objects.exists())
+
+    def test_importa_e_reimporta_sem_alteracoes(self):
+        self.importar(tamanho_bloco=10)
+
+        lote = Lote.objects.get(nome='Lote 1')
+        self.assertEqual((lote.quantidade, lote.peso_kg, lote.valor_compra), (200, Decimal('210'), Decimal('2870')))
+        self.assertEqual(ProjecaoGanho.objects.get(lote=lote, ano=self.ano, mes=4).gmd_kg, Decimal('0.8'))
+        self.assertEqual(GastoNutricional.objects.filter(lote__propriedade=self.propriedade).count(), 32)
+        self.assertEqual(CustoFixo.objects.get(tipo='prolabore', ano=2026, mes=1).valor, Decimal('20000'))
+        self.assertTrue(LoteMes.objects.filter(lote=lote).exists())
+
+        ProjecaoGanho.objects.filter(lote=lote, mes=4).update(gmd_kg=Decimal('1.1'))
+        saida = self.importar(dry_run=True, verbosity=2)
+        self.assertIn('Lotes: 0 novo(s), 0 alterado(s), 3 igual(is)', saida)
+        self.assertIn('Projeções de Ganho: 0 novo(s), 1 alterado(s), 23 igual(is)', saida)
+        self.assertIn('Lote 1 Abril/2025: 1.10 → 0.80', saida)
+
+    def test_aba_truncada(self):
+        import tempfile
+        import zipfile
+        from django.core.management.base import CommandError
+
+        # A mesma planilha com o XML de cada aba cortado ao meio
+        with tempfile.NamedTemporaryFile(suffix='.xlsx') as truncada:
+            with zipfile.ZipFile(self.arquivo) as original, zipfile.ZipFile(truncada, 'w') as copia:
+                for item in original.infolist():
+                    conteudo = original.read(item)
+                    if item.filename.startswith('xl/worksheets/sheet'):
+                        conteudo = conteudo[:len(conteudo) // 2]
+                    copia.writestr(item, conteudo)
+            truncada.flush()
+            self.arquivo = truncada.name
+
+            with self.assertRaisesMessage(CommandError, 'inválida'):
+                self.importar(dry_run=True)
+
+
+class ExportacaoXlsxTest(PropriedadeTestCase):
+    """As tabelas são baixadas em XLSX que a própria leitura de planilhas entende"""
+
+    def setUp(self):
+        super().setUp()
+        self.criar_lotes(2)
+        CustoFixo.objects.create(propriedade=self.propriedade, tipo='energia', mes=2, ano=self.ano, valor=Decimal('1200'))
+
+    def baixar(self, nome, **parametros):
+        from .xlsx import LeitorXlsx
+
+        resposta = self.client.get(reverse('exportar', args=[nome]), parametros)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(resposta.streaming)
+        with LeitorXlsx(BytesIO(b''.join(resposta.streaming_content))) as leitor:
+            return resposta, {aba: list(leitor.linhas(aba)) for aba in leitor.abas}
+
+    def linha(self, linhas, rotulo):
+        return next(celulas for _, celulas in linhas if celulas.get('A') == rotulo)
+
+    def test_fluxo_de_caixa_por_ano(self):
+        resposta, abas = self.baixar('fluxo-caixa', de=self.ano, ate=self.ano + 1)
+        self.assertIn('fluxo-caixa-2025-2026.xlsx', resposta['Content-Disposition'])
+        self.assertEqual(list(abas), ['Fluxo 2025', 'Fluxo 2026'])
+
+        linhas = abas['Fluxo 2025']
+        self.assertEqual(self.linha(linhas, 'Energia')['D'], Decimal('1200'))
+        self.assertEqual(self.linha(linhas, 'INVESTIMENTOS')['B'], Decimal('-300000'))
+        self.assertEqual(linhas[2][1]['P'], 'INVESTIMENTOS')
+
+    def test_faturamento_e_ponto_de_equilibrio(self):
+        Lote.objects.update(ultimo_valor_arroba=Decimal('300'))
+        _, abas = self.baixar('faturamento')
+        self.assertEqual(list(abas), ['Ganho de Peso', 'Evolução de Peso', 'Rendimento', 'Faturamento'])
+        self.assertEqual(self.linha(abas['Faturamento'], 'Lote 000')['B'], Decimal('300'))
+
+        _, abas = self.baixar('ponto-equilibrio', ano=self.ano)
+        self.assertEqual(list(abas), ['PE Lote 000', 'PE Lote 001'])
+        self.assertEqual(self.linha(abas['PE Lote 000'], 'Período (dias)')['D'], Decimal('20'))
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.client.get(reverse('exportar', args=['fluxo-caixa']), {'de': 2030, 'ate': 2025}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('exportar', args=['lotes'])).status_code, 404)
+
+
+class BenchmarkTest(PropriedadeTestCase):
+    """Os percentis são gravados por grupo e só para grupos com propriedades suficientes"""
+
+    def setUp(self):
+        super().setUp()
+        self.propriedade.municipio_estado = 'Cuiabá/MT'
+        self.propriedade.save()
+        self.criar_lotes(1)
+        principal = self.propriedade
+        # Outras quatro propriedades, com GMDs diferentes; só duas no mesmo município
+        for indice in range(1, 5):
+            usuario = Usuario.objects.create_user(email=f'vizinho{indice}@teste.com', password='senha123')
+            self.propriedade = Propriedade.objects.create(
+                usuario=usuario, municipio_estado='cuiaba/mt' if indice < 3 else 'Sorriso/MT'
+            )
+            self.criar_lotes(1)
+            ProjecaoGanho.objects.filter(lote__propriedade=self.propriedade).update(gmd_kg=Decimal('0.85') + indice / Decimal('10'))
+        self.propriedade = principal
+        call_command('rebuild_lote_mes', stdout=StringIO())
+
+    def test_percentis_por_grupo(self):
+        saida = StringIO()
+        call_command('calcular_benchmarks', ano=self.ano, processos=1, minimo=3, stdout=saida)
+        self.assertIn('5/5 propriedades calculadas', saida.getvalue())
+
+        geral = Benchmark.objects.get(ano=self.ano, dimensao='geral', metrica='gmd')
+        self.assertEqual(geral.propriedades, 5)
+        self.assertEqual((geral.p10, geral.p50, geral.p90), (Decimal('0.8900'), Decimal('1.0500'), Decimal('1.2100')))
+
+        # "Cuiabá/MT" e "cuiaba/mt" são o mesmo grupo; Sorriso tem só duas propriedades
+        municipio = Benchmark.objects.get(ano=self.ano, dimensao='municipio_estado', metrica='gmd')
+        self.assertEqual((municipio.grupo, municipio.propriedades), ('cuiaba/mt', 3))
+        self.assertEqual(Benchmark.objects.filter(grupo='sorriso/mt').count(), 0)
+
+    def test_ponto_equilibrio_do_ano(self):
+        from .benchmark import metricas_propriedade
+        from .views import _dados_ponto_equilibrio
+
+        # O mesmo valor do painel no último mês projetado do ano (novembro)
+        painel = _dados_ponto_equilibrio(self.propriedade, self.ano)['dados_lotes'][0]['meses']
+        metricas = metricas_propriedade(self.propriedade, self.ano)
+        self.assertAlmostEqual(metricas['ponto_equilibrio'], painel[11]['ponto_equilibrio'], places=6)
+
+        # Sem projeção no ano seguinte, não há ponto de equilíbrio
+        self.assertIsNone(metricas_propriedade(self.propriedade, self.ano + 1)['ponto_equilibrio'])
+
+    def test_pagina_le_os_grupos_da_propriedade(self):
+        call_command('calcular_benchmarks', ano=self.ano, processos=1, minimo=3, stdout=StringIO())
+        with CaptureQueriesContext(connection) as contexto:
+            resposta = self.client.get(reverse('benchmark'), {'ano': self.ano})
+        self.assertEqual(resposta.status_code, 200)
+        grupos = resposta.context['grupos']
+        self.assertEqual([grupo['dimensao'] for grupo in grupos], ['Todas as propriedades', 'Município/Estado'])
+        gmd = grupos[0]['metricas'][0]
+        self.assertEqual(gmd['metrica'], 'gmd')
+        self.assertAlmostEqual(gmd['valor'], 0.85)
+        self.assertEqual(gmd['faixa'], 'abaixo do p10')
+
+        # Com as métricas da propriedade em cache, a página só lê as linhas do benchmark
+        with CaptureQueriesContext(connection) as contexto_cache:
+            self.client.get(reverse('benchmark'), {'ano': self.ano})
+        self.assertLess(len(contexto_cache), len(contexto))
+
+
+class SnapshotsTest(PropriedadeTestCase):
+    """As telas leem a fotografia noturna enquanto os dados da propriedade não mudam"""
+
+    def setUp(self):
+        super().setUp()
+        self.criar_lotes(2)
+
+    def recalcular(self):
+        saida = StringIO()
+        call_command('recompute_snapshots', anos=[self.ano], executor='serial', stdout=saida)
+        return saida.getvalue()
+
+    def test_grava_e_le_a_fotografia(self):
+        queries_ao_vivo, resposta_ao_vivo = self.contar_queries()
+        cache.clear()
+
+        saida = self.recalcular()
+        self.assertIn('1/1 propriedades processadas (5 fotografia(s))', saida)
+        self.assertEqual(
+            set(Snapshot.objects.values_list('nome', 'ano')),
+            {('lotes_dashboard', 0), ('nutricional_dashboard', 0), ('faturamento', 0),
+             ('fluxo_caixa', self.ano), ('ponto_equilibrio', self.ano)},
+        )
+
+        queries_fotografia, resposta = self.contar_queries()
+        self.assertLess(queries_fotografia, queries_ao_vivo)
+        self.assertEqual(resposta.context['dados_lotes'], resposta_ao_vivo.context['dados_lotes'])
+
+    def test_fotografia_vencida_calcula_ao_vivo(self):
+        self.recalcular()
+        # Uma exclusão não muda nenhum data_atualizacao, só a quantidade de linhas
+        with self.captureOnCommitCallbacks(execute=True):
+            GastoNutricional.objects.filter(mes=1, ano=self.ano).delete()
+        cache.clear()
+
+        _, resposta = self.contar_queries()
+        self.assertEqual(resposta.context['dados_lotes'][0]['meses'][1]['custo_diaria'], 0.0)
+
+    def test_fotografia_de_outro_formato_calcula_ao_vivo(self):
+        self.recalcular()
+        self.assertNotEqual(snapshots.ler_ou_calcular(self.propriedade, 'faturamento', lambda: 'ao vivo'), 'ao vivo')
+
+        with mock.patch.object(snapshots, 'VERSAO_FORMATO', snapshots.VERSAO_FORMATO + 1):
+            self.assertEqual(snapshots.ler_ou_calcular(self.propriedade, 'faturamento', lambda: 'ao vivo'), 'ao vivo')
+
+
+class DashboardsAsyncTest(PropriedadeTestCase):
+    """As views assíncronas dos dashboards mostram o mesmo que os cálculos síncronos"""
+
+    def setUp(self):
+        super().setUp()
+        self.criar_lotes(2)
+        CustoFixo.objects.create(propriedade=self.propriedade, tipo='energia', mes=2, ano=self.ano, valor=Decimal('1200'))
+        Receita.objects.create(propriedade=self.propriedade, tipo='venda_bois', mes=5, ano=self.ano,
+                               valor=Decimal('90000'))
+
+    async def test_views_com_cliente_assincrono(self):
+        from asgiref.sync import sync_to_async
+        from .views import CALCULOS_DASHBOARD
+
+        await self.async_client.aforce_login(self.usuario)
+        for nome, partes in [('lotes_dashboard', ()), ('nutricional_dashboard', ()), ('faturamento', ()),
+                             ('fluxo_caixa', (self.ano,)), ('ponto_equilibrio', (self.ano,))]:
+            with self.subTest(nome=nome):
+                resposta = await self.async_client.get(reverse(nome), {'ano': self.ano})
+                self.assertEqual(resposta.status_code, 200)
+                esperado = await sync_to_async(CALCULOS_DASHBOARD[nome])(self.propriedade, *partes)
+                self.assertEqual({chave: resposta.context[chave] for chave in esperado}, esperado)
+
+    async def test_carregamento_assincrono_igual_ao_sincrono(self):
+        from asgiref.sync import sync_to_async
+        from .fluxo_caixa import FluxoCaixa
+        from .projecao import carregar_dados, carregar_dados_async
+
+        dados = await carregar_dados_async(self.propriedade, com_periodos=True, com_gastos=True)
+        esperado = await sync_to_async(carregar_dados)(self.propriedade, com_periodos=True, com_gastos=True)
+        self.assertEqual(dados.lotes, esperado.lotes)
+        self.assertEqual(dados.projecoes, esperado.projecoes)
+        self.assertEqual(dados.periodos, esperado.periodos)
+        self.assertEqual(dados.gastos, esperado.gastos)
+
+        anos = [self.ano, self.ano + 1]
+        fluxos = await FluxoCaixa.carregar_async(self.propriedade, anos)
+        esperados = await sync_to_async(FluxoCaixa.carregar)(self.propriedade, anos)
+        for ano in anos:
+            self.assertEqual(fluxos[ano].contexto(), esperados[ano].contexto())
+
+    async def test_respostas_em_partes_assincronas(self):
+        from asgiref.sync import sync_to_async
+
+        await self.async_client.aforce_login(self.usuario)
+        for url, parametros in [(reverse('simulacao'), {'cenarios': 10}),
+                                (reverse('exportar', args=['fluxo-caixa']), {'de': self.ano})]:
+            with self.subTest(url=url):
+                resposta = await self.async_client.get(url, parametros)
+                self.assertEqual(resposta.status_code, 200)
+                self.assertTrue(resposta.is_async)
+                self.assertTrue(b''.join([parte async for parte in resposta.streaming_content]))
+
+        # Pelo cliente síncrono (WSGI) o iterador continua síncrono
+        resposta = await sync_to_async(self.client.get)(reverse('simulacao'), {'cenarios': 10})
+        self.assertFalse(resposta.is_async)
+
+
+class DesempenhoTest(PropriedadeTestCase):
+    """Cada requisição é medida por view e as que passam do orçamento vão para o log"""
+
+    def setUp(self):
+        super().setUp()
+        from .perf import AGREGADOS
+        self.agregados = AGREGADOS
+        self.agregados.zerar()
+        self.criar_lotes(2)
+
+    def totais(self, view):
+        return {linha['view']: linha for linha in self.agregados.contexto()['views']}[f'usuarios.views.{view}']
+
+    def test_mede_queries_e_templates_por_view(self):
+        queries = [self.contar_queries()[0] for _ in range(2)]
+
+        totais = self.totais('ponto_equilibrio_view')
+        self.assertEqual(totais['requisicoes'], 2)
+        self.assertEqual(totais['queries_maximo'], max(queries))
+        self.assertEqual(totais['queries_media'], sum(queries) / 2)
+        self.assertGreater(totais['template_medio_ms'], 0)
+        self.assertGreaterEqual(totais['tempo_medio_ms'], totais['db_medio_ms'] + totais['template_medio_ms'])
+
+    def test_conta_queries_das_views_assincronas(self):
+        # As consultas das views async rodam em outra thread, com a medição levada pela ContextVar
+        async def visitar():
+            await self.async_client.aforce_login(self.usuario)
+            return await self.async_client.get(reverse('lotes_dashboard'))
+
+        from asgiref.sync import async_to_sync
+        self.assertEqual(async_to_sync(visitar)().status_code, 200)
+        self.assertGreater(self.totais('lotes_dashboard_view')['queries_maximo'], 0)
+
+    def test_orcamento_excedido_vai_para_o_log(self):
+        with self.settings(PERF_ORCAMENTOS={'fluxo_caixa_view': {'queries': 1}}):
+            with self.assertLogs('usuarios.perf', 'WARNING') as logs:
+                self.client.get(reverse('fluxo_caixa'), {'ano': self.ano})
+            self.client.get(reverse('lotes_dashboard'))
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('usuarios.views.fluxo_caixa_view acima do orçamento', logs.output[0])
+        self.assertEqual(self.totais('fluxo_caixa_view')['excedidas'], 1)
+        self.assertEqual(self.agregados.contexto()['excedidas'][0]['excessos'][0][0], 'queries')
+
+    def test_server_timing_com_trechos(self):
+        def trechos(resposta):
+            return {parte.split(';')[0]: parte for parte in resposta['Server-Timing'].split(', ')}
+
+        calculado = trechos(self.client.get(reverse('faturamento')))
+        for nome in ('db', 'render', 'compute', 'total', 'dashboard.faturamento', 'faturamento.montar', 'projecao'):
+            self.assertIn(nome, calculado)
+
+        # Do cache: sem cálculo, só banco, templates e Python
+        do_cache = trechos(self.client.get(reverse('faturamento')))
+        self.assertEqual(set(do_cache), {'db', 'render', 'compute', 'total'})
+
+    def test_server_timing_desligado(self):
+        with self.settings(PERF_SERVER_TIMING=False):
+            self.assertNotIn('Server-Timing', self.client.get(reverse('lotes_dashboard')))
+
+    def test_pagina_so_para_staff(self):
+        self.client.get(reverse('fluxo_caixa'))
+        self.assertEqual(self.client.get(reverse('perf')).status_code, 302)
+
+        self.usuario.is_staff = True
+        self.usuario.save()
+        resposta = self.client.get(reverse('perf'))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertContains(resposta, 'usuarios.views.fluxo_caixa_view')
+
+
+class MetricasTest(PropriedadeTestCase):
+    """O /metrics soma as métricas gravadas por todos os processos"""
+
+    def setUp(self):
+        super().setUp()
+        import tempfile
+        from .metricas import REGISTRO
+
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        configuracao = self.settings(METRICAS_DIR=pasta.name, METRICAS_TOKEN='segredo')
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        self.pasta = pasta.name
+        self.criar_lotes(2)
+        # O livro mensal também projeta os lotes ao gravar
+        REGISTRO.zerar()
+
+    def metricas(self, **cabecalhos):
+        return self.client.get(reverse('metricas'), headers=cabecalhos)
+
+    def test_exposicao_por_view_cache_e_calculo(self):
+        self.contar_queries()
+        self.contar_queries()
+
+        resposta = self.metricas(Authorization='Bearer segredo')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(resposta['Content-Type'].startswith('text/plain; version=0.0.4'))
+        texto = resposta.content.decode()
+        view = 'view="usuarios.views.ponto_equilibrio_view"'
+        self.assertIn(f'agrodash_requisicao_segundos_bucket{{{view},le="+Inf"}} 2', texto)
+        self.assertIn(f'agrodash_requisicao_segundos_count{{{view}}} 2', texto)
+        self.assertIn(f'agrodash_respostas_total{{status="200",{view}}} 2', texto)
+        self.assertIn('agrodash_cache_total{nome="ponto_equilibrio",resultado="acerto"} 1', texto)
+        self.assertIn('agrodash_cache_total{nome="ponto_equilibrio",resultado="falta"} 1', texto)
+        self.assertIn('agrodash_calculo_segundos_count{calculo="dashboard.ponto_equilibrio"} 1', texto)
+        self.assertIn('agrodash_calculo_segundos_count{calculo="projecao"} 1', texto)
+
+    def test_exige_token_ou_staff(self):
+        self.assertEqual(self.metricas().status_code, 401)
+        self.assertEqual(self.metricas(Authorization='Bearer errado').status_code, 401)
+
+        self.usuario.is_staff = True
+        self.usuario.save()
+        self.assertEqual(self.metricas().status_code, 200)
+
+    def test_processos_encerrados_continuam_somados(self):
+        import os
+        import subprocess
+        from .metricas import coletar
+
+        # Um pid que já terminou, como o de um worker reciclado
+        processo = subprocess.Popen(['true'])
+        processo.wait()
+        estado = {'contadores': [['agrodash_respostas_total', [['status', '200'], ['view', 'v']], 5]],
+                  'histogramas': []}
+        with open(os.path.join(self.pasta, f'{processo.pid}.json'), 'w') as arquivo:
+            json.dump(estado, arquivo)
+
+        for _ in range(2):
+            total = coletar()
+            self.assertEqual(total.contadores[('agrodash_respostas_total', (('status', '200'), ('view', 'v')))], 5)
+        self.assertFalse(os.path.exists(os.path.join(self.pasta, f'{processo.pid}.json')))
+
+
+class PerfiladorTest(PropriedadeTestCase):
+    """Requisições marcadas rodam sob o cProfile e o perfil fica para baixar no admin"""
+
+    def setUp(self):
+        super().setUp()
+        self.criar_lotes(2)
+
+    def test_assinatura_do_proprio_staff(self):
+        from .perfilador import assinatura
+
+        outro = Usuario.objects.create_user(email='outro@teste.com', password='senha123', is_staff=True)
+        url = reverse('ponto_equilibrio')
+        self.client.get(url, {'__profile': assinatura(self.usuario)})
+        self.usuario.is_staff = True
+        self.usuario.save()
+        self.client.get(url, {'__profile': 'invalida'})
+        self.client.get(url, {'__profile': assinatura(outro)})
+        self.assertFalse(PerfilRequisicao.objects.exists())
+
+        self.client.get(url, {'ano': self.ano, '__profile': assinatura(self.usuario)})
+        perfil = PerfilRequisicao.objects.get()
+        self.assertEqual(perfil.usuario, self.usuario)
+        self.assertEqual(perfil.status, 200)
+        self.assertGreater(perfil.queries, 0)
+        self.assertIn('ponto_equilibrio_view', perfil.resumo)
+
+    def test_sem_sessao_nao_resolve_o_usuario(self):
+        from . import perfilador
+
+        # O coletor do /metrics entra só com o token, sem cookie de sessão
+        self.client.logout()
+        with self.settings(METRICAS_TOKEN='segredo'), mock.patch.object(perfilador, 'deve_perfilar') as deve:
+            resposta = self.client.get(reverse('metricas'), headers={'Authorization': 'Bearer segredo'})
+        self.assertEqual(resposta.status_code, 200)
+        deve.assert_not_called()
+
+    def test_flag_do_usuario_e_download(self):
+        import marshal
+        import pstats
+
+        self.usuario.perfilar_requisicoes = True
+        self.usuario.save()
+        self.client.get(reverse('faturamento'))
+        perfil = PerfilRequisicao.objects.get()
+        self.assertTrue(perfil.caminho.startswith('/faturamento'))
+
+        self.usuario.is_staff = True
+        self.usuario.is_superuser = True
+        self.usuario.perfilar_requisicoes = False
+        self.usuario.save()
+        resposta = self.client.get(reverse('admin:usuarios_perfilrequisicao_baixar', args=[perfil.id, 'pstats']))
+        self.assertEqual(resposta['Content-Disposition'], f'attachment; filename="perfil-{perfil.id}.pstats"')
+        estatisticas = pstats.Stats()
+        estatisticas.stats = marshal.loads(resposta.content)
+        estatisticas.get_top_level_stats()
+        self.assertGreater(estatisticas.total_calls, 0)
+        self.assertContains(
+            self.client.get(reverse('admin:usuarios_perfilrequisicao_baixar', args=[perfil.id, 'txt'])),
+            'cumulative',
+        )
+        self.assertEqual(PerfilRequisicao.objects.count(), 1)
+
+        # Staff sem a permissão de ver perfis não baixa
+        outro = Usuario.objects.create_user(email='outro@teste.com', password='senha123', is_staff=True)
+        self.client.force_login(outro)
+        resposta = self.client.get(reverse('admin:usuarios_perfilrequisicao_baixar', args=[perfil.id, 'txt']))
+        self.assertEqual(resposta.status_code, 403)
+
+    def test_guarda_os_ultimos_perfis_do_usuario(self):
+        from .perfilador import PERFIS_POR_USUARIO
+
+        self.usuario.perfilar_requisicoes = True
+        self.usuario.save()
+        for _ in range(PERFIS_POR_USUARIO + 2):
+            self.client.get(reverse('faturamento'))
+        ultimo = PerfilRequisicao.objects.latest('id')
+
+        self.assertEqual(PerfilRequisicao.objects.filter(usuario=self.usuario).count(), PERFIS_POR_USUARIO)
+        self.assertTrue(PerfilRequisicao.objects.filter(id=ultimo.id).exists())
+
+
+class MemoriaTest(PropriedadeTestCase):
+    """Com MEMORIA_MONITOR, o crescimento de memória é somado por view"""
+
+    def setUp(self):
+        super().setUp()
+        from .memoria import MEMORIA
+
+        configuracao = self.settings(MEMORIA_MONITOR=True)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+        self.memoria = MEMORIA
+        self.memoria.zerar()
+        self.criar_lotes(2)
+
+    def test_registra_requisicoes_por_view(self):
+        self.contar_queries()
+        self.client.get(reverse('faturamento'))
+
+        views = {linha['view']: linha for linha in self.memoria.contexto()['views']}
+        self.assertEqual(views['usuarios.views.ponto_equilibrio_view']['requisicoes'], 1)
+        self.assertEqual(views['usuarios.views.faturamento_view']['requisicoes'], 1)
+
+    def test_pagina_com_alocacoes_do_tracemalloc(self):
+        import tracemalloc
+
+        self.assertEqual(self.client.get(reverse('perf_memoria')).status_code, 302)
+        self.usuario.is_staff = True
+        self.usuario.save()
+
+        tracemalloc.start(5)
+        self.addCleanup(tracemalloc.stop)
+        self.client.post(reverse('perf_memoria'), {'referencia': '1'})
+        self.retidos = [bytearray(10000) for _ in range(100)]
+
+        resposta = self.client.get(reverse('perf_memoria'))
+        self.assertEqual(resposta.status_code, 200)
+        self.assertContains(resposta, 'que mais cresceram desde')
+        self.assertIn('self.retidos = [bytearray(10000)', resposta.context['alocacoes'][0]['pilha'])
+        self.assertGreaterEqual(resposta.context['alocacoes'][0]['diferenca'], 1000000)
+
+
+class FazendasSinteticasTest(TestCase):
+    """O seed_synthetic_farms gera fazendas completas e determinísticas pela semente"""
+
+    def gerar(self, *argumentos):
+        saida = StringIO()
+        call_command('seed_synthetic_farms', '--propriedades', '3', '--lotes', '2', '--anos', '2',
+                     '--ano-final', '2025', *argumentos, stdout=saida)
+        return saida.getvalue()
+
+    def gmds(self, prefixo):
+        return list(ProjecaoGanho.objects.filter(
+            lote__propriedade__usuario__email__startswith=prefixo
+        ).order_by('lote__propriedade__usuario__email', 'lote__nome', 'ano', 'mes').values_list('gmd_kg', flat=True))
+
+    def test_gera_dados_e_livro_mensal(self):
+        self.gerar('--semente', '7')
+
+        self.assertEqual(Propriedade.objects.count(), 3)
+        self.assertEqual(Lote.objects.count(), 6)
+        self.assertEqual(ProjecaoGanho.objects.count(), 6 * 24)
+        self.assertEqual(GastoNutricional.objects.count(), 6 * 24)
+        self.assertEqual(LoteMes.objects.filter(ano=2025).count(), 6 * 12)
+        self.assertEqual(set(CustoFixo.objects.values_list('ano', flat=True)), {2024, 2025})
+
+        # Dashboards funcionam com os dados gerados
+        self.client.force_login(Usuario.objects.get(email='fazenda000000@sintetico.agrodash'))
+        self.assertEqual(self.client.get(reverse('faturamento')).status_code, 200)
+        self.assertEqual(self.client.get(reverse('fluxo_caixa'), {'ano': 2025}).status_code, 200)
+
+    def test_mesma_semente_mesmos_dados(self):
+        self.gerar('--semente', '7', '--prefixo', 'a', '--tamanho-bloco', '1')
+        self.gerar('--semente', '7', '--prefixo', 'b')
+        self.gerar('--semente', '8', '--prefixo', 'c')
+
+        self.assertEqual(self.gmds('a'), self.gmds('b'))
+        self.assertNotEqual(self.gmds('a'), self.gmds('c'))
+
+    def test_prefixo_existente_exige_substituir(self):
+        from django.core.management.base import CommandError
+
+        self.gerar()
+        with self.assertRaises(CommandError):
+            self.gerar()
+        self.gerar('--substituir', '--propriedades', '1')
+        self.assertEqual(Propriedade.objects.count(), 1)
+
+    def test_substituir_apaga_com_queries_fixas(self):
+        from .sinteticos import apagar
+
+        def queries_para_apagar(*argumentos):
+            self.gerar(*argumentos)
+            with CaptureQueriesContext(connection) as contexto:
+                with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                    apagar('fazenda')
+            self.assertEqual(callbacks, [])
+            return len(contexto)
+
+        queries_pequena = queries_para_apagar('--propriedades', '1', '--lotes', '1')
+        queries_grande = queries_para_apagar('--propriedades', '4', '--lotes', '5')
+
+        self.assertEqual(queries_grande, queries_pequena)
+        self.assertFalse(Usuario.objects.exists())
+        self.assertFalse(LoteMes.objects.exists())
+
+    def test_substituir_nao_apaga_outro_prefixo(self):
+        self.gerar('--prefixo', 'fazenda')
+        self.gerar('--prefixo', 'faz', '--propriedades', '1')
+        self.gerar('--prefixo', 'faz', '--propriedades', '2', '--substituir')
+
+        self.assertEqual(Usuario.objects.filter(email__startswith='fazenda').count(), 3)
+        self.assertEqual(Usuario.objects.filter(email__regex=r'^faz[0-9]').count(), 2)
+
+
+class BancadaTest(TestCase):
+    """A bancada mede as views em fazendas sintéticas e aponta as regressões"""
+
+    def test_mede_e_compara_com_a_referencia(self):
+        from .bancada import comparar, medir
+
+        resultado = medir(['pequena'], ['faturamento', 'ponto_equilibrio'], repeticoes=1)
+        self.assertEqual(set(resultado['resultados']), {
+            'pequena/faturamento/sem_cache', 'pequena/faturamento/com_cache',
+            'pequena/ponto_equilibrio/sem_cache', 'pequena/ponto_equilibrio/com_cache',
+        })
+        medidas = resultado['resultados']['pequena/ponto_equilibrio/sem_cache']
+        self.assertGreater(medidas['queries'], resultado['resultados']['pequena/ponto_equilibrio/com_cache']['queries'])
+        self.assertGreater(medidas['memoria_pico_kb'], 0)
+        self.assertEqual(comparar(resultado, resultado), [])
 
-# Create your tests here.
+        referencia = json.loads(json.dumps(resultado))
+        anterior = referencia['resultados']['pequena/ponto_equilibrio/sem_cache']
+        anterior['queries'] -= 1
+        anterior['tempo_min_ms'] = medidas['tempo_min_ms'] / 2 - 10
+        # Dentro da folga de ruído: não conta
+        referencia['resultados']['pequena/faturamento/sem_cache']['tempo_min_ms'] -= 1
+        self.assertEqual(
+            [(nome, medida) for nome, medida, _, _ in comparar(resultado, referencia)],
+            [('pequena/ponto_equilibrio/sem_cache', 'queries'), ('pequena/ponto_equilibrio/sem_cache', 'tempo_min_ms')],
+        )
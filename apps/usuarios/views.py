@@ -1,10 +1,40 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout, update_session_auth_hash
 from django.contrib import messages
+from django.db import transaction
+from django.db.models import Q
 from django.views.decorators.csrf import csrf_protect
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from .models import Propriedade, Lote, ProjecaoGanho, GastoNutricional, CustoFixo, Receita, PeriodoPersonalizado
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.conf import settings
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import condition, require_http_methods, require_safe
+from .models import Propriedade, Lote, ProjecaoGanho, GastoNutricional, CustoFixo, Receita, PeriodoPersonalizado, LoteMes
 from .forms import PropriedadeForm, PerfilForm, AlterarSenhaForm, LoteForm, ProjecaoGanhoForm, GastoNutricionalForm
+from .benchmark import comparativo, metricas_propriedade
+from .cache_propriedade import obter_ou_calcular, obter_ou_calcular_async
+from .exportacao import abas_faturamento, abas_fluxo_caixa, abas_ponto_equilibrio
+from .fluxo_caixa import FluxoCaixa
+from .graficos import GRAFICOS, marca_dados
+from .grades import LeitorGrade, agendar_recalculo, apagar_celulas, ler_grade_por_tipo, salvar_grade
+from .memoria import MEMORIA
+from .metricas import coletar, exposicao
+from .perf import AGREGADOS, trecho
+from .perfilador import assinatura as assinatura_perfil
+from .projecao import (
+    KG_POR_ARROBA, MESES_NOMES, carregar_dados, carregar_dados_async, dias_no_mes, listar_todas_async, projetar
+)
+from .sensibilidade import (
+    VARIACOES_ARROBA, VARIACOES_GMD, VARIACOES_RENDIMENTO, carregar_base, grade_sensibilidade, ler_variacoes
+)
+from .simulacao import Parametros, carregar_lotes, simular
+from .snapshots import ler_ou_calcular, ler_ou_calcular_async
+from .xlsx import gerar_xlsx
 
 
 @csrf_protect
@@ -188,133 +218,119 @@ def deletar_projecao(request, projecao_id):
     return redirect('lotes')
 
 
-@login_required
-def lotes_dashboard_view(request):
-    """View para exibir dashboard com projeções de peso dos lotes"""
-    from calendar import monthrange
-    from decimal import Decimal
-    import json
-    
-    try:
-        propriedade = Propriedade.objects.get(usuario=request.user)
-    except (Propriedade.DoesNotExist, TypeError, ValueError):
-        propriedade = None
-        messages.warning(request, 'É necessário cadastrar a propriedade primeiro.')
-        return redirect('preencher_informacoes')
-    
-    # Busca lotes da propriedade com projeções
-    lotes = Lote.objects.filter(propriedade=propriedade).prefetch_related('projecoes_ganho').order_by('nome')
+def _consultas_lotes_dashboard(propriedade):
+    # Lotes da propriedade e os meses projetados de todos eles no livro mensal
+    lotes = Lote.objects.filter(propriedade=propriedade).order_by('nome')
+    livro = LoteMes.objects.filter(lote__propriedade=propriedade, gmd_kg__isnull=False).order_by(
+        'ano', 'mes'
+    ).values_list('lote_id', 'ano', 'mes', 'gmd_kg', 'dias_mes', 'ganho_kg', 'peso_acumulado_kg')
+    return lotes, livro
+
+
+def _dados_lotes_dashboard(propriedade):
+    """Calcula os dados do dashboard de lotes (guardados em cache por propriedade)"""
+    return _montar_lotes_dashboard(*(list(consulta) for consulta in _consultas_lotes_dashboard(propriedade)))
+
+
+async def _dados_lotes_dashboard_async(propriedade):
+    consultas = _consultas_lotes_dashboard(propriedade)
+    return _montar_lotes_dashboard(*await listar_todas_async(consultas))
+
+
+@trecho('lotes_dashboard.montar')
+def _montar_lotes_dashboard(lotes, livro):
+    meses_por_lote = {}
+    for lote_id, *registro in livro:
+        meses_por_lote.setdefault(lote_id, []).append(registro)
     
     # Dados para o gráfico e lista
     projecoes_dados = []
+    pesos_por_lote = {}
     cores_lotes = [
         '#3B82F6', '#EF4444', '#10B981', '#F59E0B', '#8B5CF6',
         '#EC4899', '#06B6D4', '#84CC16', '#F97316', '#6366F1'
     ]
     
-    # Para cada lote, calcular projeções
     for idx, lote in enumerate(lotes):
-        if not lote.projecoes_ganho.exists():
+        registros = meses_por_lote.get(lote.id)
+        if not registros:
             continue
-            
-        cor = cores_lotes[idx % len(cores_lotes)]
-        projecoes_lote = lote.projecoes_ganho.all().order_by('ano', 'mes')
-        
-        # Peso inicial do lote
-        peso_atual = Decimal(str(lote.peso_kg))
-        peso_inicial = peso_atual
         
-        # Agrupar projeções por ano
-        projecoes_por_ano = {}
-        for projecao in projecoes_lote:
-            if projecao.ano not in projecoes_por_ano:
-                projecoes_por_ano[projecao.ano] = []
-            projecoes_por_ano[projecao.ano].append(projecao)
-        
-        # Calcular projeções para cada ano
+        cor = cores_lotes[idx % len(cores_lotes)]
         dados_lote = {
             'lote_id': lote.id,
             'lote_nome': lote.nome,
             'cor': cor,
-            'peso_inicial': float(peso_inicial),
+            'peso_inicial': float(lote.peso_kg),
             'projecoes': []
         }
         
-        for ano, projecoes in sorted(projecoes_por_ano.items()):
-            peso_acumulado = peso_inicial
+        # O peso acumulado do livro segue contínuo pela linha do tempo do lote, atravessando os anos
+        pesos = pesos_por_lote[lote.id] = {}
+        for ano, mes, gmd_kg, dias_mes, ganho_kg, peso_acumulado in registros:
+            pesos[(ano, mes)] = float(peso_acumulado)
             
-            for projecao in sorted(projecoes, key=lambda x: x.mes):
-                # Calcular dias do mês
-                dias_mes = monthrange(ano, projecao.mes)[1]
-                
-                # Calcular ganho do mês: GMD * dias
-                ganho_mes = Decimal(str(projecao.gmd_kg)) * Decimal(dias_mes)
-                
-                # Peso projetado = peso acumulado + ganho do mês
-                peso_projetado = peso_acumulado + ganho_mes
-                
-                dados_lote['projecoes'].append({
-                    'ano': ano,
-                    'mes': projecao.mes,
-                    'mes_nome': projecao.get_mes_display(),
-                    'gmd': float(projecao.gmd_kg),
-                    'dias_mes': dias_mes,
-                    'ganho_mes': float(ganho_mes),
-                    'peso_projetado': float(peso_projetado),
-                    'peso_arroba_projetado': float(peso_projetado / Decimal('15'))
-                })
-                
-                peso_acumulado = peso_projetado
+            dados_lote['projecoes'].append({
+                'ano': ano,
+                'mes': mes,
+                'mes_nome': MESES_NOMES[mes],
+                'gmd': float(gmd_kg),
+                'dias_mes': dias_mes,
+                'ganho_mes': float(ganho_kg),
+                'peso_projetado': float(peso_acumulado),
+                'peso_arroba_projetado': float(peso_acumulado / KG_POR_ARROBA)
+            })
         
-        if dados_lote['projecoes']:
-            projecoes_dados.append(dados_lote)
+        projecoes_dados.append(dados_lote)
     
-    # Preparar dados para Chart.js
+    # Preparar dados para Chart.js (um ponto por mês, None onde o lote não tem projeção)
+    meses_ordenados = sorted({chave for pesos in pesos_por_lote.values() for chave in pesos})
     chart_data = {
-        'labels': [],
+        'labels': [f"{MESES_NOMES[mes]}/{ano}" for ano, mes in meses_ordenados],
         'datasets': []
     }
     
-    # Coletar todos os meses/anos únicos
-    meses_unicos = set()
-    for lote_data in projecoes_dados:
-        for proj in lote_data['projecoes']:
-            meses_unicos.add((proj['ano'], proj['mes'], proj['mes_nome']))
-    
-    # Ordenar meses
-    meses_ordenados = sorted(meses_unicos, key=lambda x: (x[0], x[1]))
-    chart_data['labels'] = [f"{mes[2]}/{mes[0]}" for mes in meses_ordenados]
-    
-    # Criar dataset para cada lote
     for lote_data in projecoes_dados:
-        dados_peso = []
-        for mes_ord in meses_ordenados:
-            # Encontrar projeção correspondente
-            projecao_encontrada = None
-            for proj in lote_data['projecoes']:
-                if proj['ano'] == mes_ord[0] and proj['mes'] == mes_ord[1]:
-                    projecao_encontrada = proj
-                    break
-            
-            if projecao_encontrada:
-                dados_peso.append(projecao_encontrada['peso_projetado'])
-            else:
-                # Se não houver projeção, usar None para não conectar no gráfico
-                dados_peso.append(None)
-        
+        pesos = pesos_por_lote[lote_data['lote_id']]
         chart_data['datasets'].append({
             'label': lote_data['lote_nome'],
-            'data': dados_peso,
+            'data': [pesos.get(chave) for chave in meses_ordenados],
             'borderColor': lote_data['cor'],
             'backgroundColor': lote_data['cor'] + '20',
             'tension': 0.4,
             'fill': False
         })
     
-    return render(request, 'lotes_dashboard.html', {
+    return {
         'lotes': lotes,
         'projecoes_dados': projecoes_dados,
-        'chart_data_json': json.dumps(chart_data),
+        # Servidos em JSON pela grafico_view (graficos.GRAFICOS)
+        'graficos': {'lotes-peso': chart_data},
+    }
+
+
+async def _propriedade_async(request):
+    """Propriedade do usuário logado (None se ainda não cadastrada), para as views assíncronas"""
+    return await Propriedade.objects.filter(usuario=await request.auser()).afirst()
+
+
+async def _render_async(request, template, contexto):
+    # O template (e os context processors, que leem request.user) rodam fora do event loop
+    return await sync_to_async(render)(request, template, contexto)
+
+
+@login_required
+async def lotes_dashboard_view(request):
+    """View para exibir dashboard com projeções de peso dos lotes"""
+    propriedade = await _propriedade_async(request)
+    if propriedade is None:
+        messages.warning(request, 'É necessário cadastrar a propriedade primeiro.')
+        return redirect('preencher_informacoes')
+    
+    dados = await _dados_dashboard_async(propriedade, 'lotes_dashboard')
+    
+    return await _render_async(request, 'lotes_dashboard.html', {
+        **dados,
         'user': request.user
     })
 
@@ -338,7 +354,6 @@ def home_view(request):
 def nutricional_view(request):
     """View para gerenciar gastos nutricionais"""
     from datetime import datetime
-    from decimal import Decimal
     
     try:
         propriedade = Propriedade.objects.get(usuario=request.user)
@@ -372,44 +387,35 @@ def nutricional_view(request):
         if lote_id_post:
             try:
                 lote_post = Lote.objects.get(id=int(lote_id_post), propriedade=propriedade)
-                for mes_num in range(1, 13):  # Janeiro a Dezembro
-                    # Processa gasto nutricional
-                    campo_key = f'gasto_mes_{mes_num}'
-                    if campo_key in request.POST:
-                        valor_str = request.POST[campo_key].strip()
-                        if valor_str:
-                            try:
-                                gasto_diario = Decimal(valor_str)
-                                if gasto_diario >= 0:
-                                    gasto_nutricional, created = GastoNutricional.objects.update_or_create(
-                                        lote=lote_post,
-                                        mes=mes_num,
-                                        ano=ano_post,
-                                        defaults={'gasto_diario': gasto_diario}
-                                    )
-                                    gastos_salvos += 1
-                            except (ValueError, TypeError, Exception):
-                                pass
-                    
-                    # Processa GMD (Projeção de Ganho)
-                    campo_gmd_key = f'gmd_mes_{mes_num}'
-                    if campo_gmd_key in request.POST:
-                        valor_gmd_str = request.POST[campo_gmd_key].strip()
-                        if valor_gmd_str:
-                            try:
-                                gmd_kg = Decimal(valor_gmd_str)
-                                if gmd_kg >= 0:
-                                    projecao_ganho, created = ProjecaoGanho.objects.update_or_create(
-                                        lote=lote_post,
-                                        mes=mes_num,
-                                        ano=ano_post,
-                                        defaults={'gmd_kg': gmd_kg}
-                                    )
-                                    gmd_salvos += 1
-                            except (ValueError, TypeError, Exception):
-                                pass
             except (Lote.DoesNotExist, ValueError, TypeError):
-                pass
+                lote_post = None
+            
+            if lote_post:
+                # Lê a grade de janeiro a dezembro validando cada célula pelo campo do modelo
+                leitor = LeitorGrade(request.POST)
+                campo_gasto = GastoNutricional._meta.get_field('gasto_diario')
+                campo_gmd = ProjecaoGanho._meta.get_field('gmd_kg')
+                gastos = []
+                projecoes = []
+                for mes_num in range(1, 13):
+                    mes_nome = MESES_NOMES[mes_num]
+                    gasto_diario = leitor.valor(f'gasto_mes_{mes_num}', campo_gasto, f'Gasto de {mes_nome}')
+                    if gasto_diario is not None:
+                        gastos.append(GastoNutricional(lote=lote_post, mes=mes_num, ano=ano_post, gasto_diario=gasto_diario))
+                    gmd_kg = leitor.valor(f'gmd_mes_{mes_num}', campo_gmd, f'GMD de {mes_nome}')
+                    if gmd_kg is not None:
+                        projecoes.append(ProjecaoGanho(lote=lote_post, mes=mes_num, ano=ano_post, gmd_kg=gmd_kg))
+                
+                # Um INSERT ... ON CONFLICT por modelo, na mesma transação
+                with transaction.atomic():
+                    gastos_salvos = salvar_grade(GastoNutricional, gastos, ['lote', 'mes', 'ano'], ['gasto_diario'])
+                    gmd_salvos = salvar_grade(ProjecaoGanho, projecoes, ['lote', 'mes', 'ano'], ['gmd_kg'])
+                    if gastos or projecoes:
+                        primeiro_mes = min(registro.mes for registro in gastos + projecoes)
+                        agendar_recalculo(propriedade.id, [lote_post.id], desde=(ano_post, primeiro_mes))
+                
+                if leitor.erros:
+                    messages.error(request, leitor.mensagem_erros())
         
         mensagens = []
         if gastos_salvos > 0:
@@ -489,22 +495,34 @@ def deletar_gasto_nutricional(request, gasto_id):
     return redirect('nutricional')
 
 
-@login_required
-def nutricional_dashboard_view(request):
-    """View para exibir dashboard com gastos nutricionais"""
-    from calendar import monthrange
+def _consultas_nutricional_dashboard(propriedade):
+    # Lotes da propriedade e os meses com gasto nutricional de todos eles no livro mensal
+    lotes = Lote.objects.filter(propriedade=propriedade).order_by('nome')
+    livro = LoteMes.objects.filter(lote__propriedade=propriedade, gasto_diario__isnull=False).order_by(
+        'ano', 'mes'
+    ).values_list('lote_id', 'ano', 'mes', 'gasto_diario', 'dias_mes', 'gasto_mensal', 'gasto_total_lote')
+    return lotes, livro
+
+
+def _dados_nutricional_dashboard(propriedade):
+    """Calcula os dados do dashboard nutricional (guardados em cache por propriedade)"""
+    return _montar_nutricional_dashboard(
+        *(list(consulta) for consulta in _consultas_nutricional_dashboard(propriedade))
+    )
+
+
+async def _dados_nutricional_dashboard_async(propriedade):
+    consultas = _consultas_nutricional_dashboard(propriedade)
+    return _montar_nutricional_dashboard(*await listar_todas_async(consultas))
+
+
+@trecho('nutricional_dashboard.montar')
+def _montar_nutricional_dashboard(lotes, livro):
     from decimal import Decimal
-    import json
-    
-    try:
-        propriedade = Propriedade.objects.get(usuario=request.user)
-    except (Propriedade.DoesNotExist, TypeError, ValueError):
-        propriedade = None
-        messages.warning(request, 'É necessário cadastrar a propriedade primeiro.')
-        return redirect('preencher_informacoes')
     
-    # Busca lotes da propriedade com gastos nutricionais
-    lotes = Lote.objects.filter(propriedade=propriedade).prefetch_related('gastos_nutricionais').order_by('nome')
+    meses_por_lote = {}
+    for lote_id, *registro in livro:
+        meses_por_lote.setdefault(lote_id, []).append(registro)
     
     # Dados para o gráfico e lista
     gastos_dados = []
@@ -513,54 +531,30 @@ def nutricional_dashboard_view(request):
         '#EC4899', '#06B6D4', '#84CC16', '#F97316', '#6366F1'
     ]
     
-    # Para cada lote, calcular gastos
     for idx, lote in enumerate(lotes):
-        if not lote.gastos_nutricionais.exists():
+        registros = meses_por_lote.get(lote.id)
+        if not registros:
             continue
-            
-        cor = cores_lotes[idx % len(cores_lotes)]
-        gastos_lote = lote.gastos_nutricionais.all().order_by('ano', 'mes')
         
-        # Agrupar gastos por ano
-        gastos_por_ano = {}
-        for gasto in gastos_lote:
-            if gasto.ano not in gastos_por_ano:
-                gastos_por_ano[gasto.ano] = []
-            gastos_por_ano[gasto.ano].append(gasto)
-        
-        # Calcular gastos para cada ano
-        dados_lote = {
+        cor = cores_lotes[idx % len(cores_lotes)]
+        gastos_dados.append({
             'lote_id': lote.id,
             'lote_nome': lote.nome,
             'cor': cor,
-            'gastos': []
-        }
-        
-        for ano, gastos in sorted(gastos_por_ano.items()):
-            for gasto in sorted(gastos, key=lambda x: x.mes):
-                # Calcular dias do mês
-                dias_mes = monthrange(ano, gasto.mes)[1]
-                
-                # Calcular gasto mensal por animal: gasto_diario * dias
-                gasto_mensal = Decimal(str(gasto.gasto_diario)) * Decimal(dias_mes)
-                
-                # Calcular gasto total do lote: gasto_mensal * quantidade de animais
-                quantidade_animais = Decimal(str(lote.quantidade))
-                gasto_total_lote = gasto_mensal * quantidade_animais
-                
-                dados_lote['gastos'].append({
+            'gastos': [
+                {
                     'ano': ano,
-                    'mes': gasto.mes,
-                    'mes_nome': gasto.get_mes_display(),
-                    'gasto_diario': float(gasto.gasto_diario),
+                    'mes': mes,
+                    'mes_nome': MESES_NOMES[mes],
+                    'gasto_diario': float(gasto_diario),
                     'dias_mes': dias_mes,
                     'gasto_mensal': float(gasto_mensal),
                     'quantidade_animais': int(lote.quantidade),
                     'gasto_total_lote': float(gasto_total_lote)
-                })
-        
-        if dados_lote['gastos']:
-            gastos_dados.append(dados_lote)
+                }
+                for ano, mes, gasto_diario, dias_mes, gasto_mensal, gasto_total_lote in registros
+            ]
+        })
     
     # Preparar dados para Chart.js - Gasto por Animal
     chart_data_por_animal = {
@@ -595,13 +589,10 @@ def nutricional_dashboard_view(request):
     for lote_data in gastos_dados:
         dados_gasto_animal = []
         dados_gasto_lote = []
+        gastos_por_mes = {(gasto['ano'], gasto['mes']): gasto for gasto in lote_data['gastos']}
         for mes_ord in meses_ordenados:
             # Encontrar gasto correspondente
-            gasto_encontrado = None
-            for gasto in lote_data['gastos']:
-                if gasto['ano'] == mes_ord[0] and gasto['mes'] == mes_ord[1]:
-                    gasto_encontrado = gasto
-                    break
+            gasto_encontrado = gastos_por_mes.get((mes_ord[0], mes_ord[1]))
             
             if gasto_encontrado:
                 dados_gasto_animal.append(gasto_encontrado['gasto_mensal'])
@@ -661,141 +652,69 @@ def nutricional_dashboard_view(request):
     # Criar lista de meses ordenados para as colunas
     meses_colunas = [f"{mes[2]}/{mes[0]}" for mes in meses_ordenados]
     
-    return render(request, 'nutricional_dashboard.html', {
+    return {
         'lotes': lotes,
         'gastos_dados': gastos_dados,
-        'chart_data_por_animal_json': json.dumps(chart_data_por_animal),
-        'chart_data_por_lote_json': json.dumps(chart_data_por_lote),
+        'graficos': {'nutricional-por-animal': chart_data_por_animal, 'nutricional-por-lote': chart_data_por_lote},
         'totais_mensais': {f"{mes[2]}/{mes[0]}": float(totais_mensais[mes]) for mes in meses_ordenados},
         'tabela_gastos_por_lote': tabela_gastos_por_lote,
         'meses_colunas': meses_colunas,
-        'user': request.user
-    })
+    }
 
 
 @login_required
-def faturamento_view(request):
-    """View para exibir planilha de faturamento com ganho de peso e evolução"""
-    from calendar import monthrange
-    from decimal import Decimal
-    import json
-    
-    try:
-        propriedade = Propriedade.objects.get(usuario=request.user)
-    except (Propriedade.DoesNotExist, TypeError, ValueError):
-        propriedade = None
+async def nutricional_dashboard_view(request):
+    """View para exibir dashboard com gastos nutricionais"""
+    propriedade = await _propriedade_async(request)
+    if propriedade is None:
         messages.warning(request, 'É necessário cadastrar a propriedade primeiro.')
         return redirect('preencher_informacoes')
     
-    # Busca lotes da propriedade com projeções
-    lotes = Lote.objects.filter(propriedade=propriedade).prefetch_related('projecoes_ganho').order_by('nome')
-    
-    # Processa formulário de GMD
-    gmd_por_lote = {}
-    if request.method == 'POST' and 'calcular_faturamento' in request.POST:
-        # Capturar aba ativa do POST
-        active_tab = request.POST.get('active_tab', 'gmd')
-        for lote in lotes:
-            gmd_key = f'gmd_lote_{lote.id}'
-            if gmd_key in request.POST:
-                gmd_str = request.POST[gmd_key].strip()
-                # Verificar se o valor não está vazio
-                if gmd_str:
-                    try:
-                        gmd_value = Decimal(gmd_str)
-                        if gmd_value > 0:
-                            gmd_por_lote[lote.id] = gmd_value
-                            # Salvar o último GMD usado no lote
-                            lote.ultimo_gmd_usado = gmd_value
-                            lote.save(update_fields=['ultimo_gmd_usado', 'data_atualizacao'])
-                    except (ValueError, TypeError, Exception):
-                        # Ignorar valores inválidos
-                        pass
-        # Redirecionar para manter a aba ativa
-        from django.urls import reverse
-        redirect_url = reverse('faturamento')
-        redirect_url += f'?tab={active_tab}'
-        return redirect(redirect_url)
+    dados = await _dados_dashboard_async(propriedade, 'nutricional_dashboard')
     
-    # Processa formulário de Rendimento de Carcaça
-    rendimento_percentual = None
-    if request.method == 'POST' and 'calcular_rendimento' in request.POST:
-        # Capturar aba ativa do POST
-        active_tab = request.POST.get('active_tab', 'rendimento')
-        if 'rendimento_carcaca' in request.POST:
-            rendimento_str = request.POST['rendimento_carcaca'].strip()
-            # Verificar se o valor não está vazio
-            if rendimento_str:
-                try:
-                    rendimento_value = Decimal(rendimento_str)
-                    if 0 < rendimento_value <= 100:
-                        rendimento_percentual = rendimento_value
-                        # Salvar o último rendimento usado na propriedade
-                        propriedade.ultimo_rendimento_carcaca = rendimento_percentual
-                        propriedade.save(update_fields=['ultimo_rendimento_carcaca', 'data_atualizacao'])
-                except (ValueError, TypeError, Exception):
-                    # Ignorar valores inválidos
-                    pass
-        # Redirecionar para manter a aba ativa
-        from django.urls import reverse
-        redirect_url = reverse('faturamento')
-        redirect_url += f'?tab={active_tab}'
-        return redirect(redirect_url)
-    else:
-        # Usar o último rendimento salvo se existir
-        if propriedade.ultimo_rendimento_carcaca:
-            rendimento_percentual = propriedade.ultimo_rendimento_carcaca
+    return await _render_async(request, 'nutricional_dashboard.html', {
+        **dados,
+        'user': request.user
+    })
+
+
+def _dados_faturamento(propriedade):
+    """Calcula as tabelas e gráficos do faturamento (guardados em cache por propriedade)"""
+    return _montar_faturamento(propriedade, carregar_dados(propriedade))
+
+
+async def _dados_faturamento_async(propriedade):
+    return _montar_faturamento(propriedade, await carregar_dados_async(propriedade))
+
+
+@trecho('faturamento.montar')
+def _montar_faturamento(propriedade, dados_projecao):
+    from decimal import Decimal
     
-    # Processa formulário de Valor da @
-    valor_arroba_por_lote = {}
-    if request.method == 'POST' and 'calcular_faturamento_valor' in request.POST:
-        # Capturar aba ativa do POST
-        active_tab = request.POST.get('active_tab', 'faturamento')
-        for lote in lotes:
-            valor_key = f'valor_arroba_lote_{lote.id}'
-            if valor_key in request.POST:
-                valor_str = request.POST[valor_key].strip()
-                # Verificar se o valor não está vazio
-                if valor_str:
-                    try:
-                        valor_arroba = Decimal(valor_str)
-                        if valor_arroba > 0:
-                            valor_arroba_por_lote[lote.id] = valor_arroba
-                            # Salvar o último valor da @ usado no lote
-                            lote.ultimo_valor_arroba = valor_arroba
-                            lote.save(update_fields=['ultimo_valor_arroba', 'data_atualizacao'])
-                    except (ValueError, TypeError, Exception):
-                        # Ignorar valores inválidos
-                        pass
-        # Redirecionar para manter a aba ativa
-        from django.urls import reverse
-        redirect_url = reverse('faturamento')
-        redirect_url += f'?tab={active_tab}'
-        return redirect(redirect_url)
+    # Lotes com os GMDs e valores da @ salvos pelos formulários
+    lotes = dados_projecao.lotes
+    gmd_por_lote = {}
+    for lote in lotes:
+        if lote.ultimo_gmd_usado:
+            gmd_por_lote[lote.id] = lote.ultimo_gmd_usado
     
-    # Capturar aba ativa do GET (para requisições normais)
-    active_tab = request.GET.get('tab', 'gmd')
+    # Último rendimento salvo na propriedade
+    rendimento_percentual = propriedade.ultimo_rendimento_carcaca or None
     
-    # Se não houver GMD preenchido no POST, buscar os valores salvos do banco
-    if len(gmd_por_lote) == 0:
-        # Recarregar lotes do banco para garantir valores atualizados
-        lotes = Lote.objects.filter(propriedade=propriedade).prefetch_related('projecoes_ganho').order_by('nome')
-        # Buscar GMDs salvos dos lotes
-        for lote in lotes:
-            if lote.ultimo_gmd_usado:
-                gmd_por_lote[lote.id] = lote.ultimo_gmd_usado
+    lotes_com_projecao = {lote.id for lote in lotes if dados_projecao.tem_projecao(lote.id)}
     
-    # Se não houver GMD preenchido, usar os GMDs das projeções existentes
+    # Se não houver GMD preenchido, usar os GMDs das projeções existentes;
+    # caso contrário cada lote usa um GMD fixo (o preenchido ou o da primeira projeção)
     usar_gmd_projecoes = len(gmd_por_lote) == 0
+    gmd_fixo_por_lote = {}
+    if not usar_gmd_projecoes:
+        for lote_id in lotes_com_projecao:
+            gmd_fixo_por_lote[lote_id] = gmd_por_lote.get(lote_id) or dados_projecao.primeiro_gmd(lote_id)
     
-    # Coletar todos os meses/anos únicos de todas as projeções
-    meses_unicos = set()
-    for lote in lotes:
-        for projecao in lote.projecoes_ganho.all():
-            meses_unicos.add((projecao.ano, projecao.mes, projecao.get_mes_display()))
+    matriz = projetar(dados_projecao, gmd_por_lote=gmd_fixo_por_lote)
     
-    # Ordenar meses
-    meses_ordenados = sorted(meses_unicos, key=lambda x: (x[0], x[1]))
+    # Todos os meses/anos das projeções, ordenados
+    meses_ordenados = [(ano, mes, MESES_NOMES[mes]) for ano, mes in matriz.chaves]
     
     # Preparar dados para as tabelas
     tabela_ganho = []  # Ganho de peso por mês (GMD * dias)
@@ -822,86 +741,18 @@ def faturamento_view(request):
         '#EC4899', '#06B6D4', '#84CC16', '#F97316', '#6366F1'
     ]
     
-    gmd_usado = None  # Para exibir o GMD usado na tabela
-    
-    for idx, lote in enumerate(lotes):
-        if not lote.projecoes_ganho.exists():
-            continue
-        
-        peso_inicial = Decimal(str(lote.peso_kg))
-        
-        # Determinar GMD a usar
-        if usar_gmd_projecoes:
-            # Usar o primeiro GMD encontrado nas projeções (ou média)
-            projecoes_lote = lote.projecoes_ganho.all().order_by('ano', 'mes')
-            if projecoes_lote.exists():
-                # Usar o GMD da primeira projeção como referência
-                gmd_usado = Decimal(str(projecoes_lote.first().gmd_kg))
-            else:
-                continue
-        else:
-            # Usar GMD preenchido no formulário
-            if lote.id in gmd_por_lote:
-                gmd_usado = gmd_por_lote[lote.id]
-            else:
-                # Se não houver GMD para este lote, usar das projeções
-                projecoes_lote = lote.projecoes_ganho.all().order_by('ano', 'mes')
-                if projecoes_lote.exists():
-                    gmd_usado = Decimal(str(projecoes_lote.first().gmd_kg))
-                else:
-                    continue
-        
-        # Dados para a linha do lote - Ganho de Peso
-        linha_ganho = {
-            'lote_nome': lote.nome,
-            'peso_entrada': float(peso_inicial),
-            'ganhos_por_mes': {}
-        }
-        
-        # Dados para a linha do lote - Evolução do Peso
-        linha_evolucao = {
-            'lote_nome': lote.nome,
-            'peso_entrada': float(peso_inicial),
-            'pesos_por_mes': {}
-        }
-        
-        # Agrupar projeções por ano
-        projecoes_por_ano = {}
-        for projecao in lote.projecoes_ganho.all().order_by('ano', 'mes'):
-            if projecao.ano not in projecoes_por_ano:
-                projecoes_por_ano[projecao.ano] = []
-            projecoes_por_ano[projecao.ano].append(projecao)
-        
-        # Calcular ganhos e evolução
-        peso_acumulado = peso_inicial
-        
-        for ano, projecoes in sorted(projecoes_por_ano.items()):
-            for projecao in sorted(projecoes, key=lambda x: x.mes):
-                # Calcular dias do mês
-                dias_mes = monthrange(ano, projecao.mes)[1]
-                
-                # Calcular ganho do mês: GMD * dias (usar GMD preenchido ou da projeção)
-                if usar_gmd_projecoes:
-                    gmd_mes = Decimal(str(projecao.gmd_kg))
-                else:
-                    gmd_mes = gmd_usado
-                
-                ganho_mes = gmd_mes * Decimal(dias_mes)
-                
-                # Peso acumulado = peso anterior + ganho do mês
-                peso_acumulado = peso_acumulado + ganho_mes
-                
-                # Chave para identificar o mês
-                chave_mes = (ano, projecao.mes)
-                
-                # Armazenar ganho do mês
-                linha_ganho['ganhos_por_mes'][chave_mes] = float(ganho_mes)
-                
-                # Armazenar peso acumulado
-                linha_evolucao['pesos_por_mes'][chave_mes] = float(peso_acumulado)
-        
-        tabela_ganho.append(linha_ganho)
-        tabela_evolucao.append(linha_evolucao)
+    for linha in matriz:
+        peso_inicial = float(linha.peso_inicial)
+        tabela_ganho.append({
+            'lote_nome': linha.lote.nome,
+            'peso_entrada': peso_inicial,
+            'ganhos_por_mes': {mes.chave: float(mes.ganho) for mes in linha.meses}
+        })
+        tabela_evolucao.append({
+            'lote_nome': linha.lote.nome,
+            'peso_entrada': peso_inicial,
+            'pesos_por_mes': {mes.chave: float(mes.peso_saida) for mes in linha.meses}
+        })
     
     # Preparar dados dos gráficos após processar todos os lotes
     # Criar labels únicos baseados em todos os meses ordenados
@@ -956,7 +807,7 @@ def faturamento_view(request):
     meses_dados = []
     for mes_ord in meses_ordenados:
         ano, mes_num, mes_nome = mes_ord
-        dias_mes = monthrange(ano, mes_num)[1]
+        dias_mes = dias_no_mes(ano, mes_num)
         meses_dados.append({
             'ano': ano,
             'mes': mes_num,
@@ -971,12 +822,8 @@ def faturamento_view(request):
     if gmd_por_lote:
         gmd_display = float(list(gmd_por_lote.values())[0])
     elif tabela_ganho:
-        # Pegar o primeiro GMD calculado
-        primeiro_lote = lotes.filter(projecoes_ganho__isnull=False).first()
-        if primeiro_lote:
-            primeira_projecao = primeiro_lote.projecoes_ganho.all().order_by('ano', 'mes').first()
-            if primeira_projecao:
-                gmd_display = float(primeira_projecao.gmd_kg)
+        # Pegar o GMD da primeira projeção do primeiro lote com projeções
+        gmd_display = float(dados_projecao.primeiro_gmd(matriz.linhas[0].lote.id))
     
     # Preparar GMDs salvos para pré-preencher o formulário
     gmd_salvos = {}
@@ -1029,15 +876,11 @@ def faturamento_view(request):
         for linha_rendimento in tabela_rendimento:
             lote_id = linha_rendimento.get('lote_id')
             if lote_id:
-                # Buscar valor da @ (do formulário ou salvo)
+                # Buscar valor da @ salvo no lote
                 valor_arroba = None
-                if lote_id in valor_arroba_por_lote:
-                    valor_arroba = valor_arroba_por_lote[lote_id]
-                else:
-                    # Usar valor salvo se existir
-                    lote_obj = lotes_dict.get(linha_rendimento['lote_nome'])
-                    if lote_obj and lote_obj.ultimo_valor_arroba:
-                        valor_arroba = lote_obj.ultimo_valor_arroba
+                lote_obj = lotes_dict.get(linha_rendimento['lote_nome'])
+                if lote_obj and lote_obj.ultimo_valor_arroba:
+                    valor_arroba = lote_obj.ultimo_valor_arroba
                 
                 if valor_arroba:
                     # Calcular faturamento: valor_arroba * total_rendimento
@@ -1055,8 +898,9 @@ def faturamento_view(request):
                 if lote_obj and lote_obj.ultimo_valor_arroba:
                     valor_arroba_salvos[lote_id] = float(lote_obj.ultimo_valor_arroba)
     
-    return render(request, 'faturamento.html', {
+    return {
         'lotes': lotes,
+        'lotes_com_projecao': lotes_com_projecao,
         'tabela_ganho': tabela_ganho,
         'tabela_evolucao': tabela_evolucao,
         'meses_dados': meses_dados,
@@ -1066,172 +910,237 @@ def faturamento_view(request):
         'tabela_rendimento': tabela_rendimento,
         'tabela_faturamento': tabela_faturamento,
         'valor_arroba_salvos': valor_arroba_salvos,
-        'chart_data_evolucao_json': json.dumps(chart_data_evolucao),
-        'chart_data_ganho_json': json.dumps(chart_data_ganho),
+        'graficos': {'faturamento-evolucao': chart_data_evolucao, 'faturamento-ganho': chart_data_ganho},
+    }
+
+
+def _salvar_campo_lotes(request, propriedade, lotes, campo, prefixo):
+    """
+    Grava o valor postado em ``{prefixo}_{lote.id}`` no campo de cada lote com
+    um único bulk_update, na mesma transação. Valores vazios ou zerados são
+    ignorados e os inválidos, informados ao usuário.
+    """
+    leitor = LeitorGrade(request.POST)
+    campo_modelo = Lote._meta.get_field(campo)
+    agora = timezone.now()
+    alterados = []
+    for lote in lotes:
+        valor = leitor.valor(f'{prefixo}_{lote.id}', campo_modelo, lote.nome)
+        if valor is not None and valor > 0:
+            setattr(lote, campo, valor)
+            # bulk_update não aplica o auto_now
+            lote.data_atualizacao = agora
+            alterados.append(lote)
+    
+    with transaction.atomic():
+        Lote.objects.bulk_update(alterados, [campo, 'data_atualizacao'], batch_size=500)
+        if alterados:
+            # Esses campos não entram no livro mensal, só no cache dos dashboards
+            agendar_recalculo(propriedade.id)
+    
+    if leitor.erros:
+        messages.error(request, leitor.mensagem_erros())
+    return len(alterados)
+
+
+@login_required
+async def faturamento_view(request):
+    """View para exibir planilha de faturamento com ganho de peso e evolução"""
+    propriedade = await _propriedade_async(request)
+    if propriedade is None:
+        messages.warning(request, 'É necessário cadastrar a propriedade primeiro.')
+        return redirect('preencher_informacoes')
+    
+    if request.method == 'POST':
+        resposta = await sync_to_async(_salvar_faturamento)(request, propriedade)
+        if resposta is not None:
+            return resposta
+    
+    # Capturar aba ativa do GET (para requisições normais)
+    active_tab = request.GET.get('tab', 'gmd')
+    
+    dados = await _dados_dashboard_async(propriedade, 'faturamento')
+    
+    return await _render_async(request, 'faturamento.html', {
+        **dados,
         'active_tab': active_tab,
         'user': request.user
     })
 
 
+def _salvar_faturamento(request, propriedade):
+    """Formulários do faturamento (GMD, rendimento de carcaça e valor da @); None se nenhum foi enviado"""
+    from decimal import Decimal
+    
+    # Busca lotes da propriedade
+    lotes = Lote.objects.filter(propriedade=propriedade).order_by('nome')
+    
+    # Processa formulário de GMD
+    if request.method == 'POST' and 'calcular_faturamento' in request.POST:
+        # Capturar aba ativa do POST
+        active_tab = request.POST.get('active_tab', 'gmd')
+        # Salvar o último GMD usado em todos os lotes de uma vez
+        _salvar_campo_lotes(request, propriedade, lotes, 'ultimo_gmd_usado', 'gmd_lote')
+        # Redirecionar para manter a aba ativa
+        from django.urls import reverse
+        redirect_url = reverse('faturamento')
+        redirect_url += f'?tab={active_tab}'
+        return redirect(redirect_url)
+    
+    # Processa formulário de Rendimento de Carcaça
+    rendimento_percentual = None
+    if request.method == 'POST' and 'calcular_rendimento' in request.POST:
+        # Capturar aba ativa do POST
+        active_tab = request.POST.get('active_tab', 'rendimento')
+        if 'rendimento_carcaca' in request.POST:
+            rendimento_str = request.POST['rendimento_carcaca'].strip()
+            # Verificar se o valor não está vazio
+            if rendimento_str:
+                try:
+                    rendimento_value = Decimal(rendimento_str)
+                    if 0 < rendimento_value <= 100:
+                        rendimento_percentual = rendimento_value
+                        # Salvar o último rendimento usado na propriedade
+                        propriedade.ultimo_rendimento_carcaca = rendimento_percentual
+                        propriedade.save(update_fields=['ultimo_rendimento_carcaca', 'data_atualizacao'])
+                except (ValueError, TypeError, Exception):
+                    # Ignorar valores inválidos
+                    pass
+        # Redirecionar para manter a aba ativa
+        from django.urls import reverse
+        redirect_url = reverse('faturamento')
+        redirect_url += f'?tab={active_tab}'
+        return redirect(redirect_url)
+    
+    # Processa formulário de Valor da @
+    if request.method == 'POST' and 'calcular_faturamento_valor' in request.POST:
+        # Capturar aba ativa do POST
+        active_tab = request.POST.get('active_tab', 'faturamento')
+        # Salvar o último valor da @ usado em todos os lotes de uma vez
+        _salvar_campo_lotes(request, propriedade, lotes, 'ultimo_valor_arroba', 'valor_arroba_lote')
+        # Redirecionar para manter a aba ativa
+        from django.urls import reverse
+        redirect_url = reverse('faturamento')
+        redirect_url += f'?tab={active_tab}'
+        return redirect(redirect_url)
+    
+    return None
+
+
 @login_required
-def fluxo_caixa_view(request):
-    """View para exibir e gerenciar o fluxo de caixa"""
-    from calendar import monthrange
+@require_safe
+def sensibilidade_view(request):
+    """
+    Grade de sensibilidade do faturamento e do ponto de equilíbrio em JSON.
+    Parâmetros (opcionais): ``gmd`` e ``arroba`` com variações sobre o GMD e o
+    valor da @ de cada lote e ``rendimento`` com variações em pontos percentuais
+    sobre o rendimento de carcaça da propriedade. Nada é gravado no banco.
+    """
+    propriedade = Propriedade.objects.filter(usuario=request.user).first()
+    if propriedade is None:
+        raise Http404('Propriedade não encontrada.')
+    
+    try:
+        variacoes_gmd = ler_variacoes(request.GET.get('gmd'), VARIACOES_GMD, 'gmd')
+        variacoes_arroba = ler_variacoes(request.GET.get('arroba'), VARIACOES_ARROBA, 'arroba')
+        variacoes_rendimento = ler_variacoes(request.GET.get('rendimento'), VARIACOES_RENDIMENTO, 'rendimento')
+    except ValueError as e:
+        return JsonResponse({'erro': str(e)}, status=400)
+    
+    # A projeção dos lotes é a parte que consulta o banco; os cenários são calculados a cada pedido
+    rendimento_base, base = obter_ou_calcular(propriedade.id, 'sensibilidade', lambda: carregar_base(propriedade))
+    try:
+        grade = grade_sensibilidade(rendimento_base, base, variacoes_gmd, variacoes_arroba, variacoes_rendimento)
+    except ValueError as e:
+        return JsonResponse({'erro': str(e)}, status=400)
+    return JsonResponse(grade)
+
+
+def _resposta_em_partes(request, partes, content_type):
+    """
+    StreamingHttpResponse que envia ``partes`` aos poucos também por ASGI: lá o
+    Django junta um iterador síncrono inteiro antes de enviar, então as partes
+    passam a ser geradas numa thread à parte e entregues por um iterador assíncrono.
+    """
+    if isinstance(request, ASGIRequest):
+        partes = _iterar_em_thread(partes)
+    return StreamingHttpResponse(partes, content_type=content_type)
+
+
+async def _iterar_em_thread(partes):
+    # As partes são só cálculo (as consultas já foram feitas), sem precisar da thread da conexão
+    partes = iter(partes)
+    fim = object()
+    proxima = sync_to_async(next, thread_sensitive=False)
+    while (parte := await proxima(partes, fim)) is not fim:
+        yield parte
+
+
+@login_required
+@require_safe
+def simulacao_view(request):
+    """
+    Simulação de Monte Carlo do resultado, da rentabilidade e do ponto de
+    equilíbrio, transmitida em JSON por linha (NDJSON): percentis parciais da
+    propriedade a cada bloco de cenários e, na última linha, os percentis finais
+    da propriedade e de cada lote. Os parâmetros das distribuições e a semente
+    vêm da query string (ver ``simulacao.Parametros``).
+    """
     from decimal import Decimal
-    from datetime import datetime
+    import json
+    
+    propriedade = Propriedade.objects.filter(usuario=request.user).first()
+    if propriedade is None:
+        raise Http404('Propriedade não encontrada.')
     
     try:
-        propriedade = Propriedade.objects.get(usuario=request.user)
-    except (Propriedade.DoesNotExist, TypeError, ValueError):
-        propriedade = None
+        parametros = Parametros.do_request(request.GET)
+    except ValueError as e:
+        return JsonResponse({'erro': str(e)}, status=400)
+    
+    # Valor da @ para os lotes que não têm um salvo (opcional)
+    valor_arroba_padrao = request.GET.get('valor_arroba', '').strip().replace(',', '.') or None
+    if valor_arroba_padrao is not None:
+        try:
+            valor_arroba_padrao = Decimal(valor_arroba_padrao)
+        except ArithmeticError:
+            valor_arroba_padrao = None
+        if valor_arroba_padrao is None or not valor_arroba_padrao.is_finite() or valor_arroba_padrao <= 0:
+            return JsonResponse({'erro': 'Valor da @ inválido.'}, status=400)
+    
+    # Todas as consultas acontecem aqui; a resposta é só cálculo
+    rendimento, custos_fixos, lotes, sem_preco = carregar_lotes(propriedade, valor_arroba_padrao)
+    
+    def linhas():
+        yield json.dumps({'tipo': 'inicio', 'lotes': len(lotes), 'lotes_sem_valor_arroba': sem_preco}) + '\n'
+        for parte in simular(rendimento, custos_fixos, lotes, parametros):
+            yield json.dumps(parte) + '\n'
+    
+    response = _resposta_em_partes(request, linhas(), 'application/x-ndjson')
+    response['X-Accel-Buffering'] = 'no'
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+
+@login_required
+async def fluxo_caixa_view(request):
+    """View para exibir e gerenciar o fluxo de caixa"""
+    from datetime import datetime
+    
+    propriedade = await _propriedade_async(request)
+    if propriedade is None:
         messages.warning(request, 'É necessário cadastrar a propriedade primeiro.')
         return redirect('preencher_informacoes')
     
-    # Processar formulários de custos fixos e receitas
     if request.method == 'POST':
-        # Processar custos fixos
-        if 'salvar_custos_fixos' in request.POST:
-            ano = int(request.POST.get('ano', datetime.now().year))
-            for tipo in CustoFixo.TIPO_CHOICES:
-                tipo_key = tipo[0]
-                for mes_num in range(1, 13):
-                    campo_key = f'custo_fixo_{tipo_key}_{mes_num}'
-                    if campo_key in request.POST:
-                        valor_str = request.POST[campo_key].strip()
-                        if valor_str:
-                            try:
-                                valor = Decimal(valor_str)
-                                if valor >= 0:
-                                    custo_fixo, created = CustoFixo.objects.update_or_create(
-                                        propriedade=propriedade,
-                                        tipo=tipo_key,
-                                        mes=mes_num,
-                                        ano=ano,
-                                        defaults={'valor': valor}
-                                    )
-                            except (ValueError, TypeError, Exception):
-                                pass
-        
-        # Processar receitas
-        if 'salvar_receitas' in request.POST:
-            ano = int(request.POST.get('ano', datetime.now().year))
-            for tipo in Receita.TIPO_CHOICES:
-                tipo_key = tipo[0]
-                for mes_num in range(1, 13):
-                    campo_key = f'receita_{tipo_key}_{mes_num}'
-                    if campo_key in request.POST:
-                        valor_str = request.POST[campo_key].strip()
-                        if valor_str:
-                            try:
-                                valor = Decimal(valor_str)
-                                if valor >= 0:
-                                    receita, created = Receita.objects.update_or_create(
-                                        propriedade=propriedade,
-                                        tipo=tipo_key,
-                                        mes=mes_num,
-                                        ano=ano,
-                                        defaults={'valor': valor}
-                                    )
-                            except (ValueError, TypeError, Exception):
-                                pass
-        
-        messages.success(request, 'Dados salvos com sucesso!')
-        return redirect('fluxo_caixa')
+        return await sync_to_async(_salvar_fluxo_caixa)(request, propriedade)
     
     # Ano para exibição (padrão: ano atual)
     ano_atual = datetime.now().year
     ano = int(request.GET.get('ano', ano_atual))
     
-    # Buscar lotes para calcular investimentos
-    lotes = Lote.objects.filter(propriedade=propriedade)
-    investimento_animais = sum(lote.valor_compra for lote in lotes if lote.valor_compra)
-    
-    # Buscar dados nutricionais (totais mensais)
-    gastos_nutricionais = GastoNutricional.objects.filter(
-        lote__propriedade=propriedade,
-        ano=ano
-    ).select_related('lote')
-    
-    # Calcular totais mensais de alimentação
-    alimentacao_mensal = {}
-    for mes_num in range(1, 13):
-        total_mes = Decimal('0')
-        for gasto in gastos_nutricionais.filter(mes=mes_num):
-            dias_mes = monthrange(ano, mes_num)[1]
-            gasto_mensal = gasto.gasto_diario * Decimal(dias_mes)
-            gasto_total_lote = gasto_mensal * Decimal(str(gasto.lote.quantidade))
-            total_mes += gasto_total_lote
-        alimentacao_mensal[mes_num] = float(total_mes)
-    
-    # Buscar receitas cadastradas
-    receitas_cadastradas = Receita.objects.filter(propriedade=propriedade, ano=ano)
-    receitas_por_mes = {}
-    for mes_num in range(1, 13):
-        receitas_por_mes[mes_num] = {}
-        for tipo in Receita.TIPO_CHOICES:
-            receita = receitas_cadastradas.filter(mes=mes_num, tipo=tipo[0]).first()
-            receitas_por_mes[mes_num][tipo[0]] = float(receita.valor) if receita else 0.0
-    
-    # Calcular total de receitas por mês
-    total_receitas_mensal = {}
-    for mes_num in range(1, 13):
-        total = sum(receitas_por_mes[mes_num].values())
-        total_receitas_mensal[mes_num] = total
-    
-    # Buscar custos fixos
-    custos_fixos_cadastrados = CustoFixo.objects.filter(propriedade=propriedade, ano=ano)
-    custos_fixos_por_mes = {}
-    for mes_num in range(1, 13):
-        custos_fixos_por_mes[mes_num] = {}
-        total_custo_fixo = Decimal('0')
-        for tipo in CustoFixo.TIPO_CHOICES:
-            custo = custos_fixos_cadastrados.filter(mes=mes_num, tipo=tipo[0]).first()
-            valor = float(custo.valor) if custo else 0.0
-            custos_fixos_por_mes[mes_num][tipo[0]] = valor
-            total_custo_fixo += Decimal(str(valor))
-        custos_fixos_por_mes[mes_num]['total'] = float(total_custo_fixo)
-    
-    # Calcular custos variáveis
-    custos_variaveis_por_mes = {}
-    for mes_num in range(1, 13):
-        alimentacao = Decimal(str(alimentacao_mensal.get(mes_num, 0)))
-        sanitario_med = alimentacao * Decimal('0.01')  # 1% da alimentação
-        receita_mes = Decimal(str(total_receitas_mensal.get(mes_num, 0)))
-        servicos_outros = receita_mes * Decimal('0.01')  # 1% da receita
-        impostos = receita_mes * Decimal('0.015')  # 1.5% da receita
-        
-        total_variavel = alimentacao + sanitario_med + servicos_outros + impostos
-        
-        custos_variaveis_por_mes[mes_num] = {
-            'alimentacao': float(alimentacao),
-            'sanitario_med': float(sanitario_med),
-            'servicos_outros': float(servicos_outros),
-            'impostos': float(impostos),
-            'total': float(total_variavel)
-        }
-    
-    # Calcular fluxo de caixa livre e acumulado
-    fluxo_livre = {}
-    fluxo_acum = Decimal('0')
-    fluxo_acumulado = {}
-    
-    # Investimento inicial (coluna 0)
-    fluxo_acum = Decimal(str(investimento_animais)) * Decimal('-1')
-    fluxo_acumulado[0] = float(fluxo_acum)
-    
-    # Para cada mês
-    for mes_num in range(1, 13):
-        receitas = Decimal(str(total_receitas_mensal.get(mes_num, 0)))
-        custos_fixos = Decimal(str(custos_fixos_por_mes[mes_num].get('total', 0)))
-        custos_variaveis = Decimal(str(custos_variaveis_por_mes[mes_num].get('total', 0)))
-        
-        # Fluxo livre = Receitas - Custos Fixos - Custos Variáveis
-        fluxo_livre_mes = receitas - custos_fixos - custos_variaveis
-        fluxo_livre[mes_num] = float(fluxo_livre_mes)
-        
-        # Fluxo acumulado
-        fluxo_acum += fluxo_livre_mes
-        fluxo_acumulado[mes_num] = float(fluxo_acum)
+    # Receitas, custos e fluxo do ano com consultas agregadas
+    fluxo = await _dados_dashboard_async(propriedade, 'fluxo_caixa', ano)
     
     # Preparar dados para o template
     meses_abrev = {
@@ -1248,106 +1157,71 @@ def fluxo_caixa_view(request):
     meses_lista = list(range(1, 12))  # 1 a 11 (janeiro a novembro)
     anos_lista = list(range(2024, 2029))  # 2024 a 2028
     
-    # Calcular resumo anual
-    total_custos_fixos = Decimal('0')
-    total_custos_variaveis = Decimal('0')
-    total_faturamento = Decimal('0')
-    
-    for mes_num in range(1, 12):  # Janeiro a Novembro
-        total_custos_fixos += Decimal(str(custos_fixos_por_mes[mes_num].get('total', 0)))
-        total_custos_variaveis += Decimal(str(custos_variaveis_por_mes[mes_num].get('total', 0)))
-        total_faturamento += Decimal(str(total_receitas_mensal.get(mes_num, 0)))
-    
-    # Calcular valores do resumo
-    investimentos_total = Decimal(str(investimento_animais))
-    desembolso = investimentos_total + total_custos_fixos + total_custos_variaveis
-    resultado = total_faturamento - desembolso
-    
-    # Calcular percentuais
-    rentabilidade = (resultado / investimentos_total * Decimal('100')) if investimentos_total > 0 else Decimal('0')
-    lucratividade = (resultado / total_faturamento * Decimal('100')) if total_faturamento > 0 else Decimal('0')
-    
-    resumo = {
-        'investimentos': float(investimentos_total),
-        'custos_fixos': float(total_custos_fixos),
-        'custos_variaveis': float(total_custos_variaveis),
-        'desembolso': float(desembolso),
-        'faturamento': float(total_faturamento),
-        'resultado': float(resultado),
-        'rentabilidade': float(rentabilidade),
-        'lucratividade': float(lucratividade)
-    }
-    
-    return render(request, 'fluxo_caixa.html', {
+    return await _render_async(request, 'fluxo_caixa.html', {
         'propriedade': propriedade,
         'ano': ano,
         'ano_atual': ano_atual,
         'anos_lista': anos_lista,
         'meses_lista': meses_lista,
-        'investimento_animais': float(investimento_animais),
-        'alimentacao_mensal': alimentacao_mensal,
-        'receitas_por_mes': receitas_por_mes,
-        'total_receitas_mensal': total_receitas_mensal,
-        'custos_fixos_por_mes': custos_fixos_por_mes,
-        'custos_variaveis_por_mes': custos_variaveis_por_mes,
-        'fluxo_livre': fluxo_livre,
-        'fluxo_acumulado': fluxo_acumulado,
+        **fluxo,
         'meses_abrev': meses_abrev,
         'meses_nomes': meses_nomes,
         'tipos_custo_fixo': CustoFixo.TIPO_CHOICES,
         'tipos_receita': Receita.TIPO_CHOICES,
-        'resumo': resumo,
         'user': request.user
     })
 
 
-@login_required
-def ponto_equilibrio_view(request):
-    """View para exibir e calcular o ponto de equilíbrio por lote e mês"""
-    from calendar import monthrange
-    from decimal import Decimal
+def _salvar_fluxo_caixa(request, propriedade):
+    """Formulários de custos fixos e receitas do fluxo de caixa"""
     from datetime import datetime
     
-    try:
-        propriedade = Propriedade.objects.get(usuario=request.user)
-    except (Propriedade.DoesNotExist, TypeError, ValueError):
-        propriedade = None
-        messages.warning(request, 'É necessário cadastrar a propriedade primeiro.')
-        return redirect('preencher_informacoes')
-    
-    # Processar formulário de período
-    if request.method == 'POST' and 'salvar_periodo' in request.POST:
-        ano = int(request.POST.get('ano', datetime.now().year))
-        for lote in Lote.objects.filter(propriedade=propriedade):
-            for mes_num in range(1, 12):  # Janeiro a Novembro
-                # Processar período personalizado
-                campo_periodo_key = f'periodo_lote_{lote.id}_mes_{mes_num}'
-                if campo_periodo_key in request.POST:
-                    periodo_str = request.POST[campo_periodo_key].strip()
-                    if periodo_str:
-                        try:
-                            periodo_dias = int(periodo_str)
-                            if periodo_dias > 0:
-                                periodo_personalizado, created = PeriodoPersonalizado.objects.update_or_create(
-                                    lote=lote,
-                                    mes=mes_num,
-                                    ano=ano,
-                                    defaults={'periodo_dias': periodo_dias}
-                                )
-                        except (ValueError, TypeError, Exception):
-                            pass
-        messages.success(request, 'Período salvo com sucesso!')
-        redirect_url = f'{request.path}?ano={ano}'
-        return redirect(redirect_url)
+    ano = int(request.POST.get('ano', datetime.now().year))
+    leitor = LeitorGrade(request.POST)
+    custos_fixos = []
+    receitas = []
+    if 'salvar_custos_fixos' in request.POST:
+        custos_fixos = ler_grade_por_tipo(leitor, CustoFixo, 'custo_fixo', 'valor', propriedade=propriedade, ano=ano)
+    if 'salvar_receitas' in request.POST:
+        receitas = ler_grade_por_tipo(leitor, Receita, 'receita', 'valor', propriedade=propriedade, ano=ano)
+    
+    # Um INSERT ... ON CONFLICT por modelo, na mesma transação
+    with transaction.atomic():
+        salvos = salvar_grade(CustoFixo, custos_fixos, ['propriedade', 'tipo', 'mes', 'ano'], ['valor'])
+        salvos += salvar_grade(Receita, receitas, ['propriedade', 'tipo', 'mes', 'ano'], ['valor'])
+        if salvos:
+            agendar_recalculo(propriedade.id)
+    
+    if leitor.erros:
+        messages.error(request, leitor.mensagem_erros())
+    if salvos:
+        messages.success(request, 'Dados salvos com sucesso!')
+    else:
+        messages.warning(request, 'Nenhum dado foi salvo. Verifique os valores informados.')
+    return redirect('fluxo_caixa')
+
+
+def _dados_ponto_equilibrio(propriedade, ano):
+    """Calcula o ponto de equilíbrio dos lotes no ano (guardado em cache por propriedade)"""
+    dados_projecao = carregar_dados(propriedade, com_periodos=True, com_gastos=True)
+    return _montar_ponto_equilibrio(propriedade, ano, dados_projecao)
+
+
+async def _dados_ponto_equilibrio_async(propriedade, ano):
+    dados_projecao = await carregar_dados_async(propriedade, com_periodos=True, com_gastos=True)
+    return _montar_ponto_equilibrio(propriedade, ano, dados_projecao)
+
+
+@trecho('ponto_equilibrio.montar')
+def _montar_ponto_equilibrio(propriedade, ano, dados_projecao):
+    from decimal import Decimal
     
-    # Ano para exibição
-    ano_atual = datetime.now().year
-    ano = int(request.GET.get('ano', ano_atual))
+    # Projetar a linha do tempo inteira de cada lote (lotes, projeções, períodos e gastos
+    # carregados de uma vez), usando o período personalizado no lugar dos dias do mês
+    matriz = projetar(dados_projecao, usar_periodos=True)
     
-    # Buscar lotes com projeções
-    lotes = Lote.objects.filter(propriedade=propriedade).prefetch_related(
-        'projecoes_ganho', 'gastos_nutricionais', 'periodos_personalizados'
-    ).order_by('nome')
+    # Janela exibida: janeiro a dezembro do ano
+    inicio, fim = (ano, 1), (ano, 12)
     
     # Buscar rendimento da propriedade
     rendimento_percentual = propriedade.ultimo_rendimento_carcaca or Decimal('50')
@@ -1355,9 +1229,8 @@ def ponto_equilibrio_view(request):
     # Preparar dados para cada lote
     dados_lotes = []
     
-    for lote in lotes:
-        if not lote.projecoes_ganho.exists():
-            continue
+    for linha in matriz:
+        lote = linha.lote
         
         # Dados do lote
         lote_data = {
@@ -1367,63 +1240,31 @@ def ponto_equilibrio_view(request):
             'meses': {}
         }
         
-        # Peso inicial
-        peso_inicial = Decimal(str(lote.peso_kg))
-        peso_entrada_arroba = Decimal(str(lote.peso_arroba))
-        
-        # Investimento inicial em animais
+        # Peso inicial em arroba e investimento inicial em animais
+        peso_entrada_arroba_atual = Decimal(str(lote.peso_arroba))
         investimento_animais_inicial = Decimal(str(lote.valor_compra))
         
-        # Agrupar projeções por ano
-        projecoes_por_ano = {}
-        for projecao in lote.projecoes_ganho.filter(ano=ano).order_by('mes'):
-            if projecao.ano not in projecoes_por_ano:
-                projecoes_por_ano[projecao.ano] = []
-            projecoes_por_ano[projecao.ano].append(projecao)
-        
-        # Calcular dados por mês
-        peso_atual = peso_inicial
-        peso_entrada_arroba_atual = peso_entrada_arroba
-        
         # Valor do animal (será atualizado a cada mês)
         valor_animal_atual = investimento_animais_inicial
         
-        for mes_num in range(1, 12):  # Janeiro a Novembro
-            # Buscar projeção para este mês
-            projecao = None
-            for proj in lote.projecoes_ganho.filter(ano=ano, mes=mes_num):
-                projecao = proj
-                break
-            
-            if not projecao:
-                continue
-            
-            # Buscar período personalizado ou usar dias do mês
-            periodo_personalizado = None
-            for periodo in lote.periodos_personalizados.filter(ano=ano, mes=mes_num):
-                periodo_personalizado = periodo
-                break
-            
-            # Calcular dias do mês (usar período personalizado se existir, senão usar dias do mês)
-            dias_mes = monthrange(ano, mes_num)[1]
-            if periodo_personalizado and periodo_personalizado.periodo_dias:
-                dias_mes = periodo_personalizado.periodo_dias
+        # Meses de anos anteriores: o peso e o valor do animal seguem da linha do tempo
+        for mes_projetado in linha.antes(inicio):
+            valor_diaria = dados_projecao.gasto_diario(lote.id, mes_projetado.ano, mes_projetado.mes) or Decimal('0')
+            valor_animal_atual += valor_diaria * Decimal(mes_projetado.dias)
+            peso_entrada_arroba_atual = mes_projetado.peso_saida / Decimal('15')
+        
+        for mes_projetado in linha.janela(inicio, fim):  # Meses do ano com projeção
+            mes_num = mes_projetado.mes
+            dias_mes = mes_projetado.dias
             
-            # Peso de entrada (kg e @)
-            peso_entrada_kg = peso_atual
+            # Peso de entrada (kg e @), ganho e peso de saída do mês
+            peso_entrada_kg = mes_projetado.peso_entrada
             peso_entrada_arroba = peso_entrada_arroba_atual
-            
-            # Ganho do mês
-            ganho_mes = Decimal(str(projecao.gmd_kg)) * Decimal(dias_mes)
-            
-            # Peso de saída
-            peso_saida_kg = peso_atual + ganho_mes
+            ganho_mes = mes_projetado.ganho
+            peso_saida_kg = mes_projetado.peso_saida
             
             # Buscar gasto nutricional do mês (valor da diária)
-            valor_diaria = Decimal('0')
-            for gasto in lote.gastos_nutricionais.filter(ano=ano, mes=mes_num):
-                valor_diaria = gasto.gasto_diario
-                break
+            valor_diaria = dados_projecao.gasto_diario(lote.id, ano, mes_num) or Decimal('0')
             
             # Valor do animal (atualizado a cada mês com o valor final do mês anterior)
             valor_animal = valor_animal_atual
@@ -1450,7 +1291,7 @@ def ponto_equilibrio_view(request):
                 'peso_entrada_arroba': float(peso_entrada_arroba),
                 'peso_saida_kg': float(peso_saida_kg),
                 'peso_saida_arroba': float(peso_saida_arroba),
-                'ganho_peso_dia': float(projecao.gmd_kg),
+                'ganho_peso_dia': float(mes_projetado.gmd),
                 'custo_diaria': float(valor_diaria),
                 'gasto_nutricional_mes': float(gasto_nutricional_mes),
                 'valor_animal': float(valor_animal),
@@ -1459,11 +1300,10 @@ def ponto_equilibrio_view(request):
                 'rendimento_percentual': float(rendimento_percentual),
                 'ponto_equilibrio': float(ponto_equilibrio),
                 'dias_mes': dias_mes,
-                'periodo_personalizado': periodo_personalizado.periodo_dias if periodo_personalizado and periodo_personalizado.periodo_dias else None
+                'periodo_personalizado': mes_projetado.periodo_personalizado
             }
             
             # Atualizar para próximo mês
-            peso_atual = peso_saida_kg
             peso_entrada_arroba_atual = peso_saida_kg / Decimal('15')
             # Atualizar valor do animal para o próximo mês (será o valor final deste mês)
             valor_animal_atual = valor_final
@@ -1471,21 +1311,43 @@ def ponto_equilibrio_view(request):
         if lote_data['meses']:
             dados_lotes.append(lote_data)
     
+    return {
+        'dados_lotes': dados_lotes,
+        'rendimento_percentual': float(rendimento_percentual),
+    }
+
+
+@login_required
+async def ponto_equilibrio_view(request):
+    """View para exibir e calcular o ponto de equilíbrio por lote e mês"""
+    from datetime import datetime
+    
+    propriedade = await _propriedade_async(request)
+    if propriedade is None:
+        messages.warning(request, 'É necessário cadastrar a propriedade primeiro.')
+        return redirect('preencher_informacoes')
+    
+    if request.method == 'POST' and 'salvar_periodo' in request.POST:
+        return await sync_to_async(_salvar_periodos)(request, propriedade)
+    
+    # Ano para exibição
+    ano_atual = datetime.now().year
+    ano = int(request.GET.get('ano', ano_atual))
+    
+    dados = await _dados_dashboard_async(propriedade, 'ponto_equilibrio', ano)
+    
     # Meses abreviados
     meses_abrev = {
         1: 'jan', 2: 'fev', 3: 'mar', 4: 'abr', 5: 'mai', 6: 'jun',
-        7: 'jul', 8: 'ago', 9: 'set', 10: 'out', 11: 'nov'
+        7: 'jul', 8: 'ago', 9: 'set', 10: 'out', 11: 'nov', 12: 'dez'
     }
     
-    meses_nomes = {
-        1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril', 5: 'Maio', 6: 'Junho',
-        7: 'Julho', 8: 'Agosto', 9: 'Setembro', 10: 'Outubro', 11: 'Novembro'
-    }
+    meses_nomes = MESES_NOMES
     
-    meses_lista = list(range(1, 12))
+    meses_lista = list(range(1, 13))
     anos_lista = list(range(2024, 2029))
     
-    return render(request, 'ponto_equilibrio.html', {
+    return await _render_async(request, 'ponto_equilibrio.html', {
         'propriedade': propriedade,
         'ano': ano,
         'ano_atual': ano_atual,
@@ -1493,7 +1355,298 @@ def ponto_equilibrio_view(request):
         'meses_lista': meses_lista,
         'meses_abrev': meses_abrev,
         'meses_nomes': meses_nomes,
-        'dados_lotes': dados_lotes,
-        'rendimento_percentual': float(rendimento_percentual),
+        **dados,
+        'user': request.user
+    })
+
+
+def _salvar_periodos(request, propriedade):
+    """Formulário de período (grade lote × mês, janeiro a dezembro)"""
+    from datetime import datetime
+    
+    ano = int(request.POST.get('ano', datetime.now().year))
+    leitor = LeitorGrade(request.POST)
+    campo_periodo = PeriodoPersonalizado._meta.get_field('periodo_dias')
+    periodos = []
+    meses_limpos_por_lote = {}
+    for lote_id, lote_nome in Lote.objects.filter(propriedade=propriedade).values_list('id', 'nome'):
+        for mes_num in range(1, 13):
+            campo_periodo_key = f'periodo_lote_{lote_id}_mes_{mes_num}'
+            periodo_dias = leitor.valor(campo_periodo_key, campo_periodo, f'{lote_nome} ({MESES_NOMES[mes_num]})')
+            if periodo_dias is not None:
+                periodos.append(PeriodoPersonalizado(lote_id=lote_id, mes=mes_num, ano=ano, periodo_dias=periodo_dias))
+            elif leitor.vazia(campo_periodo_key):
+                meses_limpos_por_lote.setdefault(lote_id, []).append(mes_num)
+    
+    # Um INSERT ... ON CONFLICT para as células preenchidas e um DELETE para as esvaziadas
+    with transaction.atomic():
+        salvos = salvar_grade(PeriodoPersonalizado, periodos, ['lote', 'mes', 'ano'], ['periodo_dias'])
+        if meses_limpos_por_lote:
+            limpos = Q()
+            for lote_id, meses in meses_limpos_por_lote.items():
+                limpos |= Q(lote_id=lote_id, mes__in=meses)
+            salvos += apagar_celulas(PeriodoPersonalizado.objects.filter(limpos, ano=ano))
+        
+        lotes_alterados = {periodo.lote_id for periodo in periodos} | set(meses_limpos_por_lote)
+        if lotes_alterados:
+            meses_alterados = [periodo.mes for periodo in periodos]
+            meses_alterados += [mes for meses in meses_limpos_por_lote.values() for mes in meses]
+            agendar_recalculo(propriedade.id, lotes_alterados, desde=(ano, min(meses_alterados)))
+    
+    if leitor.erros:
+        messages.error(request, leitor.mensagem_erros())
+    if salvos:
+        messages.success(request, 'Período salvo com sucesso!')
+    else:
+        messages.warning(request, 'Nenhum dado foi salvo. Verifique os valores informados.')
+    redirect_url = f'{request.path}?ano={ano}'
+    return redirect(redirect_url)
+
+
+@login_required
+def benchmark_view(request):
+    """
+    Comparativo anônimo da propriedade com as demais: métricas do ano ao lado
+    dos percentis pré-calculados pelo comando ``calcular_benchmarks``.
+    """
+    from datetime import datetime
+    
+    try:
+        propriedade = Propriedade.objects.get(usuario=request.user)
+    except (Propriedade.DoesNotExist, TypeError, ValueError):
+        propriedade = None
+        messages.warning(request, 'É necessário cadastrar a propriedade primeiro.')
+        return redirect('preencher_informacoes')
+    
+    ano_atual = datetime.now().year
+    ano = int(request.GET.get('ano', ano_atual))
+    
+    metricas = obter_ou_calcular(propriedade.id, 'benchmark', lambda: metricas_propriedade(propriedade, ano), ano)
+    
+    return render(request, 'benchmark.html', {
+        'propriedade': propriedade,
+        'ano': ano,
+        'anos_lista': list(range(2024, 2029)),
+        'grupos': comparativo(propriedade, ano, metricas),
         'user': request.user
     })
+
+
+def _dados_fluxo_caixa(propriedade, ano):
+    """Receitas, custos e fluxo do ano com consultas agregadas"""
+    return FluxoCaixa.do_ano(propriedade, ano).contexto()
+
+
+async def _dados_fluxo_caixa_async(propriedade, ano):
+    return (await FluxoCaixa.carregar_async(propriedade, [ano]))[ano].contexto()
+
+
+# Cálculos dos dashboards (e dos gráficos, ver graficos.GRAFICOS), guardados em
+# cache e nas fotografias noturnas (ver snapshots.DASHBOARDS)
+CALCULOS_DASHBOARD = {
+    'lotes_dashboard': _dados_lotes_dashboard,
+    'nutricional_dashboard': _dados_nutricional_dashboard,
+    'faturamento': _dados_faturamento,
+    'fluxo_caixa': _dados_fluxo_caixa,
+    'ponto_equilibrio': _dados_ponto_equilibrio,
+}
+
+
+def _dados_dashboard(propriedade, nome, *partes):
+    """Dados do dashboard: do cache, da fotografia noturna se ainda valer ou calculados na hora"""
+    def calcular():
+        with trecho(f'dashboard.{nome}'):
+            return CALCULOS_DASHBOARD[nome](propriedade, *partes)
+    
+    return obter_ou_calcular(propriedade.id, nome, lambda: ler_ou_calcular(
+        propriedade, nome, calcular, *partes
+    ), *partes)
+
+
+# Os mesmos cálculos com as consultas feitas pelo ORM assíncrono (views async)
+CALCULOS_DASHBOARD_ASYNC = {
+    'lotes_dashboard': _dados_lotes_dashboard_async,
+    'nutricional_dashboard': _dados_nutricional_dashboard_async,
+    'faturamento': _dados_faturamento_async,
+    'fluxo_caixa': _dados_fluxo_caixa_async,
+    'ponto_equilibrio': _dados_ponto_equilibrio_async,
+}
+
+
+async def _dados_dashboard_async(propriedade, nome, *partes):
+    """Versão de ``_dados_dashboard`` para as views assíncronas"""
+    async def calcular():
+        with trecho(f'dashboard.{nome}'):
+            return await CALCULOS_DASHBOARD_ASYNC[nome](propriedade, *partes)
+    
+    return await obter_ou_calcular_async(propriedade.id, nome, lambda: ler_ou_calcular_async(
+        propriedade, nome, calcular, *partes
+    ), *partes)
+
+
+def _marca_grafico(request, nome):
+    """Propriedade do usuário e marca dos dados do gráfico, calculadas uma vez por requisição"""
+    if not hasattr(request, '_marca_grafico'):
+        grafico = GRAFICOS.get(nome)
+        propriedade = Propriedade.objects.filter(usuario=request.user).first() if grafico else None
+        marca = marca_dados(grafico, nome, propriedade) if propriedade else None
+        request._marca_grafico = (propriedade, marca)
+    return request._marca_grafico
+
+
+def _etag_grafico(request, nome):
+    marca = _marca_grafico(request, nome)[1]
+    return marca.etag if marca else None
+
+
+def _ultima_atualizacao_grafico(request, nome):
+    marca = _marca_grafico(request, nome)[1]
+    return marca.ultima_atualizacao if marca else None
+
+
+@login_required
+@require_safe
+@condition(etag_func=_etag_grafico, last_modified_func=_ultima_atualizacao_grafico)
+def grafico_view(request, nome):
+    """Dados de um gráfico de dashboard em JSON; responde 304 se os dados não mudaram"""
+    grafico = GRAFICOS.get(nome)
+    propriedade = _marca_grafico(request, nome)[0]
+    if grafico is None or propriedade is None:
+        raise Http404('Gráfico não encontrado.')
+    
+    dados = _dados_dashboard(propriedade, grafico.dashboard)
+    
+    response = JsonResponse(dados['graficos'][nome])
+    # O navegador pode guardar a resposta, mas deve revalidar (If-None-Match) a cada uso
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+# Exportação em XLSX: cada função recebe (request, propriedade, anos) e devolve as abas
+MAX_ANOS_EXPORTACAO = 10
+
+
+def _anos_exportacao(request):
+    """Ano (``ano``) ou intervalo de anos (``de`` e ``ate``) pedido; ValueError se inválido"""
+    from datetime import datetime
+    
+    try:
+        ano = int(request.GET.get('ano', datetime.now().year))
+        de = int(request.GET.get('de', ano))
+        ate = int(request.GET.get('ate', de))
+    except ValueError:
+        raise ValueError('Ano inválido.')
+    if ate < de:
+        raise ValueError('O ano final deve ser maior ou igual ao inicial.')
+    if ate - de >= MAX_ANOS_EXPORTACAO:
+        raise ValueError(f'Exporte no máximo {MAX_ANOS_EXPORTACAO} anos por vez.')
+    return range(de, ate + 1)
+
+
+def _exportar_fluxo_caixa(request, propriedade, anos):
+    # Quatro consultas agregadas para qualquer quantidade de anos
+    return abas_fluxo_caixa(FluxoCaixa.carregar(propriedade, anos))
+
+
+def _exportar_faturamento(request, propriedade, anos):
+    return abas_faturamento(_dados_dashboard(propriedade, 'faturamento'))
+
+
+def _exportar_ponto_equilibrio(request, propriedade, anos):
+    return abas_ponto_equilibrio({ano: _dados_dashboard(propriedade, 'ponto_equilibrio', ano) for ano in anos})
+
+
+# nome -> (função, se a tabela depende do ano)
+EXPORTACOES = {
+    'fluxo-caixa': (_exportar_fluxo_caixa, True),
+    'faturamento': (_exportar_faturamento, False),
+    'ponto-equilibrio': (_exportar_ponto_equilibrio, True),
+}
+
+
+@login_required
+@require_safe
+def exportar_view(request, nome):
+    """
+    Baixa uma tabela (fluxo de caixa, faturamento ou ponto de equilíbrio) em
+    XLSX. Os dados são calculados antes da resposta; a planilha é gerada e
+    enviada aos pedaços, linha a linha.
+    """
+    exportar, por_ano = EXPORTACOES.get(nome, (None, False))
+    propriedade = Propriedade.objects.filter(usuario=request.user).first() if exportar else None
+    if propriedade is None:
+        raise Http404('Exportação não encontrada.')
+    
+    try:
+        anos = _anos_exportacao(request)
+    except ValueError as e:
+        return HttpResponse(str(e), status=400, content_type='text/plain; charset=utf-8')
+    
+    abas = list(exportar(request, propriedade, anos))
+    nome_arquivo = nome
+    if por_ano:
+        nome_arquivo += f'-{anos[0]}' if len(anos) == 1 else f'-{anos[0]}-{anos[-1]}'
+    response = _resposta_em_partes(
+        request, gerar_xlsx(abas), 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}.xlsx"'
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+
+@staff_member_required
+@require_safe
+def perf_view(request):
+    """Tempos e queries por view medidos por este processo (ver perf.py); só para staff"""
+    from django.contrib import admin
+    
+    return render(request, 'perf.html', {
+        **admin.site.each_context(request),
+        **AGREGADOS.contexto(),
+        'assinatura_perfil': assinatura_perfil(request.user),
+        'title': 'Desempenho por view',
+    })
+
+
+@staff_member_required
+@require_http_methods(['GET', 'POST'])
+def perf_memoria_view(request):
+    """Crescimento de memória por view e pontos de alocação deste processo (ver memoria.py); só para staff"""
+    from django.contrib import admin
+    
+    if request.method == 'POST':
+        if 'referencia' in request.POST:
+            MEMORIA.marcar_referencia()
+        elif 'zerar' in request.POST:
+            MEMORIA.zerar()
+        return redirect('perf_memoria')
+    
+    return render(request, 'perf_memoria.html', {
+        **admin.site.each_context(request),
+        **MEMORIA.contexto(),
+        'monitor': settings.MEMORIA_MONITOR,
+        'alocacoes': MEMORIA.alocacoes(),
+        'title': 'Memória por view',
+    })
+
+
+def _acesso_metricas(request):
+    # Token do coletor (Authorization: Bearer ...) ou usuário staff logado
+    token = settings.METRICAS_TOKEN
+    autorizacao = request.headers.get('Authorization', '')
+    if token and autorizacao.startswith('Bearer ') and constant_time_compare(autorizacao[7:], token):
+        return True
+    return request.user.is_authenticated and request.user.is_staff
+
+
+@require_safe
+def metricas_view(request):
+    """Métricas de todos os processos no formato de texto do Prometheus (ver metricas.py)"""
+    if not _acesso_metricas(request):
+        response = HttpResponse('Não autorizado.', status=401, content_type='text/plain; charset=utf-8')
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    
+    response = HttpResponse(exposicao(coletar()), content_type='text/plain; version=0.0.4; charset=utf-8')
+    patch_cache_control(response, no_store=True)
+    return response
@@ -0,0 +1,350 @@
+"""
+Leitura e escrita de planilhas XLSX em streaming, só com a biblioteca padrão.
+
+O arquivo é um zip de XMLs. Na leitura, cada aba é percorrida com
+``iterparse`` e as linhas são entregues uma a uma e descartadas em seguida,
+então a memória não cresce com o tamanho da aba (só a tabela de textos
+compartilhados fica carregada). Fórmulas não são recalculadas: vale o último
+valor salvo pelo Excel.
+
+Na escrita (``gerar_xlsx``), as linhas de cada aba são compactadas à medida
+que chegam e o arquivo sai em pedaços de bytes, prontos para uma
+``StreamingHttpResponse``; os textos vão direto nas células (inlineStr),
+sem tabela compartilhada.
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal, InvalidOperation
+import math
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape, quoteattr
+
+
+NS_PLANILHA = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+NS_RELACOES = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+NS_PACOTE = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+_REFERENCIA = re.compile(r'([A-Z]+)(\d+)')
+_DATA_BASE_EXCEL = date(1899, 12, 30)
+
+
+class ErroPlanilha(Exception):
+    """Arquivo que não é uma planilha XLSX válida ou aba inexistente"""
+
+
+class LeitorXlsx:
+    """Abre um arquivo XLSX e percorre as linhas de suas abas"""
+
+    def __init__(self, arquivo):
+        try:
+            self.zip = zipfile.ZipFile(arquivo)
+            self.abas = self._ler_abas()
+            self.textos = self._ler_textos()
+        except (zipfile.BadZipFile, KeyError, ET.ParseError) as e:
+            raise ErroPlanilha(f'Arquivo XLSX inválido: {e}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.zip.close()
+
+    def _ler_abas(self):
+        """{nome da aba: caminho do XML dentro do zip}, na ordem do arquivo"""
+        relacoes = ET.fromstring(self.zip.read('xl/_rels/workbook.xml.rels'))
+        destinos = {}
+        for relacao in relacoes.iter(f'{NS_PACOTE}Relationship'):
+            destino = relacao.get('Target')
+            destino = destino.lstrip('/') if destino.startswith('/') else posixpath.join('xl', destino)
+            destinos[relacao.get('Id')] = posixpath.normpath(destino)
+
+        pasta = ET.fromstring(self.zip.read('xl/workbook.xml'))
+        return {
+            aba.get('name'): destinos[aba.get(f'{NS_RELACOES}id')]
+            for aba in pasta.iter(f'{NS_PLANILHA}sheet')
+        }
+
+    def _ler_textos(self):
+        if 'xl/sharedStrings.xml' not in self.zip.namelist():
+            return []
+        textos = []
+        for _, elemento in ET.iterparse(self.zip.open('xl/sharedStrings.xml')):
+            if elemento.tag == f'{NS_PLANILHA}si':
+                textos.append(''.join(t.text or '' for t in elemento.iter(f'{NS_PLANILHA}t')))
+                elemento.clear()
+        return textos
+
+    def linhas(self, aba):
+        """
+        Gera (número da linha, {coluna: valor}) para as linhas com algum valor.
+        Números vêm como Decimal, textos como str e booleanos como bool.
+        """
+        if aba not in self.abas:
+            raise ErroPlanilha(f'Aba "{aba}" não encontrada.')
+        # O iterparse só encontra um XML quebrado (ou o zip corrompido) ao chegar nele, no meio da leitura
+        try:
+            yield from self._linhas(self.abas[aba])
+        except (zipfile.BadZipFile, ET.ParseError) as e:
+            raise ErroPlanilha(f'Aba "{aba}" inválida: {e}')
+
+    def _linhas(self, caminho):
+        celulas = {}
+        dados = None
+        for evento, elemento in ET.iterparse(self.zip.open(caminho), events=('start', 'end')):
+            if evento == 'start':
+                if elemento.tag == f'{NS_PLANILHA}sheetData':
+                    dados = elemento
+            elif elemento.tag == f'{NS_PLANILHA}c':
+                valor = self._valor(elemento)
+                if valor is not None:
+                    coluna = _REFERENCIA.match(elemento.get('r')).group(1)
+                    celulas[coluna] = valor
+            elif elemento.tag == f'{NS_PLANILHA}row':
+                if celulas:
+                    yield int(elemento.get('r')), celulas
+                    celulas = {}
+                # Descarta a linha já lida para a árvore não crescer com a aba
+                elemento.clear()
+                if dados is not None:
+                    dados.remove(elemento)
+
+    def _valor(self, celula):
+        tipo = celula.get('t', 'n')
+        if tipo == 'inlineStr':
+            return ''.join(t.text or '' for t in celula.iter(f'{NS_PLANILHA}t')) or None
+        bruto = celula.findtext(f'{NS_PLANILHA}v')
+        if bruto is None or tipo == 'e':
+            return None
+        if tipo == 's':
+            return self.textos[int(bruto)]
+        if tipo == 'str':
+            return bruto
+        if tipo == 'b':
+            return bruto == '1'
+        try:
+            return Decimal(bruto)
+        except InvalidOperation:
+            return None
+
+
+def data_excel(valor):
+    """Converte o número serial de data do Excel em ``date``"""
+    return _DATA_BASE_EXCEL + timedelta(days=int(valor))
+
+
+# Escrita
+
+# Estilos de célula definidos em ESTILOS_XML (índice em cellXfs)
+NORMAL = 0
+TITULO = 1
+NUMERO = 2
+NUMERO_TITULO = 3
+DATA = 4
+PERCENTUAL = 5
+
+# Tamanho aproximado dos pedaços de bytes entregues por gerar_xlsx
+TAMANHO_PEDACO = 64 * 1024
+
+_CARACTERES_INVALIDOS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_NOME_ABA_INVALIDO = re.compile(r'[\[\]:*?/\\]')
+
+ESTILOS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="2"><numFmt numFmtId="164" formatCode="#,##0.00"/>'
+    '<numFmt numFmtId="165" formatCode="mmm/yy"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="6">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="164" fontId="1" fillId="0" borderId="0" xfId="0" applyNumberFormat="1" applyFont="1"/>'
+    '<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="10" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '</cellXfs></styleSheet>'
+)
+
+
+class Celula:
+    """Valor com um estilo diferente do padrão do seu tipo"""
+    __slots__ = ('valor', 'estilo')
+
+    def __init__(self, valor, estilo):
+        self.valor = valor
+        self.estilo = estilo
+
+
+class _Saida:
+    """Destino sem seek para o ZipFile: acumula os bytes até serem retirados"""
+
+    def __init__(self):
+        self._partes = []
+        self.tamanho = 0
+
+    def write(self, dados):
+        self._partes.append(bytes(dados))
+        self.tamanho += len(dados)
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def retirar(self):
+        dados = b''.join(self._partes)
+        self._partes = []
+        self.tamanho = 0
+        return dados
+
+
+def gerar_xlsx(abas):
+    """
+    Gera os bytes de um XLSX a partir de ``abas``: pares (nome, linhas) ou
+    (nome, linhas, larguras), em que ``linhas`` é um iterável de listas de
+    valores (str, número, date, bool, None ou Celula) e ``larguras``, as
+    larguras das primeiras colunas.
+    """
+    saida = _Saida()
+    arquivo = zipfile.ZipFile(saida, 'w', zipfile.ZIP_DEFLATED)
+    nomes = []
+    for aba in abas:
+        nome, linhas = aba[0], aba[1]
+        larguras = aba[2] if len(aba) > 2 else ()
+        nomes.append(_nome_aba(nome, nomes))
+        with arquivo.open(f'xl/worksheets/sheet{len(nomes)}.xml', 'w') as xml:
+            xml.write(_inicio_aba(larguras).encode())
+            # As linhas são compactadas em grupos, que é bem mais rápido que uma a uma
+            pendentes, tamanho = [], 0
+            for numero, linha in enumerate(linhas, start=1):
+                texto = _linha_xml(numero, linha)
+                pendentes.append(texto)
+                tamanho += len(texto)
+                if tamanho >= TAMANHO_PEDACO:
+                    xml.write(''.join(pendentes).encode())
+                    pendentes, tamanho = [], 0
+                    if saida.tamanho >= TAMANHO_PEDACO:
+                        yield saida.retirar()
+            pendentes.append('</sheetData></worksheet>')
+            xml.write(''.join(pendentes).encode())
+        yield saida.retirar()
+
+    for caminho, conteudo in _partes_fixas(nomes):
+        arquivo.writestr(caminho, conteudo)
+    arquivo.close()
+    yield saida.retirar()
+
+
+def _nome_aba(nome, usados):
+    """Nome válido no Excel (até 31 caracteres, sem []:*?/\\) e único na pasta"""
+    base = _NOME_ABA_INVALIDO.sub(' ', str(nome)).strip()[:31] or 'Planilha'
+    candidato, contador = base, 2
+    while candidato.lower() in (usado.lower() for usado in usados):
+        sufixo = f' ({contador})'
+        candidato = base[:31 - len(sufixo)] + sufixo
+        contador += 1
+    return candidato
+
+
+def _inicio_aba(larguras):
+    colunas = ''.join(
+        f'<col min="{indice}" max="{indice}" width="{largura}" customWidth="1"/>'
+        for indice, largura in enumerate(larguras, start=1)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<worksheet xmlns="{NS_PLANILHA[1:-1]}">'
+        + (f'<cols>{colunas}</cols>' if colunas else '')
+        + '<sheetData>'
+    )
+
+
+def _linha_xml(numero, valores):
+    celulas = []
+    for indice, valor in enumerate(valores):
+        if valor is None:
+            continue
+        estilo = None
+        if isinstance(valor, Celula):
+            valor, estilo = valor.valor, valor.estilo
+            if valor is None:
+                continue
+        referencia = f'{_letra_coluna(indice)}{numero}'
+        if isinstance(valor, bool):
+            conteudo, tipo, padrao = f'<v>{int(valor)}</v>', ' t="b"', NORMAL
+        elif isinstance(valor, (int, float, Decimal)):
+            if isinstance(valor, float) and not math.isfinite(valor):
+                continue
+            conteudo, tipo = f'<v>{valor}</v>', ''
+            padrao = NORMAL if isinstance(valor, int) else NUMERO
+        elif isinstance(valor, (date, datetime)):
+            dias = (valor.date() if isinstance(valor, datetime) else valor) - _DATA_BASE_EXCEL
+            conteudo, tipo, padrao = f'<v>{dias.days}</v>', '', DATA
+        else:
+            texto = escape(_CARACTERES_INVALIDOS.sub('', str(valor)))
+            conteudo, tipo, padrao = f'<is><t xml:space="preserve">{texto}</t></is>', ' t="inlineStr"', NORMAL
+        estilo = padrao if estilo is None else estilo
+        atributo_estilo = f' s="{estilo}"' if estilo else ''
+        celulas.append(f'<c r="{referencia}"{tipo}{atributo_estilo}>{conteudo}</c>')
+    return f'<row r="{numero}">{"".join(celulas)}</row>'
+
+
+def _letra_coluna(indice):
+    """0 -> 'A', 25 -> 'Z', 26 -> 'AA'"""
+    letras = ''
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(ord('A') + resto) + letras
+    return letras
+
+
+def _partes_fixas(nomes):
+    """Pasta de trabalho, relações, tipos de conteúdo e estilos (escritos depois das abas)"""
+    tipo_aba = 'application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml'
+    relacao_aba = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet'
+    cabecalho = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    abas = ''.join(
+        f'<sheet name={quoteattr(nome)} sheetId="{indice}" r:id="rId{indice}"/>'
+        for indice, nome in enumerate(nomes, start=1)
+    )
+    yield 'xl/workbook.xml', (
+        f'{cabecalho}<workbook xmlns="{NS_PLANILHA[1:-1]}" xmlns:r="{NS_RELACOES[1:-1]}">'
+        f'<sheets>{abas}</sheets></workbook>'
+    )
+    relacoes = ''.join(
+        f'<Relationship Id="rId{indice}" Type="{relacao_aba}" Target="worksheets/sheet{indice}.xml"/>'
+        for indice in range(1, len(nomes) + 1)
+    )
+    yield 'xl/_rels/workbook.xml.rels', (
+        f'{cabecalho}<Relationships xmlns="{NS_PACOTE[1:-1]}">{relacoes}'
+        f'<Relationship Id="rId{len(nomes) + 1}" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+        'Target="styles.xml"/></Relationships>'
+    )
+    yield 'xl/styles.xml', ESTILOS_XML
+    yield '_rels/.rels', (
+        f'{cabecalho}<Relationships xmlns="{NS_PACOTE[1:-1]}">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/></Relationships>'
+    )
+    sobrescritas = ''.join(
+        f'<Override PartName="/xl/worksheets/sheet{indice}.xml" ContentType="{tipo_aba}"/>'
+        for indice in range(1, len(nomes) + 1)
+    )
+    yield '[Content_Types].xml', (
+        f'{cabecalho}<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        f'{sobrescritas}</Types>'
+    )
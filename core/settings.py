@@ -1,5 +1,6 @@
 from pathlib import Path
 import os
+import tempfile
 import sys
 from decouple import config
 
@@ -36,12 +37,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primeiro da lista, para medir o tempo de todos os outros (ver usuarios/perf.py)
+    'usuarios.perf.DesempenhoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # cProfile sob demanda (usuarios/perfilador.py)
+    'usuarios.perfilador.PerfiladorMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -53,7 +58,8 @@ ROOT_URLCONF = 'core.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates com o tempo de renderização medido por requisição
+        'BACKEND': 'usuarios.perf.DjangoTemplatesMedidos',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -90,8 +96,10 @@ else:
             'PASSWORD': config('PGPASSWORD'),
             'HOST': config('PGHOST'),
             'PORT': config('PGPORT'),
-            # Connection pooling: reutilizar conexões por até 10 minutos
-            'CONN_MAX_AGE': 600,
+            # Connection pooling: reutilizar conexões por até 10 minutos. Sob ASGI cada
+            # requisição roda em uma thread própria e a conexão persistente ficaria
+            # aberta com a thread descartada; entrypoint.asgi.prod.sh usa 0
+            'CONN_MAX_AGE': config('CONN_MAX_AGE', default=600, cast=int),
             'OPTIONS': {
                 'connect_timeout': 10,
             }
@@ -100,6 +108,62 @@ else:
 
 CSRF_TRUSTED_ORIGINS = ['https://*.railway.app', 'https://*.pythonando.com.br']
 
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Em produção usa uma tabela no banco (compartilhada entre os workers do gunicorn),
+# criada com `python manage.py createcachetable`
+
+if DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'agrodash',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'agrodash_cache',
+            'OPTIONS': {
+                'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=5000, cast=int),
+            }
+        }
+    }
+
+# Tempo (segundos) que um cálculo de dashboard fica guardado; a invalidação
+# por gravação acontece antes disso (ver usuarios/cache_propriedade.py)
+DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Orçamento por view (nome da função, caminho completo ou '*' para as demais):
+# requisições acima de algum limite vão para o log e são contadas em /_perf/.
+# Limites: queries, tempo_ms (total), db_ms e template_ms
+PERF_ORCAMENTOS = {
+    'lotes_dashboard_view': {'queries': 15, 'tempo_ms': 1000},
+    'nutricional_view': {'queries': 20, 'tempo_ms': 1000},
+    'nutricional_dashboard_view': {'queries': 15, 'tempo_ms': 1000},
+    'faturamento_view': {'queries': 15, 'tempo_ms': 1500},
+    'fluxo_caixa_view': {'queries': 20, 'tempo_ms': 1000},
+    'ponto_equilibrio_view': {'queries': 15, 'tempo_ms': 1500},
+    '*': {'queries': 50, 'tempo_ms': 3000},
+}
+# Cabeçalho Server-Timing (banco, templates, Python e trechos) em todas as respostas
+PERF_SERVER_TIMING = config('PERF_SERVER_TIMING', default=True, cast=bool)
+
+# Métricas do Prometheus em /metrics, somadas entre os workers (ver
+# usuarios/metricas.py): pasta onde cada processo grava as suas, intervalo
+# entre gravações (segundos) e token do coletor (Authorization: Bearer ...);
+# sem token, só usuários staff leem as métricas
+METRICAS_DIR = config('METRICAS_DIR', default=os.path.join(tempfile.gettempdir(), 'agrodash-metricas'))
+METRICAS_INTERVALO = config('METRICAS_INTERVALO', default=5, cast=float)
+METRICAS_TOKEN = config('METRICAS_TOKEN', default='')
+
+# Memória dos workers por view (ver usuarios/memoria.py e /_perf/memoria/):
+# crescimento do RSS a cada requisição e, com frames > 0, o tracemalloc
+# (bem mais lento; para diagnóstico, não para deixar ligado)
+MEMORIA_MONITOR = config('MEMORIA_MONITOR', default=False, cast=bool)
+MEMORIA_TRACEMALLOC_FRAMES = config('MEMORIA_TRACEMALLOC_FRAMES', default=0, cast=int)
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -33,8 +33,16 @@ urlpatterns = [
     path('nutricional/dashboard/', usuarios_views.nutricional_dashboard_view, name='nutricional_dashboard'),
     path('nutricional/<int:gasto_id>/deletar/', usuarios_views.deletar_gasto_nutricional, name='deletar_gasto_nutricional'),
     path('faturamento/', usuarios_views.faturamento_view, name='faturamento'),
+    path('faturamento/sensibilidade/', usuarios_views.sensibilidade_view, name='sensibilidade'),
+    path('faturamento/simulacao/', usuarios_views.simulacao_view, name='simulacao'),
     path('fluxo-caixa/', usuarios_views.fluxo_caixa_view, name='fluxo_caixa'),
     path('ponto-equilibrio/', usuarios_views.ponto_equilibrio_view, name='ponto_equilibrio'),
+    path('benchmark/', usuarios_views.benchmark_view, name='benchmark'),
+    path('exportar/<slug:nome>/', usuarios_views.exportar_view, name='exportar'),
+    path('graficos/<slug:nome>/', usuarios_views.grafico_view, name='grafico'),
+    path('_perf/', usuarios_views.perf_view, name='perf'),
+    path('_perf/memoria/', usuarios_views.perf_memoria_view, name='perf_memoria'),
+    path('metrics', usuarios_views.metricas_view, name='metricas'),
     path('', usuarios_views.home_view, name='home'),
 ]
 
@@ -0,0 +1,28 @@
+#!/usr/bin/env bash
+
+# Servidor ASGI (uvicorn): alternativa ao entrypoint2.prod.sh (gunicorn gthread).
+# Cada processo atende muitas requisições ao mesmo tempo enquanto elas esperam
+# o Postgres; as views dos dashboards são assíncronas (ORM assíncrono) e as
+# demais rodam em threads pelo próprio Django. Para usar no container:
+#   CMD ["/app/entrypoint.asgi.prod.sh"]
+WORKERS=${UVICORN_WORKERS:-4}
+
+# Sob ASGI cada requisição usa uma thread nova: conexões persistentes
+# ficariam abertas sem dono, então cada requisição abre e fecha a sua
+export CONN_MAX_AGE=${CONN_MAX_AGE:-0}
+
+# Executa migrações do banco de dados
+python manage.py migrate --noinput &&
+python manage.py createcachetable &&
+python manage.py collectstatic --noinput &
+
+# Métricas do /metrics começam do zero a cada deploy (ver usuarios/metricas.py)
+rm -rf "${METRICAS_DIR:-/tmp/agrodash-metricas}"
+
+uvicorn core.asgi:application \
+        --host 0.0.0.0 \
+        --port ${PORT:-8000} \
+        --workers ${WORKERS} \
+        --timeout-keep-alive 5 \
+        --limit-max-requests 1000 \
+        --log-level info
@@ -7,8 +7,12 @@ THREADS=${GUNICORN_THREADS:-2}
 
 # Executa migrações do banco de dados
 python manage.py migrate --noinput &&
+python manage.py createcachetable &&
 python manage.py collectstatic --noinput &
 
+# Métricas do /metrics começam do zero a cada deploy (ver usuarios/metricas.py)
+rm -rf "${METRICAS_DIR:-/tmp/agrodash-metricas}"
+
 gunicorn core.wsgi:application \
         --bind 0.0.0.0:${PORT:-8000} \
         --workers ${WORKERS} \